@@ -15,17 +15,123 @@
 
 """Entrypoint of the package"""
 
+from contextlib import contextmanager
 from pathlib import Path
-from typing import List
+from typing import Iterator, List, Optional, Tuple
 
 import typer
 
-from ghga_devutil import core
-from ghga_devutil.core import cli_message as msg
-from ghga_devutil.core.exceptions import ServiceFileValidationError
+from ghga_devutil.options import (
+    DEFAULT_FETCH_CONNECTIONS,
+    DEFAULT_MAX_EDGES,
+    DEFAULT_MAX_NODES,
+    DEFAULT_MERMAID_URL,
+    DiscoverOutput,
+    ExportFormat,
+    FanOutDistribution,
+    OpenAPIMode,
+    PartitionStrategy,
+    SpecFormat,
+)
+
+# The core and its dependencies are imported inside the commands, so that
+# showing the help or completing arguments does not load them.
+# pylint: disable=import-outside-toplevel
 
 cli = typer.Typer()
 
+STATS_HELP = "Print the time spent in each phase and the size of the landscape."
+STATS_JSON_HELP = (
+    "Write the time spent in each phase and the size of the landscape to a JSON file."
+)
+TRACE_HELP = "Write a trace of the run in the Chrome Trace Event Format to a file."
+MEMORY_REPORT_HELP = "Print the peak memory usage of each phase using tracemalloc."
+REPOS_DIR_HELP = (
+    "A directory containing a checkout of every service repository, named like the"
+    + " service, to merge the config_schema.json and example_config.yaml of every"
+    + " service into its configuration."
+)
+OPENAPI_HELP = (
+    "Check the REST endpoints of every service against the openapi.yaml in its"
+    + " repository, or replace them by the documented ones. Requires --repos-dir."
+)
+CACHE_DIR_HELP = (
+    "The directory to cache parsed files of the service repositories in, defaults"
+    + " to ghga-devutil in the user cache directory."
+)
+
+GIT_REF_HELP = (
+    "Read the service specifications from this git ref of the repository in the"
+    + " current directory instead of from disk. Paths of the form REF:PATH are read"
+    + " from git without this option."
+)
+
+
+def _resolve_cache_dir(
+    repos_dir: Optional[Path], cache_dir: Optional[Path]
+) -> Optional[Path]:
+    """Returns the cache directory for files of the service repositories, if any
+    are read."""
+    from ghga_devutil.core.cache import default_cache_dir
+
+    if repos_dir is None:
+        return None
+    return cache_dir or default_cache_dir()
+
+
+@contextmanager
+def _spec_paths(service_spec: List[Path], git_ref: Optional[str]) -> Iterator[List]:
+    """Resolves the given paths to service specification files, reading those
+    referring to git objects through a single git process for the whole run."""
+    from ghga_devutil.core.git import GitObjectStore
+    from ghga_devutil.core.io import resolve_spec_paths
+
+    with GitObjectStore() as store:
+        yield resolve_spec_paths(store, service_spec, git_ref)
+
+
+@contextmanager
+def _observed(
+    print_stats: bool = False,
+    stats_json: Optional[Path] = None,
+    trace: Optional[Path] = None,
+    memory_report: bool = False,
+) -> Iterator[None]:
+    """Observes the enclosed run with the observers of installed plugins and
+    those requested on the command line, and reports their results if the run
+    succeeded."""
+    from ghga_devutil.core import cli_message as msg
+    from ghga_devutil.core import hooks
+    from ghga_devutil.core.memory import MemoryReport
+    from ghga_devutil.core.stats import RunStats
+    from ghga_devutil.core.trace import Tracer
+
+    run_stats, tracer = RunStats(), Tracer()
+    observers = hooks.entry_point_observers()
+    if print_stats or stats_json is not None:
+        observers.append(run_stats)
+    if trace is not None:
+        observers.append(tracer)
+    memory = MemoryReport() if memory_report else None
+    if memory is not None:
+        observers.append(memory)
+    try:
+        with hooks.observing(*observers):
+            yield
+    finally:
+        if memory is not None:
+            memory.stop()
+
+    if memory is not None:
+        msg.info(memory.format_table())
+
+    if print_stats:
+        msg.info(run_stats.format_table())
+    if stats_json is not None:
+        run_stats.write_json(stats_json)
+    if trace is not None:
+        tracer.write(trace)
+
 
 @cli.command(name="annotate")
 def annotate(
@@ -34,20 +140,510 @@ def annotate(
     ),
     out_dir: Path = typer.Argument(..., help="The output directory."),
     force: bool = typer.Option(default=False, help="Overwrite existing files."),
+    stats: bool = typer.Option(default=False, help=STATS_HELP),
+    stats_json: Optional[Path] = typer.Option(default=None, help=STATS_JSON_HELP),
+    trace: Optional[Path] = typer.Option(default=None, help=TRACE_HELP),
+    memory_report: bool = typer.Option(default=False, help=MEMORY_REPORT_HELP),
+    repos_dir: Optional[Path] = typer.Option(default=None, help=REPOS_DIR_HELP),
+    openapi: Optional[OpenAPIMode] = typer.Option(default=None, help=OPENAPI_HELP),
+    cache_dir: Optional[Path] = typer.Option(default=None, help=CACHE_DIR_HELP),
+    git_ref: Optional[str] = typer.Option(default=None, help=GIT_REF_HELP),
 ):
     """Annotate service specifications with consumer and producer references and
     configuration options."""
+    from ghga_devutil import core
+    from ghga_devutil.core import cli_message as msg
+    from ghga_devutil.core.exceptions import (
+        ConfigSchemaError,
+        GitObjectError,
+        OpenAPIDocumentError,
+        ServiceFileValidationError,
+    )
+
     try:
-        core.annotate(service_file_paths=service_spec, outdir=out_dir, force=force)
-    except (IOError, ServiceFileValidationError) as error:
+        with _spec_paths(service_spec, git_ref) as spec_paths, _observed(
+            stats, stats_json, trace, memory_report
+        ):
+            core.annotate(
+                service_file_paths=spec_paths,
+                outdir=out_dir,
+                force=force,
+                repos_dir=repos_dir,
+                cache_dir=_resolve_cache_dir(repos_dir, cache_dir),
+                openapi=openapi,
+            )
+    except (
+        IOError,
+        GitObjectError,
+        ValueError,
+        ServiceFileValidationError,
+        ConfigSchemaError,
+        OpenAPIDocumentError,
+    ) as error:
         msg.err(error)
 
 
 @cli.command(name="markdown")
-def markdown(service_spec: List[Path], out_dir: Path, force: bool = False):
+def markdown(
+    service_spec: List[Path],
+    out_dir: Path,
+    force: bool = False,
+    incremental: bool = typer.Option(
+        default=False, help="Only regenerate pages whose inputs changed."
+    ),
+    low_memory: bool = typer.Option(
+        default=False,
+        help="Stream services one at a time through annotation, rendering and"
+        + " writing, so that memory usage stays bounded for large landscapes.",
+    ),
+    partition: PartitionStrategy = typer.Option(
+        default=PartitionStrategy.NONE,
+        help="Split the communication diagram into multiple pages.",
+    ),
+    domains: Optional[Path] = typer.Option(
+        default=None,
+        help="A file mapping service shortnames to domain labels, used by the"
+        + " 'domain' partitioning strategy.",
+    ),
+    max_nodes: int = typer.Option(
+        default=DEFAULT_MAX_NODES,
+        min=2,
+        help="The maximum number of nodes per diagram, at least two for an edge.",
+    ),
+    max_edges: int = typer.Option(
+        default=DEFAULT_MAX_EDGES,
+        min=1,
+        help="The maximum number of edges per diagram.",
+    ),
+    stats: bool = typer.Option(default=False, help=STATS_HELP),
+    stats_json: Optional[Path] = typer.Option(default=None, help=STATS_JSON_HELP),
+    trace: Optional[Path] = typer.Option(default=None, help=TRACE_HELP),
+    memory_report: bool = typer.Option(default=False, help=MEMORY_REPORT_HELP),
+    repos_dir: Optional[Path] = typer.Option(default=None, help=REPOS_DIR_HELP),
+    openapi: Optional[OpenAPIMode] = typer.Option(default=None, help=OPENAPI_HELP),
+    cache_dir: Optional[Path] = typer.Option(default=None, help=CACHE_DIR_HELP),
+    git_ref: Optional[str] = typer.Option(default=None, help=GIT_REF_HELP),
+):
     """Annotates multiple services jointly and then creates individual markdown
     representations including inter-service references."""
+    from ghga_devutil import core
+    from ghga_devutil.core import cli_message as msg
+    from ghga_devutil.core.exceptions import (
+        ConfigSchemaError,
+        DomainFileValidationError,
+        GitObjectError,
+        OpenAPIDocumentError,
+        ServiceFileValidationError,
+    )
+    from ghga_devutil.core.io import load_domains
+    from ghga_devutil.core.partition import PartitionOptions
+
+    try:
+        partitioning = PartitionOptions(
+            strategy=partition,
+            domains=load_domains(domains) if domains else {},
+            max_nodes=max_nodes,
+            max_edges=max_edges,
+        )
+        with _spec_paths(service_spec, git_ref) as spec_paths, _observed(
+            stats, stats_json, trace, memory_report
+        ):
+            core.markdown(
+                spec_paths,
+                out_dir,
+                force,
+                incremental=incremental,
+                partitioning=partitioning,
+                low_memory=low_memory,
+                repos_dir=repos_dir,
+                cache_dir=_resolve_cache_dir(repos_dir, cache_dir),
+                openapi=openapi,
+            )
+    except (
+        IOError,
+        GitObjectError,
+        ValueError,
+        ServiceFileValidationError,
+        DomainFileValidationError,
+        ConfigSchemaError,
+        OpenAPIDocumentError,
+    ) as error:
+        msg.err(error)
+
+
+@cli.command(name="export")
+def export(
+    service_spec: List[Path] = typer.Argument(
+        ..., help="A list of files to read service specifications from."
+    ),
+    out_file: Path = typer.Argument(..., help="The output file."),
+    export_format: ExportFormat = typer.Option(
+        ExportFormat.DOT, "--format", help="The output format."
+    ),
+    force: bool = typer.Option(default=False, help="Overwrite an existing file."),
+    git_ref: Optional[str] = typer.Option(default=None, help=GIT_REF_HELP),
+):
+    """Annotates multiple services jointly and exports their communication graph
+    for rendering with external graph tools."""
+    from ghga_devutil import core
+    from ghga_devutil.core import cli_message as msg
+    from ghga_devutil.core.exceptions import (
+        GitObjectError,
+        OutputFileExistsError,
+        ServiceFileValidationError,
+    )
+
     try:
-        core.markdown(service_spec, out_dir, force)
+        with _spec_paths(service_spec, git_ref) as spec_paths, _observed():
+            core.export(spec_paths, out_file, export_format, force)
+    except (
+        IOError,
+        GitObjectError,
+        ServiceFileValidationError,
+        OutputFileExistsError,
+    ) as error:
+        msg.err(error)
+
+
+@cli.command(name="site")
+def site(
+    service_spec: List[Path] = typer.Argument(
+        ..., help="A list of files to read service specifications from."
+    ),
+    out_dir: Path = typer.Argument(..., help="The output directory."),
+    force: bool = typer.Option(default=False, help="Overwrite existing files."),
+    partition: PartitionStrategy = typer.Option(
+        default=PartitionStrategy.COMPONENT,
+        help="Split the communication diagram into multiple diagrams.",
+    ),
+    max_nodes: int = typer.Option(
+        default=DEFAULT_MAX_NODES,
+        min=2,
+        help="The maximum number of nodes per diagram, at least two for an edge.",
+    ),
+    max_edges: int = typer.Option(
+        default=DEFAULT_MAX_EDGES,
+        min=1,
+        help="The maximum number of edges per diagram.",
+    ),
+    mermaid_url: str = typer.Option(
+        default=DEFAULT_MERMAID_URL,
+        help="The URL of the mermaid script used to draw the diagrams.",
+    ),
+    repos_dir: Optional[Path] = typer.Option(default=None, help=REPOS_DIR_HELP),
+    openapi: Optional[OpenAPIMode] = typer.Option(default=None, help=OPENAPI_HELP),
+    cache_dir: Optional[Path] = typer.Option(default=None, help=CACHE_DIR_HELP),
+    git_ref: Optional[str] = typer.Option(default=None, help=GIT_REF_HELP),
+):
+    """Annotates multiple services jointly and writes a static HTML site including
+    a client-side search index."""
+    from ghga_devutil import core
+    from ghga_devutil.core import cli_message as msg
+    from ghga_devutil.core.exceptions import (
+        ConfigSchemaError,
+        GitObjectError,
+        OpenAPIDocumentError,
+        OutputFileExistsError,
+        ServiceFileValidationError,
+    )
+    from ghga_devutil.core.partition import PartitionOptions
+
+    try:
+        with _spec_paths(service_spec, git_ref) as spec_paths, _observed():
+            core.site(
+                spec_paths,
+                out_dir,
+                force,
+                partitioning=PartitionOptions(
+                    strategy=partition, max_nodes=max_nodes, max_edges=max_edges
+                ),
+                mermaid_url=mermaid_url,
+                repos_dir=repos_dir,
+                cache_dir=_resolve_cache_dir(repos_dir, cache_dir),
+                openapi=openapi,
+            )
+    except (
+        IOError,
+        GitObjectError,
+        ValueError,
+        ServiceFileValidationError,
+        OutputFileExistsError,
+        ConfigSchemaError,
+        OpenAPIDocumentError,
+    ) as error:
+        msg.err(error)
+
+
+@cli.command(name="serve")
+def serve(
+    service_spec: List[Path] = typer.Argument(
+        ..., help="A list of files to read service specifications from."
+    ),
+    host: str = typer.Option(default="127.0.0.1", help="The host to bind to."),
+    port: int = typer.Option(default=8000, help="The port to bind to."),
+    cache_size: int = typer.Option(
+        default=1024, help="The maximum number of cached responses."
+    ),
+):
+    """Loads and annotates services once and serves rendered pages, annotated
+    services and graph queries over HTTP."""
+    from ghga_devutil import core
+    from ghga_devutil.core import cli_message as msg
+    from ghga_devutil.core.exceptions import ServiceFileValidationError
+
+    try:
+        core.serve(service_spec, host=host, port=port, cache_size=cache_size)
     except (IOError, ServiceFileValidationError) as error:
         msg.err(error)
+
+
+@cli.command(name="watch")
+def watch(
+    service_spec: List[Path] = typer.Argument(
+        ...,
+        help="A list of files or directories to read service specifications from.",
+    ),
+    out_dir: Path = typer.Argument(..., help="The output directory."),
+    debounce: float = typer.Option(
+        default=0.1, help="Seconds without changes to wait for before rebuilding."
+    ),
+    polling: bool = typer.Option(
+        default=False, help="Poll for changes instead of using inotify."
+    ),
+):
+    """Creates markdown representations of all services and updates the pages
+    affected by changes of the service specifications."""
+    from ghga_devutil import core
+    from ghga_devutil.core import cli_message as msg
+    from ghga_devutil.core.exceptions import ServiceFileValidationError
+
+    try:
+        core.watch(service_spec, out_dir, debounce=debounce, polling=polling)
+    except (IOError, ServiceFileValidationError) as error:
+        msg.err(error)
+
+
+@cli.command(name="synth")
+def synth(
+    out_dir: Path = typer.Argument(..., help="The output directory."),
+    services: int = typer.Option(default=100, help="The number of services."),
+    endpoints: Tuple[int, int] = typer.Option(
+        default=(0, 5), help="The range of REST endpoints produced per service."
+    ),
+    events: Tuple[int, int] = typer.Option(
+        default=(0, 3), help="The range of events produced per service."
+    ),
+    fan_out: FanOutDistribution = typer.Option(
+        default=FanOutDistribution.POWER_LAW,
+        help="The distribution of the number of consumers per endpoint or event.",
+    ),
+    mean_consumers: float = typer.Option(
+        default=2.0, help="The mean number of consumers per endpoint or event."
+    ),
+    storage: Optional[List[str]] = typer.Option(
+        default=None,
+        help="The probability of a service using a storage kind, given as"
+        + " 'kind=probability' for the kinds s3, mongodb and vault.",
+    ),
+    seed: int = typer.Option(default=0, help="The seed of the random generator."),
+    spec_format: SpecFormat = typer.Option(
+        SpecFormat.YAML, "--format", help="The output format."
+    ),
+    force: bool = typer.Option(default=False, help="Overwrite existing files."),
+):
+    """Generates a synthetic landscape of services for load testing."""
+    from ghga_devutil import core
+    from ghga_devutil.core import cli_message as msg
+    from ghga_devutil.core.exceptions import OutputFileExistsError
+    from ghga_devutil.core.synth import SynthOptions, parse_storage_mix
+
+    try:
+        options = SynthOptions(
+            services=services,
+            endpoints=endpoints,
+            events=events,
+            fan_out=fan_out,
+            mean_consumers=mean_consumers,
+            seed=seed,
+        )
+        if storage:
+            options.storage_mix = parse_storage_mix(storage)
+        core.synth(out_dir, options, spec_format, force)
+    except (IOError, ValueError, OutputFileExistsError) as error:
+        msg.err(error)
+
+
+@cli.command(name="validate")
+def validate(
+    service_spec: List[Path] = typer.Argument(
+        ...,
+        help="A list of files or directories to read service specifications from.",
+    ),
+    json_output: bool = typer.Option(
+        False, "--json", help="Print the problems found as JSON."
+    ),
+    jobs: Optional[int] = typer.Option(
+        default=None, help="The number of worker processes, by default one per CPU."
+    ),
+):
+    """Validates all service specifications and reports every problem found with
+    its file, line and column. Exits with a non-zero code if any file is
+    invalid."""
+    from ghga_devutil import core
+
+    if not core.validate(service_spec, json_output=json_output, jobs=jobs):
+        raise typer.Exit(code=1)
+
+
+@cli.command(name="check-events")
+def check_events(
+    service_spec: List[Path] = typer.Argument(
+        ...,
+        help="A list of files or directories to read service specifications from.",
+    ),
+    repos_dir: Path = typer.Option(
+        ...,
+        help="A directory containing a checkout of every service repository, named"
+        + " like the service, with an asyncapi.yaml or an event_schemas directory"
+        + " holding one JSON schema per event type.",
+    ),
+    cache_dir: Optional[Path] = typer.Option(default=None, help=CACHE_DIR_HELP),
+    json_output: bool = typer.Option(
+        False, "--json", help="Print the incompatibilities found as JSON."
+    ),
+    jobs: Optional[int] = typer.Option(
+        default=None, help="The number of threads reading schema files."
+    ),
+):
+    """Checks that the payload schemas of the producers and consumers of every
+    event are compatible. Exits with a non-zero code if any are incompatible."""
+    from ghga_devutil import core
+    from ghga_devutil.core import cli_message as msg
+    from ghga_devutil.core.exceptions import (
+        EventSchemaError,
+        ServiceFileValidationError,
+    )
+
+    try:
+        compatible = core.check_events(
+            service_spec,
+            repos_dir,
+            cache_dir=_resolve_cache_dir(repos_dir, cache_dir),
+            json_output=json_output,
+            jobs=jobs,
+        )
+    except (IOError, ServiceFileValidationError, EventSchemaError) as error:
+        msg.err(error)
+        raise typer.Exit(code=1) from error
+    if not compatible:
+        raise typer.Exit(code=1)
+
+
+@cli.command(name="discover")
+def discover(
+    service_spec: List[Path] = typer.Argument(
+        ...,
+        help="A list of files or directories to read service specifications from.",
+    ),
+    repos_dir: Path = typer.Option(
+        ...,
+        help="A directory containing a checkout of every service repository, named"
+        + " like the service.",
+    ),
+    output: DiscoverOutput = typer.Option(
+        default=DiscoverOutput.DIFF,
+        help="Print the differences to the specifications or draft API sections.",
+    ),
+    cache_dir: Optional[Path] = typer.Option(default=None, help=CACHE_DIR_HELP),
+    jobs: Optional[int] = typer.Option(
+        default=None, help="The number of worker processes, by default one per CPU."
+    ),
+):
+    """Scans the Python sources of services for the REST endpoints and events
+    they actually use and compares them to their specifications."""
+    from ghga_devutil import core
+    from ghga_devutil.core import cli_message as msg
+    from ghga_devutil.core.exceptions import ServiceFileValidationError
+
+    try:
+        core.discover(
+            service_spec,
+            repos_dir,
+            output=output,
+            cache_dir=_resolve_cache_dir(repos_dir, cache_dir),
+            jobs=jobs,
+        )
+    except (IOError, ServiceFileValidationError) as error:
+        msg.err(error)
+
+
+@cli.command(name="fetch")
+def fetch(
+    manifest: Path = typer.Argument(
+        ..., help="A file mapping specification file names to the URLs to fetch."
+    ),
+    out_dir: Path = typer.Argument(..., help="The output directory."),
+    connections: int = typer.Option(
+        default=DEFAULT_FETCH_CONNECTIONS,
+        help="The maximum number of concurrent keep-alive connections.",
+    ),
+    timeout: float = typer.Option(
+        default=30.0, help="The timeout of every connection in seconds."
+    ),
+):
+    """Fetches service specifications from their repositories concurrently. Files
+    fetched before are revalidated with their ETag or modification time and
+    only written if they changed. Exits with a non-zero code if any
+    specification could not be fetched."""
+    from ghga_devutil import core
+    from ghga_devutil.core import cli_message as msg
+    from ghga_devutil.core.exceptions import SpecManifestError
+
+    try:
+        fetched = core.fetch(manifest, out_dir, connections, timeout)
+    except (IOError, SpecManifestError) as error:
+        msg.err(error)
+        raise typer.Exit(code=1) from error
+    if not fetched:
+        raise typer.Exit(code=1)
+
+
+@cli.command(name="diff")
+def diff(
+    old_spec: Path = typer.Argument(
+        ...,
+        help="A file or directory to read the old service specifications from, or"
+        + " REF:PATH to read them from git.",
+    ),
+    new_spec: Path = typer.Argument(
+        ...,
+        help="A file or directory to read the new service specifications from, or"
+        + " REF:PATH to read them from git.",
+    ),
+    json_output: bool = typer.Option(
+        False, "--json", help="Print the changes found as JSON."
+    ),
+    exit_code: bool = typer.Option(
+        default=False, help="Exit with a non-zero code if the landscapes differ."
+    ),
+):
+    """Compares two versions of a landscape and reports added, removed and changed
+    services, endpoints, events, configuration and communication edges."""
+    from ghga_devutil import core
+    from ghga_devutil.core import cli_message as msg
+    from ghga_devutil.core.exceptions import GitObjectError, ServiceFileValidationError
+    from ghga_devutil.core.git import GitObjectStore
+    from ghga_devutil.core.io import resolve_spec_paths
+
+    try:
+        with GitObjectStore() as store:
+            equal = core.diff(
+                resolve_spec_paths(store, [old_spec]),
+                resolve_spec_paths(store, [new_spec]),
+                json_output=json_output,
+            )
+    except (IOError, GitObjectError, ServiceFileValidationError) as error:
+        msg.err(error)
+        raise typer.Exit(code=1) from error
+    if exit_code and not equal:
+        raise typer.Exit(code=1)
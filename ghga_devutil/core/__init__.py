@@ -16,4 +16,17 @@
 
 """Core functionality"""
 
-from .main import annotate, markdown  # noqa: F401
+from .main import (  # noqa: F401
+    annotate,
+    check_events,
+    diff,
+    discover,
+    export,
+    fetch,
+    markdown,
+    serve,
+    site,
+    synth,
+    validate,
+    watch,
+)
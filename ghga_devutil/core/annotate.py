@@ -18,8 +18,10 @@
 
 from collections import defaultdict
 from pathlib import Path
-from typing import List, Mapping, Tuple
+from typing import List, Mapping, Optional, Set, Tuple
 
+from .config_rules import ConfigRuleTable, default_rule_table
+from .config_schema import ServiceConfigSpec, merge_config
 from .io import load_service, write_service
 from .models import (
     AnnotatedConfiguredEvent,
@@ -36,13 +38,18 @@ from .models import (
 def annotate_rest_consumers(
     service: Service, rest_consumers: Mapping[ConsumedRESTEndpoint, List[str]]
 ) -> List[AnnotatedRESTEndpoint]:
-    """Produces a list of REST endpoints with their respective consumers annotated."""
+    """Produces a list of REST endpoints with their respective consumers annotated.
+    Consumers are sorted by shortname, independent of the order of the services."""
     return [
         AnnotatedRESTEndpoint(
             **rest_endpoint.dict(),
-            consumers=rest_consumers[
-                ConsumedRESTEndpoint(**rest_endpoint.dict(), service=service.shortname)
-            ],
+            consumers=sorted(
+                rest_consumers[
+                    ConsumedRESTEndpoint(
+                        **rest_endpoint.dict(), service=service.shortname
+                    )
+                ]
+            ),
         )
         for rest_endpoint in service.api.rest.produces
     ]
@@ -55,7 +62,9 @@ def annotate_event_consumers(
     return [
         AnnotatedConfiguredEvent(
             **event.dict(),
-            consumers=event_consumers[Event(topic=event.topic, type=event.type)],
+            consumers=sorted(
+                event_consumers[Event(topic=event.topic, type=event.type)]
+            ),
         )
         for event in service.api.events.produces
     ]
@@ -68,77 +77,26 @@ def annotate_event_producers(
     return [
         ConsumedConfiguredEvent(
             **event.dict(),
-            producers=event_producers[Event(topic=event.topic, type=event.type)],
+            producers=sorted(
+                event_producers[Event(topic=event.topic, type=event.type)]
+            ),
         )
         for event in service.api.events.consumes
     ]
 
 
-def annotate_service_config(service: Service) -> List[ConfigVariable]:
-    """Annotate service configuration"""
-    config: List[ConfigVariable] = []
-
-    # Does the service provide a REST API?
-    if service.api.rest.produces:
-        config.append(
-            ConfigVariable(
-                name="host",
-                description="The hostname or IP address to bind the HTTP server to",
-            )
-        )
-        config.append(
-            ConfigVariable(
-                name="port", description="The port to bind the HTTP server to"
-            )
-        )
-
-    # Does the service consume or produce events through a message broker?
-    if service.api.events.produces or service.api.events.consumes:
-        config.append(
-            ConfigVariable(
-                name="kafka_servers",
-                description="A list of Apache Kafka servers to connect to",
-            )
-        )
-
-    # Add configuration values for every kafka event
-    for event in set(service.api.events.produces + service.api.events.consumes):
-        config.append(
-            ConfigVariable(
-                name=f"{event.config}_topic", description="An Apache Kafka event topic"
-            )
-        )
-        config.append(
-            ConfigVariable(
-                name=f"{event.config}_type", description="An Apache Kafka event schema"
-            )
-        )
-
-    # Add database connection configuration if needed
-    if service.storage.mongodb:
-        config.append(
-            ConfigVariable(
-                name="db_connection_str", description="The MongoDB connection URI"
-            )
-        )
-        config.append(
-            ConfigVariable(name="db_name", description="The MongoDB database name")
-        )
-
-    if service.storage.s3:
-        config.append(
-            ConfigVariable(name="s3_endpoint_url", description="The S3 endpoint URL")
-        )
-        config.append(
-            ConfigVariable(name="s3_access_key_id", description="The S3 access key ID")
-        )
-        config.append(
-            ConfigVariable(
-                name="s3_secret_access_key", description="The S3 secret access key"
-            )
-        )
-
-    return config
+def annotate_service_config(
+    service: Service,
+    rule_table: Optional[ConfigRuleTable] = None,
+    config_spec: Optional[ServiceConfigSpec] = None,
+) -> List[ConfigVariable]:
+    """Annotate service configuration by applying the given or the default table
+    of configuration rules and merging in the documented configuration of the
+    service, if given"""
+    config = (rule_table or default_rule_table()).derive(service)
+    if config_spec is None:
+        return config
+    return merge_config(config, config_spec)
 
 
 def annotate_service(
@@ -146,8 +104,9 @@ def annotate_service(
     rest_consumers: Mapping[ConsumedRESTEndpoint, List[str]],
     event_consumers: Mapping[Event, List[str]],
     event_producers: Mapping[Event, List[str]],
+    config_spec: Optional[ServiceConfigSpec] = None,
 ) -> AnnotatedService:
-    """Annotates a service"""
+    """Annotates a service, optionally merging in its documented configuration"""
     service_dict = service.dict()
 
     service_dict["api"]["events"]["produces"] = annotate_event_consumers(
@@ -162,7 +121,7 @@ def annotate_service(
         service=service, rest_consumers=rest_consumers
     )
 
-    config = annotate_service_config(service)
+    config = annotate_service_config(service, config_spec=config_spec)
 
     return AnnotatedService(
         **service_dict,
@@ -213,6 +172,20 @@ def annotate_services(services: List[Service]) -> List[AnnotatedService]:
     return ann_services
 
 
+def service_neighbours(service: AnnotatedService) -> Set[str]:
+    """Returns the shortnames of all services an annotated service communicates
+    with, be it as producer or as consumer."""
+    neighbours = {endpoint.service for endpoint in service.api.rest.consumes}
+    for rest_endpoint in service.api.rest.produces:
+        neighbours.update(rest_endpoint.consumers)
+    for produced_event in service.api.events.produces:
+        neighbours.update(produced_event.consumers)
+    for consumed_event in service.api.events.consumes:
+        neighbours.update(consumed_event.producers)
+    neighbours.discard(service.shortname)
+    return neighbours
+
+
 def annotate_files(
     paths: List[Path],
     force: bool = False,
@@ -0,0 +1,141 @@
+# Copyright 2021 - 2023 Universität Tübingen, DKFZ, EMBL, and Universität zu Köln
+# for the German Human Genome-Phenome Archive (GHGA)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+"""Asynchronous rendering of annotated services for use in asyncio applications"""
+
+import asyncio
+from datetime import datetime, timezone
+from functools import partial
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, Hashable, List, Mapping, Optional, Tuple
+
+from ghga_devutil.core.cache import LRUCache
+from ghga_devutil.core.hashing import hash_models
+from ghga_devutil.core.markdown import (
+    FRAGMENT_KINDS,
+    create_environment,
+    service_page_digest,
+)
+from ghga_devutil.core.models import AnnotatedService
+
+COMPLETE_DIAGRAM_PAGE = "service_communications"
+
+
+def landscape_version(services: Mapping[str, AnnotatedService]) -> str:
+    """Returns an identifier of the state of a landscape of annotated services."""
+    return hash_models(services)
+
+
+class AsyncRenderer:
+    """Renders the markdown pages of annotated services using jinja2 in async mode.
+
+    The jinja2 environment and compiled templates are created once and shared by
+    all requests. Rendered pages are kept in an LRU cache keyed by the landscape
+    version, the page and its timestamp if given, and concurrent requests for the
+    same page await a single rendering."""
+
+    def __init__(self, cache_size: int = 1024):
+        self.cache: LRUCache[str] = LRUCache(maxsize=cache_size)
+        self._env = create_environment(enable_async=True)
+        self._pending: Dict[Hashable, "asyncio.Future[str]"] = {}
+
+    async def _cached(self, key: Hashable, render: Callable[[], Awaitable[str]]) -> str:
+        """Returns a cached page or renders it, sharing the rendering with all
+        concurrent requests for the same page. The rendering runs in a task of
+        its own, so that cancelling one request does not cancel the others."""
+        pending = self._pending.get(key)
+        if pending is None:
+            cached = self.cache.get(key)
+            if cached is not None:
+                return cached
+            pending = asyncio.ensure_future(render())
+            self._pending[key] = pending
+            pending.add_done_callback(partial(self._rendered, key))
+        return await asyncio.shield(pending)
+
+    def _rendered(self, key: Hashable, task: "asyncio.Future[str]") -> None:
+        """Caches the page of a finished rendering. Retrieving the exception of
+        a failed rendering keeps asyncio from logging it if nobody waits."""
+        del self._pending[key]
+        if not task.cancelled() and task.exception() is None:
+            self.cache.put(key, task.result())
+
+    async def render_service_page(
+        self,
+        services: Mapping[str, AnnotatedService],
+        service_key: str,
+        version: Optional[str] = None,
+        timestamp: Optional[datetime] = None,
+    ) -> str:
+        """Renders the markdown page of one service. The version identifies the
+        state of the landscape and is computed from the services if not given.
+        Pages requested without a timestamp are dated when they are first
+        rendered and cached by version, pages requested with a timestamp are
+        cached by version and timestamp."""
+        version = version or landscape_version(services)
+        template = self._env.get_template("service_page.md.jinja")
+        page_time = timestamp or datetime.now(tz=timezone.utc)
+
+        async def render() -> str:
+            return await template.render_async(
+                services=services, service_key=service_key, cur_time=lambda: page_time
+            )
+
+        key: Tuple[Hashable, ...] = (version, service_key)
+        if timestamp is not None:
+            key += (timestamp,)
+        return await self._cached(key, render)
+
+    async def render_complete_diagram(
+        self,
+        services: Mapping[str, AnnotatedService],
+        version: Optional[str] = None,
+    ) -> str:
+        """Renders the service communications page from per-service fragments,
+        which are cached individually, so that a new landscape version only
+        renders the fragments of changed services."""
+        version = version or landscape_version(services)
+        fragment_templates = {
+            kind: self._env.get_template(f"mermaid/communications_{kind}.md.jinja")
+            for kind in FRAGMENT_KINDS
+        }
+
+        async def render_fragment(kind: str, service_key: str) -> str:
+            digest = service_page_digest(services, service_key)
+            return await self._cached(
+                (kind, digest),
+                lambda: fragment_templates[kind].render_async(
+                    services=services, service=services[service_key]
+                ),
+            )
+
+        async def render() -> str:
+            fragments: Dict[str, List[str]] = {}
+            for kind in FRAGMENT_KINDS:
+                fragments[kind] = await asyncio.gather(
+                    *(render_fragment(kind, service_key) for service_key in services)
+                )
+            template = self._env.get_template("service_communications.md.jinja")
+            return await template.render_async(
+                event_fragments=fragments["events"], rest_fragments=fragments["rest"]
+            )
+
+        return await self._cached((version, COMPLETE_DIAGRAM_PAGE), render)
+
+
+async def write_page(out_path: Path, page: str) -> None:
+    """Writes a rendered page without blocking the event loop."""
+    await asyncio.to_thread(out_path.write_text, page)
@@ -0,0 +1,176 @@
+# Copyright 2021 - 2023 Universität Tübingen, DKFZ, EMBL, and Universität zu Köln
+# for the German Human Genome-Phenome Archive (GHGA)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+"""Caches for rendered outputs and values derived from file contents"""
+
+import hashlib
+import json
+import os
+import tempfile
+from collections import OrderedDict
+from concurrent.futures import Future
+from pathlib import Path
+from threading import Lock
+from typing import Any, Callable, Dict, Generic, Hashable, Optional, TypeVar
+
+V = TypeVar("V")
+
+
+class LRUCache(Generic[V]):
+    """A thread-safe cache evicting the least recently used entry once the maximum
+    number of entries is reached."""
+
+    def __init__(self, maxsize: int = 1024):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[Hashable, V]" = OrderedDict()
+        self._lock = Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable) -> Optional[V]:
+        """Returns the cached value or None if the key is not cached."""
+        with self._lock:
+            if key not in self._entries:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return self._entries[key]
+
+    def put(self, key: Hashable, value: V) -> None:
+        """Caches a value, evicting the least recently used entry if needed."""
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        """Drops all cached values."""
+        with self._lock:
+            self._entries.clear()
+
+
+def default_cache_dir() -> Path:
+    """Returns the directory for persistent caches of the current user."""
+    base = os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache"
+    return Path(base) / "ghga-devutil"
+
+
+class ContentCache:
+    """A thread-safe cache of JSON-serializable values derived from file contents,
+    keyed by the digest of the contents. Values are kept in memory, so that equal
+    contents are only processed once per run, and optionally in a directory, so
+    that unchanged contents are not processed again in later runs. The namespace
+    should change whenever the derivation changes."""
+
+    def __init__(self, namespace: str, directory: Optional[Path] = None):
+        self.namespace = namespace
+        self.directory = directory
+        self.hits = 0
+        self.misses = 0
+        self._entries: Dict[str, Any] = {}
+        self._pending: Dict[str, "Future[Any]"] = {}
+        self._lock = Lock()
+
+    def _path(self, digest: str) -> Path:
+        assert self.directory is not None
+        return self.directory / self.namespace / f"{digest}.json"
+
+    def _load(self, digest: str) -> Optional[Any]:
+        if self.directory is None:
+            return None
+        try:
+            return json.loads(self._path(digest).read_bytes())
+        except (OSError, ValueError):
+            return None
+
+    def _store(self, digest: str, value: Any) -> None:
+        if self.directory is None:
+            return
+        path = self._path(digest)
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            with tempfile.NamedTemporaryFile(
+                "w", dir=path.parent, suffix=".tmp", delete=False, encoding="utf-8"
+            ) as tmp_file:
+                json.dump(value, tmp_file)
+            os.replace(tmp_file.name, path)
+        except OSError:
+            pass  # the cache is an optimization, failing to persist is harmless
+
+    @staticmethod
+    def digest(content: bytes) -> str:
+        """Returns the digest of file contents used as cache key."""
+        return hashlib.sha256(content).hexdigest()
+
+    def get(self, digest: str) -> Optional[Any]:
+        """Returns the value cached for the contents with the given digest or
+        None if no value is cached."""
+        with self._lock:
+            if digest in self._entries:
+                self.hits += 1
+                return self._entries[digest]
+        value = self._load(digest)
+        with self._lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self._entries[digest] = value
+        return value
+
+    def put(self, digest: str, value: Any) -> None:
+        """Caches the value derived from the contents with the given digest."""
+        self._store(digest, value)
+        with self._lock:
+            self._entries[digest] = value
+
+    def get_or_compute(self, content: bytes, compute: Callable[[bytes], Any]) -> Any:
+        """Returns the value cached for the given contents or computes it. A
+        computation of equal contents that is in progress in another thread is
+        awaited instead of being repeated."""
+        digest = self.digest(content)
+        with self._lock:
+            pending = self._pending.get(digest)
+            if pending is None:
+                if digest in self._entries:
+                    self.hits += 1
+                    return self._entries[digest]
+                future: "Future[Any]" = Future()
+                self._pending[digest] = future
+        if pending is not None:
+            value = pending.result()
+            with self._lock:
+                self.hits += 1
+            return value
+
+        try:
+            value = self.get(digest)
+            if value is None:
+                value = compute(content)
+                self.put(digest, value)
+            future.set_result(value)
+            return value
+        except BaseException as error:
+            future.set_exception(error)
+            raise
+        finally:
+            with self._lock:
+                del self._pending[digest]
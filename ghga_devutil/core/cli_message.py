@@ -16,24 +16,29 @@
 
 """Command line message functionality."""
 
+from functools import lru_cache
 from typing import Union
 
-from rich.console import Console
 
-console = Console(stderr=False)
-err_console = Console(stderr=True)
+@lru_cache(maxsize=None)
+def get_console(stderr: bool = False):
+    """Returns the rich console for the given stream, creating it on first use so
+    that importing this module stays cheap."""
+    from rich.console import Console  # pylint: disable=import-outside-toplevel
+
+    return Console(stderr=stderr)
 
 
 def err(message: Union[str, BaseException]) -> None:
     """Print an error message."""
-    err_console.print(message, style="red")
+    get_console(stderr=True).print(message, style="red")
 
 
 def info(message: str) -> None:
     """Print an info message."""
-    console.print(message, style="white")
+    get_console().print(message, style="white")
 
 
 def warn(message: str) -> None:
     """Print a warning message"""
-    err_console.print(message, style="yellow")
+    get_console(stderr=True).print(message, style="yellow")
@@ -0,0 +1,186 @@
+# Copyright 2021 - 2023 Universität Tübingen, DKFZ, EMBL, and Universität zu Köln
+# for the German Human Genome-Phenome Archive (GHGA)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+"""Rule table deriving the configuration variables of services from their shape
+
+The default rules are extended by the rules of installed plugins, which are
+registered in the "ghga_devutil.config_rules" entry point group."""
+
+from functools import lru_cache
+from typing import FrozenSet, List, NamedTuple, Sequence, Tuple
+
+from ghga_devutil.core.cache import LRUCache
+from ghga_devutil.core.hooks import group_entry_points
+from ghga_devutil.core.models import ConfigVariable, Service
+
+ENTRY_POINT_GROUP = "ghga_devutil.config_rules"
+
+REST = "rest"
+EVENTS = "events"
+MONGODB = "mongodb"
+S3 = "s3"
+VAULT = "vault"
+
+
+class ServiceShape(NamedTuple):
+    """The structural features of a service that determine its configuration
+    variables: which interfaces and storages it uses and the config prefixes of
+    its produced and consumed events. Many services share the same shape."""
+
+    features: FrozenSet[str]
+    event_configs: FrozenSet[str]
+
+
+def service_shape(service: Service) -> ServiceShape:
+    """Returns the shape of a service."""
+    events = service.api.events.produces + service.api.events.consumes
+    features = {
+        feature
+        for feature, present in (
+            (REST, service.api.rest.produces),
+            (EVENTS, events),
+            (MONGODB, service.storage.mongodb),
+            (S3, service.storage.s3),
+            (VAULT, service.storage.vault),
+        )
+        if present
+    }
+    return ServiceShape(
+        features=frozenset(features),
+        event_configs=frozenset(event.config for event in events),
+    )
+
+
+class ConfigRule(NamedTuple):
+    """A rule adding configuration variables to services that have the required
+    feature. The variables are given as pairs of name and description. Per-event
+    variables are added for every event config prefix in sorted order, with
+    "{config}" in their name replaced by the prefix."""
+
+    requires: str
+    variables: Tuple[Tuple[str, str], ...] = ()
+    per_event: Tuple[Tuple[str, str], ...] = ()
+
+
+DEFAULT_CONFIG_RULES: Tuple[ConfigRule, ...] = (
+    ConfigRule(
+        requires=REST,
+        variables=(
+            ("host", "The hostname or IP address to bind the HTTP server to"),
+            ("port", "The port to bind the HTTP server to"),
+        ),
+    ),
+    ConfigRule(
+        requires=EVENTS,
+        variables=(("kafka_servers", "A list of Apache Kafka servers to connect to"),),
+        per_event=(
+            ("{config}_topic", "An Apache Kafka event topic"),
+            ("{config}_type", "An Apache Kafka event schema"),
+        ),
+    ),
+    ConfigRule(
+        requires=MONGODB,
+        variables=(
+            ("db_connection_str", "The MongoDB connection URI"),
+            ("db_name", "The MongoDB database name"),
+        ),
+    ),
+    ConfigRule(
+        requires=S3,
+        variables=(
+            ("s3_endpoint_url", "The S3 endpoint URL"),
+            ("s3_access_key_id", "The S3 access key ID"),
+            ("s3_secret_access_key", "The S3 secret access key"),
+        ),
+    ),
+    ConfigRule(
+        requires=VAULT,
+        variables=(
+            ("vault_url", "The URL of the HashiCorp Vault server"),
+            ("vault_role_id", "The AppRole role ID used to authenticate at Vault"),
+            ("vault_secret_id", "The AppRole secret ID used to authenticate at Vault"),
+        ),
+    ),
+)
+
+
+class ConfigRuleTable:
+    """Derives configuration variables by applying a table of rules in order.
+
+    The rules are compiled once into their configuration variable models, and
+    the derived variables are memoized per service shape, so that services of
+    the same shape share the result."""
+
+    def __init__(self, rules: Sequence[ConfigRule], cache_size: int = 1024):
+        self._compiled = [
+            (
+                rule.requires,
+                tuple(
+                    ConfigVariable(name=name, description=description)
+                    for name, description in rule.variables
+                ),
+                rule.per_event,
+            )
+            for rule in rules
+        ]
+        self.cache: LRUCache[Tuple[ConfigVariable, ...]] = LRUCache(cache_size)
+
+    def _derive(self, shape: ServiceShape) -> Tuple[ConfigVariable, ...]:
+        config: List[ConfigVariable] = []
+        for requires, variables, per_event in self._compiled:
+            if requires not in shape.features:
+                continue
+            config.extend(variables)
+            for event_config in sorted(shape.event_configs):
+                for name, description in per_event:
+                    config.append(
+                        ConfigVariable(
+                            name=name.format(config=event_config),
+                            description=description,
+                        )
+                    )
+        return tuple(config)
+
+    def derive(self, service: Service) -> List[ConfigVariable]:
+        """Returns the configuration variables of a service."""
+        shape = service_shape(service)
+        config = self.cache.get(shape)
+        if config is None:
+            config = self._derive(shape)
+            self.cache.put(shape, config)
+        return list(config)
+
+
+def entry_point_config_rules() -> List[ConfigRule]:
+    """Returns the rules of the "ghga_devutil.config_rules" entry point group,
+    ordered by entry point name. An entry point may refer to a sequence of rules
+    or to a factory returning one."""
+    rules: List[ConfigRule] = []
+    entry_points = sorted(
+        group_entry_points(ENTRY_POINT_GROUP), key=lambda entry_point: entry_point.name
+    )
+    for entry_point in entry_points:
+        target = entry_point.load()
+        rules.extend(target() if callable(target) else target)
+    return rules
+
+
+@lru_cache(maxsize=None)
+def default_rule_table() -> ConfigRuleTable:
+    """Returns the rule table used to annotate services: the default rules
+    followed by the rules of installed plugins. The table is created on first
+    use and shared afterwards."""
+    return ConfigRuleTable((*DEFAULT_CONFIG_RULES, *entry_point_config_rules()))
@@ -0,0 +1,211 @@
+# Copyright 2021 - 2023 Universität Tübingen, DKFZ, EMBL, and Universität zu Köln
+# for the German Human Genome-Phenome Archive (GHGA)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+"""Ingestion of the configuration schemas and example configurations that
+services ship in their repositories"""
+
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Mapping, NamedTuple, Optional, Tuple
+
+import yaml
+
+from ghga_devutil.core import hooks
+from ghga_devutil.core.cache import ContentCache
+from ghga_devutil.core.exceptions import ConfigSchemaError
+from ghga_devutil.core.models import ConfigVariable
+
+try:
+    from yaml import CSafeLoader as SafeLoader
+except ImportError:  # pragma: no cover
+    from yaml import SafeLoader
+
+CONFIG_SCHEMA_FILE = "config_schema.json"
+EXAMPLE_CONFIG_FILE = "example_config.yaml"
+
+# change the namespaces whenever the parsing changes to invalidate the caches
+SCHEMA_CACHE_NAMESPACE = "config-schema-v1"
+EXAMPLE_CACHE_NAMESPACE = "example-config-v1"
+
+
+class ServiceConfigSpec(NamedTuple):
+    """The documented configuration variables of a service in schema order, and
+    the values of its example configuration by variable name"""
+
+    variables: Tuple[ConfigVariable, ...]
+    example: Mapping[str, str]
+
+
+EMPTY_CONFIG_SPEC = ServiceConfigSpec(variables=(), example={})
+
+
+def _format_value(value: Any) -> str:
+    """Returns a configuration value as text, strings are returned unchanged."""
+    if isinstance(value, str):
+        return value
+    return json.dumps(value, sort_keys=True)
+
+
+def _schema_type(prop: Any) -> Optional[str]:
+    """Returns a short description of the type of a JSON schema property. Boolean
+    schemas, which accept anything or nothing, have no type."""
+    if not isinstance(prop, Mapping):
+        return None
+    if "$ref" in prop:
+        return prop["$ref"].rsplit("/", 1)[-1]
+    if "type" in prop:
+        prop_type = prop["type"]
+        if isinstance(prop_type, list):
+            return " or ".join(prop_type)
+        if prop_type == "array" and isinstance(prop.get("items"), Mapping):
+            item_type = _schema_type(prop["items"])
+            return f"array[{item_type}]" if item_type else prop_type
+        return prop_type
+    for key in ("anyOf", "oneOf", "allOf"):
+        if key in prop:
+            types = [_schema_type(option) for option in prop[key]]
+            return " or ".join(option for option in types if option) or None
+    if "enum" in prop:
+        return "enum"
+    return None
+
+
+def parse_config_schema(content: bytes) -> List[List[Optional[str]]]:
+    """Parses a JSON schema of a configuration into entries of the name,
+    description, type and default of every top-level property."""
+    schema = json.loads(content)
+    if not isinstance(schema, dict) or not isinstance(
+        schema.get("properties", {}), dict
+    ):
+        raise ValueError("not a JSON schema of an object")
+    entries: List[List[Optional[str]]] = []
+    for name, prop in schema.get("properties", {}).items():
+        if not isinstance(prop, Mapping):
+            entries.append([name, "", None, None])
+            continue
+        description = prop.get("description") or prop.get("title") or ""
+        entries.append(
+            [
+                name,
+                " ".join(description.split()),
+                _schema_type(prop),
+                _format_value(prop["default"]) if "default" in prop else None,
+            ]
+        )
+    return entries
+
+
+def parse_example_config(content: bytes) -> Dict[str, str]:
+    """Parses an example configuration into its values by variable name."""
+    config = yaml.load(content, Loader=SafeLoader)
+    if config is None:
+        return {}
+    if not isinstance(config, dict):
+        raise ValueError("not a mapping of configuration variables")
+    return {str(name): _format_value(value) for name, value in config.items()}
+
+
+class ServiceConfigReader:
+    """Reads the configuration schemas and example configurations of services
+    from a directory containing a checkout of every service repository, named
+    like the service. Parsed files are cached by their content digest, in memory
+    and optionally in a cache directory, so that files shared by several services
+    or unchanged since an earlier run are not parsed again."""
+
+    def __init__(
+        self,
+        repos_dir: Path,
+        cache_dir: Optional[Path] = None,
+        jobs: Optional[int] = None,
+    ):
+        if not repos_dir.is_dir():
+            raise NotADirectoryError(f"'{repos_dir}' is not a directory.")
+        self.repos_dir = repos_dir
+        self.jobs = jobs or min(32, (os.cpu_count() or 1) + 4)
+        self.schema_cache = ContentCache(SCHEMA_CACHE_NAMESPACE, cache_dir)
+        self.example_cache = ContentCache(EXAMPLE_CACHE_NAMESPACE, cache_dir)
+
+    @staticmethod
+    def _parse(path: Path, cache: ContentCache, parse) -> Optional[Any]:
+        """Parses a file through a cache, returns None if the file is missing."""
+        try:
+            content = path.read_bytes()
+        except FileNotFoundError:
+            return None
+        try:
+            return cache.get_or_compute(content, parse)
+        except (ValueError, yaml.YAMLError) as error:
+            raise ConfigSchemaError(path, str(error)) from error
+
+    def read(self, service_name: str) -> ServiceConfigSpec:
+        """Reads the configuration files of one service. Missing files are
+        treated as empty."""
+        repo_dir = self.repos_dir / service_name
+        with hooks.span(hooks.PARSE, f"{service_name} config schema"):
+            entries = self._parse(
+                repo_dir / CONFIG_SCHEMA_FILE, self.schema_cache, parse_config_schema
+            )
+            example = self._parse(
+                repo_dir / EXAMPLE_CONFIG_FILE,
+                self.example_cache,
+                parse_example_config,
+            )
+        return ServiceConfigSpec(
+            variables=tuple(
+                ConfigVariable(
+                    name=name, description=description, type=type_, default=default
+                )
+                for name, description, type_, default in entries or ()
+            ),
+            example=example or {},
+        )
+
+    def read_all(self, service_names: Iterable[str]) -> Dict[str, ServiceConfigSpec]:
+        """Reads the configuration files of several services concurrently."""
+        names = list(dict.fromkeys(service_names))
+        with ThreadPoolExecutor(max_workers=self.jobs) as executor:
+            return dict(zip(names, executor.map(hooks.nesting(self.read), names)))
+
+
+def merge_config(
+    config: Iterable[ConfigVariable], spec: ServiceConfigSpec
+) -> List[ConfigVariable]:
+    """Merges the documented configuration of a service into derived configuration
+    variables: descriptions, types and defaults are taken from the schema and
+    values from the example configuration. Documented variables that were not
+    derived are appended in schema order."""
+    documented = {variable.name: variable for variable in spec.variables}
+    merged: List[ConfigVariable] = []
+    for variable in config:
+        schema_variable = documented.pop(variable.name, None)
+        if schema_variable is not None:
+            variable = variable.copy(
+                update={
+                    "description": schema_variable.description or variable.description,
+                    "type": schema_variable.type,
+                    "default": schema_variable.default,
+                }
+            )
+        merged.append(variable)
+    merged.extend(documented.values())
+    return [
+        variable.copy(update={"value": spec.example[variable.name]})
+        if variable.name in spec.example
+        else variable
+        for variable in merged
+    ]
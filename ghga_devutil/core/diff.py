@@ -0,0 +1,264 @@
+# Copyright 2021 - 2023 Universität Tübingen, DKFZ, EMBL, and Universität zu Köln
+# for the German Human Genome-Phenome Archive (GHGA)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+"""Structural comparison of two landscapes of annotated services"""
+
+from typing import Any, Dict, Iterator, List, Mapping, NamedTuple, Optional, Tuple
+
+from ghga_devutil.core.graph import Edge, iter_raw_edges
+from ghga_devutil.core.hashing import hash_text
+from ghga_devutil.core.models import AnnotatedService
+
+ADDED = "added"
+REMOVED = "removed"
+CHANGED = "changed"
+
+SERVICE = "service"
+STORAGE = "storage"
+CONFIG = "config"
+REST_PRODUCES = "rest.produces"
+REST_CONSUMES = "rest.consumes"
+EVENTS_PRODUCES = "events.produces"
+EVENTS_CONSUMES = "events.consumes"
+EDGES = "edges"
+
+BUCKET_DIGITS = 2
+
+CHANGE_SIGNS = {ADDED: "+", REMOVED: "-", CHANGED: "~"}
+SECTION_LABELS = {
+    SERVICE: "service",
+    STORAGE: "storage",
+    CONFIG: "config",
+    REST_PRODUCES: "produced endpoint",
+    REST_CONSUMES: "consumed endpoint",
+    EVENTS_PRODUCES: "produced event",
+    EVENTS_CONSUMES: "consumed event",
+    EDGES: "edge",
+}
+
+
+class MerkleNode(NamedTuple):
+    """A node of a Merkle tree over a landscape. The digest of an inner node is
+    derived from the keys and digests of its children, so that equal digests
+    imply equal subtrees. Leaves carry the compared items by key."""
+
+    digest: str
+    children: Mapping[str, "MerkleNode"]
+    items: Mapping[str, Any] = {}
+
+
+def _fields(value: Any) -> Dict[str, Any]:
+    """Returns the fields of a flat model, named tuple or mapping."""
+    if hasattr(value, "_asdict"):
+        return value._asdict()
+    return dict(getattr(value, "__dict__", value))
+
+
+def _canonical(value: Any) -> Any:
+    """Returns the fields of a flat model, or the value itself otherwise."""
+    return getattr(value, "__dict__", value)
+
+
+def _leaf(items: Dict[str, Any]) -> MerkleNode:
+    """Returns a leaf over items that are flat models, tuples or mappings of
+    plain values, whose representation is canonical and much cheaper to compute
+    than JSON. Items are hashed together, since they are only compared one by
+    one if the digests of the leaves differ."""
+    digest = hash_text(*(f"{key}:{_canonical(items[key])!r}" for key in sorted(items)))
+    return MerkleNode(digest, {}, items)
+
+
+def _inner(children: Dict[str, MerkleNode]) -> MerkleNode:
+    digest = hash_text(
+        *(f"{key}:{children[key].digest}" for key in sorted(children)),
+    )
+    return MerkleNode(digest, children)
+
+
+def _service_edges(service: AnnotatedService) -> Dict[str, Edge]:
+    """Returns the edges of the communication graph a service owns, i.e. the
+    edges of the events it produces and of the endpoints it provides."""
+    return {
+        f"{edge.source} -> {edge.target} {edge.label}": edge
+        for edge in iter_raw_edges({service.shortname: service})
+    }
+
+
+def service_tree(service: AnnotatedService) -> MerkleNode:
+    """Returns the Merkle tree over the sections of an annotated service."""
+    rest, events = service.api.rest, service.api.events
+    return _inner(
+        {
+            SERVICE: _leaf(
+                {
+                    "name": service.name,
+                    "summary": service.summary,
+                    "version": service.version,
+                }
+            ),
+            STORAGE: _leaf(
+                {
+                    f"{kind} {getattr(item, field)}": item
+                    for kind, field in (
+                        ("s3", "bucket"),
+                        ("mongodb", "db_name"),
+                        ("vault", "path"),
+                    )
+                    for item in getattr(service.storage, kind)
+                }
+            ),
+            CONFIG: _leaf({variable.name: variable for variable in service.config}),
+            REST_PRODUCES: _leaf(
+                {f"{item.method} {item.path}": item for item in rest.produces}
+            ),
+            REST_CONSUMES: _leaf(
+                {
+                    f"{item.method} {item.path} of {item.service}": item
+                    for item in rest.consumes
+                }
+            ),
+            EVENTS_PRODUCES: _leaf(
+                {f"{item.topic} ({item.type})": item for item in events.produces}
+            ),
+            EVENTS_CONSUMES: _leaf(
+                {f"{item.topic} ({item.type})": item for item in events.consumes}
+            ),
+            EDGES: _leaf(_service_edges(service)),
+        }
+    )
+
+
+def _bucket(shortname: str) -> str:
+    return hash_text(shortname)[:BUCKET_DIGITS]
+
+
+def landscape_tree(services: Mapping[str, AnnotatedService]) -> MerkleNode:
+    """Returns the Merkle tree over a landscape of annotated services. Services
+    are spread over up to 256 buckets by the hash of their shortname, each
+    bucket has a subtree per service keyed by its shortname."""
+    buckets: Dict[str, Dict[str, MerkleNode]] = {}
+    for shortname, service in services.items():
+        buckets.setdefault(_bucket(shortname), {})[shortname] = service_tree(service)
+    return _inner({key: _inner(bucket) for key, bucket in buckets.items()})
+
+
+class Change(NamedTuple):
+    """A difference between two landscapes. The section and item are empty for
+    added or removed services, the item is empty for changed service
+    metadata."""
+
+    change: str
+    service: str
+    section: str = ""
+    item: str = ""
+    details: Tuple[str, ...] = ()
+
+    def __str__(self) -> str:
+        sign = CHANGE_SIGNS[self.change]
+        if not self.section:
+            return f"{sign} service {self.service}"
+        label = SECTION_LABELS[self.section]
+        item = f" {self.item}" if self.item else ""
+        details = f": {'; '.join(self.details)}" if self.details else ""
+        return f"{sign} {self.service} {label}{item}{details}"
+
+
+def _format_value(value: Any) -> str:
+    if isinstance(value, list):
+        return f"[{', '.join(str(item) for item in value)}]"
+    return str(value)
+
+
+def field_changes(old: Any, new: Any) -> Tuple[str, ...]:
+    """Returns descriptions of the fields that differ between two values."""
+    old_fields, new_fields = _fields(old), _fields(new)
+    return tuple(
+        f"{name} {_format_value(old_fields.get(name))}"
+        + f" -> {_format_value(new_fields.get(name))}"
+        for name in sorted(old_fields.keys() | new_fields.keys())
+        if old_fields.get(name) != new_fields.get(name)
+    )
+
+
+def _diff_section(
+    service: str, section: str, old: MerkleNode, new: MerkleNode
+) -> Iterator[Change]:
+    if old.digest == new.digest:
+        return
+    if section == SERVICE:
+        yield Change(CHANGED, service, section, "", field_changes(old.items, new.items))
+        return
+    for key in sorted(old.items.keys() - new.items.keys()):
+        yield Change(REMOVED, service, section, key)
+    for key in sorted(new.items.keys() - old.items.keys()):
+        yield Change(ADDED, service, section, key)
+    for key in sorted(old.items.keys() & new.items.keys()):
+        if _canonical(old.items[key]) != _canonical(new.items[key]):
+            yield Change(
+                CHANGED,
+                service,
+                section,
+                key,
+                field_changes(old.items[key], new.items[key]),
+            )
+
+
+def _edge_changes(change: str, service: str, tree: MerkleNode) -> Iterator[Change]:
+    for key in sorted(tree.children[EDGES].items):
+        yield Change(change, service, EDGES, key)
+
+
+def _diff_service(
+    shortname: str, old: Optional[MerkleNode], new: Optional[MerkleNode]
+) -> Iterator[Change]:
+    if old is None and new is not None:
+        yield Change(ADDED, shortname)
+        yield from _edge_changes(ADDED, shortname, new)
+    elif new is None and old is not None:
+        yield Change(REMOVED, shortname)
+        yield from _edge_changes(REMOVED, shortname, old)
+    elif old is not None and new is not None and old.digest != new.digest:
+        for section, old_section in old.children.items():
+            yield from _diff_section(
+                shortname, section, old_section, new.children[section]
+            )
+
+
+def diff_trees(old: MerkleNode, new: MerkleNode) -> List[Change]:
+    """Returns the differences between two landscapes given by their Merkle
+    trees, ordered by service. Only subtrees whose digests differ are descended
+    into, so the cost depends on the number of changes rather than the size of
+    the landscapes. The edges owned by added and removed services are reported
+    with them."""
+    changes: List[Change] = []
+    if old.digest == new.digest:
+        return changes
+    empty = _inner({})
+    for key in old.children.keys() | new.children.keys():
+        old_bucket = old.children.get(key, empty)
+        new_bucket = new.children.get(key, empty)
+        if old_bucket.digest == new_bucket.digest:
+            continue
+        for shortname in old_bucket.children.keys() | new_bucket.children.keys():
+            changes.extend(
+                _diff_service(
+                    shortname,
+                    old_bucket.children.get(shortname),
+                    new_bucket.children.get(shortname),
+                )
+            )
+    changes.sort(key=lambda change: change.service)
+    return changes
@@ -0,0 +1,528 @@
+# Copyright 2021 - 2023 Universität Tübingen, DKFZ, EMBL, and Universität zu Köln
+# for the German Human Genome-Phenome Archive (GHGA)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+"""Discovery of the REST endpoints and events services actually use, by scanning
+the Python sources in their repositories
+
+The sources are parsed with ast and searched for calls of HTTP clients with a
+literal or formatted URL path, for publishing of events through hexkit or
+Kafka clients, and for the topics and types of interest of event subscribers.
+Topics and types read from configuration attributes, like `config.x_topic`,
+are matched to the events of the specification by their config prefix `x`."""
+
+import ast
+import hashlib
+import json
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+from ghga_devutil.core.hashing import hash_text
+from ghga_devutil.core.models import (
+    API,
+    ConsumedRESTEndpoint,
+    EventInterface,
+    RESTInterface,
+    Service,
+    ServiceEvent,
+)
+
+# change the namespace whenever the scanning changes to invalidate the cache
+DISCOVER_CACHE_NAMESPACE = "discover-v2"
+
+SKIPPED_DIRS = {
+    "__pycache__",
+    "build",
+    "dist",
+    "node_modules",
+    "site-packages",
+    "test",
+    "tests",
+    "venv",
+}
+HTTP_METHODS = {"get", "post", "put", "patch", "delete"}
+PUBLISH_CALLS = {"publish", "produce", "send", "send_and_wait"}
+SUBSCRIBE_CALLS = {"subscribe", "AIOKafkaConsumer", "KafkaConsumer"}
+INTEREST_ATTRIBUTES = {"topics_of_interest": "topic", "types_of_interest": "type"}
+CONFIG_SUFFIXES = {"_topic": "topic", "_type": "type"}
+PATH_PARAMETER = re.compile(r"\{[^/}]*\}")
+
+REST = "rest"
+PUBLISH = "publish"
+SUBSCRIBE = "subscribe"
+
+
+class Finding(NamedTuple):
+    """A use of a REST endpoint or an event found in a source file. Events carry
+    either a literal topic or type or the config prefix they are read from."""
+
+    kind: str
+    file: str
+    line: int
+    method: str = ""
+    path: str = ""
+    topic: str = ""
+    type: str = ""
+    config: str = ""
+
+
+def _url_template(node: ast.AST) -> Optional[str]:
+    """Returns the text of a literal or formatted string, with every formatted
+    value replaced by a parameter in braces."""
+    if isinstance(node, ast.Constant) and isinstance(node.value, str):
+        return node.value
+    if isinstance(node, ast.JoinedStr):
+        parts = []
+        for value in node.values:
+            if isinstance(value, ast.Constant):
+                parts.append(str(value.value))
+            else:
+                parts.append("{}")
+        return "".join(parts)
+    if isinstance(node, ast.BinOp) and isinstance(node.op, ast.Add):
+        return "".join(
+            "{}" if part is None else part
+            for part in (_url_template(node.left), _url_template(node.right))
+        )
+    return None
+
+
+def url_path(url: str) -> Optional[str]:
+    """Returns the path of a URL template or None if it has no path. A
+    leading parameter is taken for the base URL of the called service."""
+    url = re.sub(r"^[a-z]+://[^/]*", "", url)
+    if url.startswith("{}"):
+        url = url[2:]
+    if not url.startswith("/") or url.startswith("//"):
+        return None
+    return url.split("?", 1)[0].rstrip("/") or "/"
+
+
+def _event_ref(node: ast.AST) -> Tuple[str, str]:
+    """Returns the literal value or the config prefix referenced by an
+    expression giving a topic or type, as a pair of which one is empty."""
+    if isinstance(node, ast.Constant) and isinstance(node.value, str):
+        return node.value, ""
+    if isinstance(node, ast.Attribute):
+        for suffix in CONFIG_SUFFIXES:
+            if node.attr.endswith(suffix):
+                return "", node.attr[: -len(suffix)]
+    return "", ""
+
+
+def _call_name(node: ast.Call) -> str:
+    if isinstance(node.func, ast.Attribute):
+        return node.func.attr
+    if isinstance(node.func, ast.Name):
+        return node.func.id
+    return ""
+
+
+class _SourceVisitor(ast.NodeVisitor):
+    """Collects the findings of one module."""
+
+    def __init__(self, file: str):
+        self.file = file
+        self.findings: List[Finding] = []
+
+    def _event(self, kind: str, line: int, field: str, node: ast.AST) -> None:
+        literal, config = _event_ref(node)
+        if literal or config:
+            self.findings.append(
+                Finding(
+                    kind=kind,
+                    file=self.file,
+                    line=line,
+                    topic=literal if field == "topic" else "",
+                    type=literal if field == "type" else "",
+                    config=config,
+                )
+            )
+
+    def _events(self, kind: str, line: int, field: str, node: ast.AST) -> None:
+        items: List[ast.AST] = (
+            list(node.elts)
+            if isinstance(node, (ast.List, ast.Tuple, ast.Set))
+            else [node]
+        )
+        for item in items:
+            self._event(kind, line, field, item)
+
+    def visit_Call(self, node: ast.Call) -> None:  # noqa: N802
+        """Records HTTP client calls and publishing or subscribing of events."""
+        name = _call_name(node)
+        keywords = {keyword.arg: keyword.value for keyword in node.keywords}
+        if name in HTTP_METHODS and isinstance(node.func, ast.Attribute):
+            url = node.args[0] if node.args else keywords.get("url")
+            template = _url_template(url) if url is not None else None
+            path = url_path(template) if template is not None else None
+            if path is not None:
+                self.findings.append(
+                    Finding(REST, self.file, node.lineno, name.upper(), path)
+                )
+        elif name in PUBLISH_CALLS:
+            topic = keywords.get("topic") or (
+                node.args[0] if node.args and name != "publish" else None
+            )
+            if topic is not None:
+                self._event(PUBLISH, node.lineno, "topic", topic)
+            if "type_" in keywords:
+                self._event(PUBLISH, node.lineno, "type", keywords["type_"])
+        elif name in SUBSCRIBE_CALLS:
+            for arg in [*node.args, *filter(None, [keywords.get("topics")])]:
+                self._events(SUBSCRIBE, node.lineno, "topic", arg)
+        self.generic_visit(node)
+
+    def _interest(self, targets: Iterable[ast.AST], value: Optional[ast.AST]) -> None:
+        for target in targets:
+            name = getattr(target, "id", None) or getattr(target, "attr", None)
+            if value is not None and name in INTEREST_ATTRIBUTES:
+                field = INTEREST_ATTRIBUTES[name]
+                self._events(SUBSCRIBE, value.lineno, field, value)
+
+    def visit_Assign(self, node: ast.Assign) -> None:  # noqa: N802
+        """Records the topics and types of interest of event subscribers."""
+        self._interest(node.targets, node.value)
+        self.generic_visit(node)
+
+    def visit_AnnAssign(self, node: ast.AnnAssign) -> None:  # noqa: N802
+        """Records the topics and types of interest of event subscribers."""
+        self._interest([node.target], node.value)
+        self.generic_visit(node)
+
+
+def scan_source(content: bytes, file: str) -> Tuple[List[Finding], str]:
+    """Returns the findings in the source of a module, or an error message if
+    the source cannot be parsed."""
+    try:
+        tree = ast.parse(content, filename=file)
+    except (SyntaxError, ValueError) as error:
+        return [], f"{file}: {error}"
+    visitor = _SourceVisitor(file)
+    visitor.visit(tree)
+    return visitor.findings, ""
+
+
+def _scan_job(job: Tuple[bytes, str]) -> Tuple[List[Finding], str]:
+    return scan_source(*job)
+
+
+def iter_source_files(repo_dir: Path) -> Iterator[Path]:
+    """Yields the Python source files of a repository in sorted order, skipping
+    hidden directories, tests and build or environment directories."""
+    for root, dirs, files in os.walk(repo_dir):
+        dirs[:] = sorted(
+            name
+            for name in dirs
+            if not name.startswith(".") and name not in SKIPPED_DIRS
+        )
+        for name in sorted(files):
+            if name.endswith(".py"):
+                yield Path(root) / name
+
+
+class SourceScanner:
+    """Scans the Python sources of repositories in parallel worker processes.
+
+    The findings of every file are cached per repository together with the
+    modification time, size and content digest of the file. Files whose
+    modification time and size did not change are not read again, and files
+    whose content did not change are not parsed again. Errors of files that
+    cannot be parsed are cached as well and reported on every scan."""
+
+    def __init__(self, cache_dir: Optional[Path] = None, jobs: Optional[int] = None):
+        self.cache_dir = cache_dir
+        self.jobs = jobs or os.cpu_count() or 1
+        self.scanned = 0
+        self.errors: List[str] = []
+
+    def _cache_path(self, repo_dir: Path) -> Optional[Path]:
+        if self.cache_dir is None:
+            return None
+        key = hash_text(str(repo_dir.resolve()))
+        return self.cache_dir / DISCOVER_CACHE_NAMESPACE / f"{key}.json"
+
+    def _load_cache(self, repo_dir: Path) -> Dict[str, Dict]:
+        cache_path = self._cache_path(repo_dir)
+        if cache_path is None:
+            return {}
+        try:
+            return json.loads(cache_path.read_bytes())
+        except (OSError, ValueError):
+            return {}
+
+    def _save_cache(self, repo_dir: Path, entries: Dict[str, Dict]) -> None:
+        cache_path = self._cache_path(repo_dir)
+        if cache_path is None:
+            return
+        try:
+            cache_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = cache_path.with_suffix(".tmp")
+            tmp_path.write_text(json.dumps(entries), encoding="utf-8")
+            tmp_path.replace(cache_path)
+        except OSError:
+            pass  # the cache is an optimization, failing to persist is harmless
+
+    def scan(self, repo_dirs: Iterable[Path]) -> Dict[Path, List[Finding]]:
+        """Returns the findings in the sources of every repository that exists
+        and contains Python sources."""
+        repo_dirs = [repo_dir for repo_dir in repo_dirs if repo_dir.is_dir()]
+        caches = {repo_dir: self._load_cache(repo_dir) for repo_dir in repo_dirs}
+        entries: Dict[Path, Dict[str, Dict]] = {repo_dir: {} for repo_dir in repo_dirs}
+        jobs: List[Tuple[Path, str, Dict, bytes]] = []
+        for repo_dir in repo_dirs:
+            for path in iter_source_files(repo_dir):
+                file = path.relative_to(repo_dir).as_posix()
+                stat = path.stat()
+                entry: Dict[str, Any] = {
+                    "mtime": stat.st_mtime_ns,
+                    "size": stat.st_size,
+                }
+                cached = caches[repo_dir].get(file)
+                if cached and all(cached[key] == entry[key] for key in entry):
+                    entries[repo_dir][file] = cached
+                    continue
+                content = path.read_bytes()
+                entry["digest"] = hashlib.sha256(content).hexdigest()
+                if cached and cached.get("digest") == entry["digest"]:
+                    entries[repo_dir][file] = {**cached, **entry}
+                    continue
+                jobs.append((repo_dir, file, entry, content))
+
+        self.scanned += len(jobs)
+        job_args = [(content, file) for _, file, _, content in jobs]
+        workers = min(self.jobs, len(jobs))
+        if workers <= 1:
+            results = [_scan_job(job) for job in job_args]
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                results = list(
+                    executor.map(
+                        _scan_job,
+                        job_args,
+                        chunksize=max(1, len(job_args) // (workers * 4)),
+                    )
+                )
+        for (repo_dir, file, entry, _), (findings, error) in zip(jobs, results):
+            entries[repo_dir][file] = {**entry, "findings": findings, "error": error}
+
+        for repo_dir in repo_dirs:
+            self._save_cache(repo_dir, entries[repo_dir])
+            self.errors.extend(
+                f"{repo_dir.name}/{entries[repo_dir][file]['error']}"
+                for file in sorted(entries[repo_dir])
+                if entries[repo_dir][file].get("error")
+            )
+        return {
+            repo_dir: [
+                Finding(*finding)
+                for file in sorted(entries[repo_dir])
+                for finding in entries[repo_dir][file]["findings"]
+            ]
+            for repo_dir in repo_dirs
+            if entries[repo_dir]
+        }
+
+
+def _path_pattern(path: str) -> str:
+    return PATH_PARAMETER.sub("{}", path)
+
+
+class _Providers:
+    """Resolves called paths to the services producing matching endpoints.
+    Parameters in called paths match any path segment of an endpoint."""
+
+    def __init__(self, services: List[Service]):
+        self.endpoints: Dict[Tuple[str, str], Tuple[str, str]] = {}
+        for service in services:
+            for endpoint in service.api.rest.produces:
+                self.endpoints.setdefault(
+                    (endpoint.method, _path_pattern(endpoint.path)),
+                    (service.shortname, endpoint.path),
+                )
+
+    def resolve(self, method: str, path: str) -> Optional[Tuple[str, str]]:
+        """Returns the shortname of the providing service and the path of the
+        endpoint as specified, or None if no service provides the endpoint."""
+        pattern = _path_pattern(path)
+        if (method, pattern) in self.endpoints:
+            return self.endpoints[(method, pattern)]
+        if "{}" not in pattern:
+            return None
+        regex = re.compile(
+            "/".join(
+                "[^/]+" if segment == "{}" else re.escape(segment)
+                for segment in pattern.split("/")
+            )
+            + "$"
+        )
+        for (candidate_method, candidate), provider in self.endpoints.items():
+            if candidate_method == method and regex.match(candidate):
+                return provider
+        return None
+
+
+class DiscoveredAPI(NamedTuple):
+    """The API usage of a service discovered in its sources, compared to its
+    specification"""
+
+    service: Service
+    rest_consumes: List[ConsumedRESTEndpoint]
+    unresolved_rest: List[Finding]
+    event_produces: List[ServiceEvent]
+    event_consumes: List[ServiceEvent]
+
+    def draft(self) -> API:
+        """Returns a draft of the API section of the specification, keeping the
+        produced REST endpoints of the specification."""
+        return API(
+            rest=RESTInterface(
+                produces=self.service.api.rest.produces, consumes=self.rest_consumes
+            ),
+            events=EventInterface(
+                produces=self.event_produces, consumes=self.event_consumes
+            ),
+        )
+
+    def diff(self) -> List[str]:
+        """Returns the differences of the discovered and the specified API as
+        lines prefixed with '+' for discovered and '-' for no longer found
+        items, and '?' for calls that no known service provides."""
+        lines: List[str] = []
+        spec = self.service.api
+        sections: List[Tuple[str, List, List]] = [
+            ("consumes REST", self.rest_consumes, spec.rest.consumes),
+            ("produces event", self.event_produces, spec.events.produces),
+            ("consumes event", self.event_consumes, spec.events.consumes),
+        ]
+        for label, found, specified in sections:
+            lines.extend(
+                f"+ {label} {_describe(item)}"
+                for item in found
+                if item not in specified
+            )
+            lines.extend(
+                f"- {label} {_describe(item)}"
+                for item in specified
+                if item not in found
+            )
+        lines.extend(
+            f"? calls {finding.method} {finding.path} at {finding.file}:"
+            + f"{finding.line}, which no known service provides"
+            for finding in self.unresolved_rest
+        )
+        return lines
+
+
+def _describe(item) -> str:
+    if isinstance(item, ConsumedRESTEndpoint):
+        return f"{item.method} {item.path} of {item.service}"
+    return f"{item.topic} ({item.type}) with config {item.config}"
+
+
+def _match_events(
+    kind: str,
+    findings: List[Finding],
+    specified: List[ServiceEvent],
+    known: Dict[Tuple[str, str], ServiceEvent],
+) -> List[ServiceEvent]:
+    """Returns the events referenced by findings of a kind: events of the
+    specification by config prefix, topic or type, and otherwise known events of
+    other services or drafts with placeholders."""
+    events: Dict[Tuple[str, str], ServiceEvent] = {}
+    by_config = {event.config: event for event in specified}
+    for finding in findings:
+        if finding.kind != kind:
+            continue
+        event = by_config.get(finding.config) if finding.config else None
+        if event is None:
+            event = next(
+                (
+                    candidate
+                    for candidate in specified
+                    if finding.topic
+                    and candidate.topic == finding.topic
+                    or finding.type
+                    and candidate.type == finding.type
+                ),
+                None,
+            )
+        if event is None and finding.topic and finding.type:
+            event = known.get((finding.topic, finding.type))
+        if event is None:
+            config = finding.config or re.sub(r"\W", "_", finding.topic or finding.type)
+            event = ServiceEvent(
+                topic=finding.topic or f"<{config}_topic>",
+                type=finding.type or f"<{config}_type>",
+                config=config,
+                description=f"Discovered in {finding.file}:{finding.line}",
+            )
+        events.setdefault((event.topic, event.type), event)
+    return list(events.values())
+
+
+def discover_api(
+    services: List[Service], findings: Dict[str, List[Finding]]
+) -> List[DiscoveredAPI]:
+    """Matches the findings in the sources of every service, given by service
+    name, against the landscape. Services without findings are skipped. REST
+    calls are resolved to the endpoints other services produce, calls of the
+    own endpoints of a service are ignored."""
+    providers = _Providers(services)
+    known: Dict[Tuple[str, str], ServiceEvent] = {}
+    for service in services:
+        for event in service.api.events.produces:
+            known.setdefault((event.topic, event.type), event)
+
+    discovered = []
+    for service in services:
+        if service.name not in findings:
+            continue
+        rest_consumes: Dict[Tuple[str, str, str], ConsumedRESTEndpoint] = {}
+        unresolved: List[Finding] = []
+        for finding in findings[service.name]:
+            if finding.kind != REST:
+                continue
+            provider = providers.resolve(finding.method, finding.path)
+            if provider is None:
+                unresolved.append(finding)
+            elif provider[0] != service.shortname:
+                shortname, path = provider
+                rest_consumes.setdefault(
+                    (shortname, finding.method, path),
+                    ConsumedRESTEndpoint(
+                        path=path, method=finding.method, service=shortname
+                    ),
+                )
+        discovered.append(
+            DiscoveredAPI(
+                service=service,
+                rest_consumes=list(rest_consumes.values()),
+                unresolved_rest=unresolved,
+                event_produces=_match_events(
+                    PUBLISH, findings[service.name], service.api.events.produces, known
+                ),
+                event_consumes=_match_events(
+                    SUBSCRIBE,
+                    findings[service.name],
+                    service.api.events.consumes,
+                    known,
+                ),
+            )
+        )
+    return discovered
@@ -0,0 +1,439 @@
+# Copyright 2021 - 2023 Universität Tübingen, DKFZ, EMBL, and Universität zu Köln
+# for the German Human Genome-Phenome Archive (GHGA)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+"""Ingestion of the payload schemas of events and checks of the compatibility of
+the schemas of producers and consumers
+
+Every service may document the payloads of its events in an AsyncAPI document
+or in one JSON schema per event type. Schemas are compiled into a normalized
+form with local references inlined and annotations dropped, and identified by
+the digest of that form, so that shared schemas are stored and checked once."""
+
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+
+import yaml
+
+from ghga_devutil.core.annotate import enumerate_producers
+from ghga_devutil.core.cache import ContentCache
+from ghga_devutil.core.exceptions import EventSchemaError
+from ghga_devutil.core.hashing import hash_text
+from ghga_devutil.core.models import Event, Service
+
+try:
+    from yaml import CSafeLoader as SafeLoader
+except ImportError:  # pragma: no cover
+    from yaml import SafeLoader
+
+ASYNCAPI_FILE = "asyncapi.yaml"
+EVENT_SCHEMA_DIR = "event_schemas"
+
+# change the namespace whenever the parsing changes to invalidate the cache
+EVENT_SCHEMA_CACHE_NAMESPACE = "event-schemas-v1"
+
+ANNOTATIONS = {
+    "$comment",
+    "$defs",
+    "$id",
+    "$schema",
+    "default",
+    "definitions",
+    "deprecated",
+    "description",
+    "example",
+    "examples",
+    "readOnly",
+    "title",
+    "writeOnly",
+}
+SCHEMA_MAPS = {"properties", "patternProperties"}
+LITERALS = {"const", "enum", "required"}
+
+# an event type documented for all topics, e.g. by a schema file per type
+ANY_TOPIC = ""
+
+
+def _resolve(root: Any, ref: str) -> Any:
+    """Returns the target of a local JSON pointer reference."""
+    target = root
+    for part in ref[2:].split("/"):
+        part = part.replace("~1", "/").replace("~0", "~")
+        try:
+            target = target[int(part) if isinstance(target, list) else part]
+        except (KeyError, IndexError, TypeError, ValueError) as error:
+            raise ValueError(f"cannot resolve reference '{ref}'") from error
+    return target
+
+
+def normalize_schema(
+    schema: Any, root: Any = None, resolving: Tuple[str, ...] = ()
+) -> Any:
+    """Returns the normalized form of a JSON schema: local references are
+    inlined, except for recursive ones, and annotations that do not restrict
+    the accepted payloads are dropped."""
+    root = schema if root is None else root
+    if isinstance(schema, list):
+        return [normalize_schema(item, root, resolving) for item in schema]
+    if not isinstance(schema, dict):
+        return schema
+    ref = schema.get("$ref")
+    if isinstance(ref, str) and ref.startswith("#/"):
+        if ref in resolving:
+            return {"$ref": ref}
+        return normalize_schema(_resolve(root, ref), root, (*resolving, ref))
+
+    normalized = {}
+    for key, value in schema.items():
+        if key in ANNOTATIONS:
+            continue
+        if key in SCHEMA_MAPS and isinstance(value, dict):
+            normalized[key] = {
+                name: normalize_schema(subschema, root, resolving)
+                for name, subschema in value.items()
+            }
+        elif key in LITERALS:
+            normalized[key] = value
+        else:
+            normalized[key] = normalize_schema(value, root, resolving)
+    return normalized
+
+
+def _messages(channel: Dict[str, Any], root: Any) -> Iterable[Dict[str, Any]]:
+    """Yields the messages of a channel of an AsyncAPI 2 or 3 document."""
+    candidates: List[Any] = []
+    for operation in ("publish", "subscribe"):
+        message = (channel.get(operation) or {}).get("message")
+        if isinstance(message, dict):
+            candidates.extend(message.get("oneOf", [message]))
+    candidates.extend((channel.get("messages") or {}).values())
+    for message in candidates:
+        if isinstance(message, dict) and isinstance(message.get("$ref"), str):
+            message = _resolve(root, message["$ref"])
+        if isinstance(message, dict):
+            yield message
+
+
+def parse_asyncapi(content: bytes) -> List[List[Any]]:
+    """Parses an AsyncAPI document into entries of the topic, the event type and
+    the normalized payload schema of every message. Channels are taken as topics
+    and the names of messages as event types."""
+    document = yaml.load(content, Loader=SafeLoader)
+    if not isinstance(document, dict) or not isinstance(
+        document.get("channels", {}), dict
+    ):
+        raise ValueError("not an AsyncAPI document")
+    entries: List[List[Any]] = []
+    for name, channel in document.get("channels", {}).items():
+        if not isinstance(channel, dict):
+            continue
+        topic = channel.get("address") or name
+        for message in _messages(channel, document):
+            event_type = (
+                message.get("name") or message.get("messageId") or message.get("title")
+            )
+            if event_type and "payload" in message:
+                entries.append(
+                    [topic, event_type, normalize_schema(message["payload"], document)]
+                )
+    return entries
+
+
+def parse_event_schema(content: bytes) -> Any:
+    """Parses the JSON schema of the payload of one event type."""
+    schema = json.loads(content)
+    if not isinstance(schema, (dict, bool)):
+        raise ValueError("not a JSON schema")
+    return normalize_schema(schema)
+
+
+def schema_digest(schema: Any) -> str:
+    """Returns the digest identifying a normalized schema."""
+    return hash_text(json.dumps(schema, sort_keys=True))
+
+
+class ServiceEventSchemas(NamedTuple):
+    """The schema digests of the events of one service by topic and type"""
+
+    digests: Dict[Tuple[str, str], str]
+
+    def lookup(self, event: Event) -> Optional[str]:
+        """Returns the digest of the schema of an event, if it is documented."""
+        return self.digests.get((event.topic, event.type)) or self.digests.get(
+            (ANY_TOPIC, event.type)
+        )
+
+
+class EventSchemaReader:
+    """Reads the event schemas of services from a directory containing a
+    checkout of every service repository, named like the service. A checkout
+    may contain an AsyncAPI document and a directory with one JSON schema per
+    event type, named like the type. Files are read concurrently and parsed
+    schemas are cached by the digest of the file contents, in memory and
+    optionally in a cache directory. Every distinct normalized schema is kept
+    once, shared by all events using it."""
+
+    def __init__(
+        self,
+        repos_dir: Path,
+        cache_dir: Optional[Path] = None,
+        jobs: Optional[int] = None,
+    ):
+        if not repos_dir.is_dir():
+            raise NotADirectoryError(f"'{repos_dir}' is not a directory.")
+        self.repos_dir = repos_dir
+        self.jobs = jobs or min(32, (os.cpu_count() or 1) + 4)
+        self.cache = ContentCache(EVENT_SCHEMA_CACHE_NAMESPACE, cache_dir)
+        self.schemas: Dict[str, Any] = {}
+
+    def _parse(self, path: Path, parse) -> Any:
+        try:
+            return self.cache.get_or_compute(path.read_bytes(), parse)
+        except (ValueError, yaml.YAMLError) as error:
+            raise EventSchemaError(path, str(error)) from error
+
+    def _add(self, schema: Any) -> str:
+        digest = schema_digest(schema)
+        self.schemas.setdefault(digest, schema)
+        return digest
+
+    def read(self, service_name: str) -> ServiceEventSchemas:
+        """Reads the event schemas of one service."""
+        repo_dir = self.repos_dir / service_name
+        digests: Dict[Tuple[str, str], str] = {}
+        schema_dir = repo_dir / EVENT_SCHEMA_DIR
+        if schema_dir.is_dir():
+            for path in sorted(schema_dir.glob("*.json")):
+                schema = self._parse(path, parse_event_schema)
+                digests[(ANY_TOPIC, path.stem)] = self._add(schema)
+        asyncapi_path = repo_dir / ASYNCAPI_FILE
+        if asyncapi_path.is_file():
+            for topic, event_type, schema in self._parse(asyncapi_path, parse_asyncapi):
+                digests[(topic, event_type)] = self._add(schema)
+        return ServiceEventSchemas(digests)
+
+    def read_all(self, service_names: Iterable[str]) -> Dict[str, ServiceEventSchemas]:
+        """Reads the event schemas of several services concurrently."""
+        names = list(dict.fromkeys(service_names))
+        with ThreadPoolExecutor(max_workers=self.jobs) as executor:
+            return dict(zip(names, executor.map(self.read, names)))
+
+
+def _types(schema: Dict[str, Any]) -> Optional[Set[str]]:
+    """Returns the set of JSON types a schema allows or None if unrestricted."""
+    if "type" not in schema:
+        return None
+    types = schema["type"]
+    types = set(types) if isinstance(types, list) else {types}
+    if "number" in types:
+        types.add("integer")
+    return types
+
+
+def _type_problems(producer: Dict, consumer: Dict, location: str) -> List[str]:
+    producer_types, consumer_types = _types(producer), _types(consumer)
+    if consumer_types is None:
+        return []
+    if producer_types is None:
+        return [f"{location}: must be of type {sorted(consumer_types)}"]
+    rejected = producer_types - consumer_types
+    if rejected:
+        return [f"{location}: type {sorted(rejected)} is not accepted"]
+    return []
+
+
+def _value_problems(producer: Dict, consumer: Dict, location: str) -> List[str]:
+    if "enum" in consumer:
+        accepted = consumer["enum"]
+    elif "const" in consumer:
+        accepted = [consumer["const"]]
+    else:
+        return []
+    if "enum" in producer:
+        produced = producer["enum"]
+    elif "const" in producer:
+        produced = [producer["const"]]
+    else:
+        return [f"{location}: only the values {accepted} are accepted"]
+    rejected = [value for value in produced if value not in accepted]
+    if rejected:
+        return [f"{location}: values {rejected} are not accepted"]
+    return []
+
+
+def _object_problems(producer: Dict, consumer: Dict, location: str) -> List[str]:
+    produced = producer.get("properties", {})
+    consumed = consumer.get("properties", {})
+    missing = set(consumer.get("required", [])) - set(producer.get("required", []))
+    problems = [
+        f"{location}.{name}: required but not always produced"
+        for name in sorted(missing)
+    ]
+    if consumer.get("additionalProperties") is False:
+        if producer.get("additionalProperties") is not False:
+            problems.append(f"{location}: additional properties are not accepted")
+        problems.extend(
+            f"{location}.{name}: produced but not accepted"
+            for name in sorted(set(produced) - set(consumed))
+        )
+    for name in sorted(set(produced) & set(consumed)):
+        problems.extend(
+            schema_incompatibilities(
+                produced[name], consumed[name], f"{location}.{name}"
+            )
+        )
+    if "items" in producer and "items" in consumer:
+        problems.extend(
+            schema_incompatibilities(
+                producer["items"], consumer["items"], f"{location}[]"
+            )
+        )
+    return problems
+
+
+def _alternatives(schema: Dict) -> Optional[List[Dict]]:
+    """Returns the alternatives of a schema using anyOf or oneOf, each combined
+    with the remaining keywords of the schema, or None if it has none."""
+    for keyword in ("anyOf", "oneOf"):
+        if isinstance(schema.get(keyword), list):
+            base = {key: value for key, value in schema.items() if key != keyword}
+            return [
+                {**base, **option} if isinstance(option, dict) else option
+                for option in schema[keyword]
+            ]
+    return None
+
+
+def schema_incompatibilities(
+    producer: Any, consumer: Any, location: str = "payload"
+) -> List[str]:
+    """Returns the reasons why payloads valid against the producer schema may be
+    rejected by the consumer schema. The check is conservative: it covers types,
+    enumerations, required and additional properties, array items and
+    alternatives, and assumes compatibility for other keywords and recursive
+    references."""
+    if consumer is False:
+        return [f"{location}: rejected by the consumer"]
+    if not isinstance(producer, dict) or not isinstance(consumer, dict):
+        return []
+    if "$ref" in producer or "$ref" in consumer:
+        return []
+
+    producer_options = _alternatives(producer)
+    if producer_options is not None:
+        return [
+            problem
+            for option in producer_options
+            for problem in schema_incompatibilities(option, consumer, location)
+        ]
+    consumer_options = _alternatives(consumer)
+    if consumer_options is not None:
+        if all(
+            schema_incompatibilities(producer, option, location)
+            for option in consumer_options
+        ):
+            return [f"{location}: matches none of the accepted alternatives"]
+        return []
+
+    return [
+        *_type_problems(producer, consumer, location),
+        *_value_problems(producer, consumer, location),
+        *_object_problems(producer, consumer, location),
+    ]
+
+
+class SchemaIncompatibility(NamedTuple):
+    """An incompatibility of the payload schemas of a producer and a consumer of
+    an event"""
+
+    topic: str
+    type: str
+    producer: str
+    consumer: str
+    problems: List[str]
+
+    def __str__(self) -> str:
+        header = (
+            f"{self.producer} -> {self.consumer} via {self.topic}"
+            + f" ({self.type}): incompatible payload schemas"
+        )
+        return "\n".join([header, *(f"  {problem}" for problem in self.problems)])
+
+
+class SchemaCheckResult(NamedTuple):
+    """The result of checking the event schemas of a landscape"""
+
+    incompatibilities: List[SchemaIncompatibility]
+    edges: int
+    unique_schemas: int
+    unique_pairs: int
+
+
+def check_event_schemas(
+    services: List[Service], reader: EventSchemaReader
+) -> SchemaCheckResult:
+    """Reads the event schemas of all services and checks the payload schema of
+    every consumed event against the schema of each of its producers. Every
+    distinct pair of schemas is only checked once, so that the work grows with
+    the number of distinct schemas rather than with the number of producer and
+    consumer pairs. Events without documented schemas on either side are
+    skipped."""
+    schemas = reader.read_all(service.name for service in services)
+    by_shortname = {service.shortname: service for service in services}
+    event_producers = enumerate_producers(services)
+    checked: Dict[Tuple[str, str], List[str]] = {}
+    incompatibilities: List[SchemaIncompatibility] = []
+    edges = 0
+    for consumer in services:
+        for consumed in consumer.api.events.consumes:
+            event = Event(topic=consumed.topic, type=consumed.type)
+            consumer_digest = schemas[consumer.name].lookup(event)
+            if consumer_digest is None:
+                continue
+            for producer_shortname in sorted(event_producers.get(event, [])):
+                producer = by_shortname[producer_shortname]
+                producer_digest = schemas[producer.name].lookup(event)
+                if producer_digest is None:
+                    continue
+                edges += 1
+                key = (producer_digest, consumer_digest)
+                if key not in checked:
+                    checked[key] = (
+                        []
+                        if producer_digest == consumer_digest
+                        else schema_incompatibilities(
+                            reader.schemas[producer_digest],
+                            reader.schemas[consumer_digest],
+                        )
+                    )
+                if checked[key]:
+                    incompatibilities.append(
+                        SchemaIncompatibility(
+                            topic=event.topic,
+                            type=event.type,
+                            producer=producer.shortname,
+                            consumer=consumer.shortname,
+                            problems=checked[key],
+                        )
+                    )
+    return SchemaCheckResult(
+        incompatibilities=incompatibilities,
+        edges=edges,
+        unique_schemas=len(reader.schemas),
+        unique_pairs=len(checked),
+    )
@@ -17,11 +17,14 @@
 """GHGA Dev Util Exceptions"""
 
 from pathlib import Path
-from typing import Union
+from typing import TYPE_CHECKING, Union
 
 import yaml.parser
 from pydantic import ValidationError
 
+if TYPE_CHECKING:  # pragma: no cover
+    from ghga_devutil.core.git import SpecPath
+
 
 class OutputFileExistsError(RuntimeError):
     """Raised when an output file exists and force was not specified."""
@@ -34,9 +37,65 @@ class ServiceFileValidationError(RuntimeError):
     """Raised when a service specification file could not be parsed."""
 
     def __init__(
-        self, path: Path, val_error: Union[ValidationError, yaml.parser.ParserError]
+        self,
+        path: "SpecPath",
+        val_error: Union[ValidationError, yaml.parser.ParserError, str],
     ):
         super().__init__(
             f"The service file '{path}' could not be read. "
             f"Not a valid service specification: {val_error}"
         )
+
+
+class DomainFileValidationError(RuntimeError):
+    """Raised when a domain mapping file could not be parsed."""
+
+    def __init__(self, path: Path, reason: str):
+        super().__init__(f"The domain file '{path}' could not be read: {reason}")
+
+
+class ConfigSchemaError(RuntimeError):
+    """Raised when a configuration schema or example configuration of a service
+    could not be parsed."""
+
+    def __init__(self, path: Path, reason: str):
+        super().__init__(f"The configuration file '{path}' could not be read: {reason}")
+
+
+class OpenAPIDocumentError(RuntimeError):
+    """Raised when an OpenAPI document of a service could not be parsed."""
+
+    def __init__(self, path: Path, reason: str):
+        super().__init__(f"The OpenAPI document '{path}' could not be read: {reason}")
+
+
+class EventSchemaError(RuntimeError):
+    """Raised when an event schema or AsyncAPI document of a service could not
+    be parsed."""
+
+    def __init__(self, path: Path, reason: str):
+        super().__init__(f"The event schema file '{path}' could not be read: {reason}")
+
+
+class GitObjectError(RuntimeError):
+    """Raised when an object could not be read from a git repository."""
+
+    def __init__(self, name: str, reason: str):
+        super().__init__(f"The git object '{name}' could not be read: {reason}")
+
+
+class SpecManifestError(RuntimeError):
+    """Raised when a manifest of service specification URLs could not be
+    parsed."""
+
+    def __init__(self, path: Path, reason: str):
+        super().__init__(f"The spec manifest '{path}' could not be read: {reason}")
+
+
+class SpecFetchError(RuntimeError):
+    """Raised when a service specification could not be fetched."""
+
+    def __init__(self, url: str, reason: str):
+        super().__init__(
+            f"The service specification '{url}' could not be fetched: {reason}"
+        )
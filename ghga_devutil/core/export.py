@@ -0,0 +1,121 @@
+# Copyright 2021 - 2023 Universität Tübingen, DKFZ, EMBL, and Universität zu Köln
+# for the German Human Genome-Phenome Archive (GHGA)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+"""Export of the communication graph to formats of external graph tools"""
+
+import csv
+import json
+from pathlib import Path
+from typing import Iterator, List, Mapping, TextIO
+
+from ghga_devutil.core.exceptions import OutputFileExistsError
+from ghga_devutil.core.graph import (
+    SERVICE_NODE,
+    TOPIC_NODE,
+    TOPIC_PREFIX,
+    Edge,
+    Node,
+    iter_raw_edges,
+    merge_edges,
+    service_title,
+)
+from ghga_devutil.core.models import AnnotatedService
+from ghga_devutil.options import ExportFormat
+
+
+def _iter_nodes(
+    services: Mapping[str, AnnotatedService], edges: List[Edge]
+) -> Iterator[Node]:
+    """Yields all services, including those without any communication, followed
+    by all topics."""
+    for shortname, service in services.items():
+        yield Node(shortname, service_title(service), SERVICE_NODE)
+    seen = set()
+    for edge in edges:
+        for node_id in (edge.source, edge.target):
+            if node_id in services or node_id in seen:
+                continue
+            seen.add(node_id)
+            if node_id.startswith(TOPIC_PREFIX):
+                yield Node(node_id, node_id[len(TOPIC_PREFIX) :], TOPIC_NODE)
+            else:
+                yield Node(node_id, node_id, SERVICE_NODE)
+
+
+def _dot_quote(text: str) -> str:
+    """Returns a text as quoted DOT string. Quotes, backslashes and line breaks
+    are escaped, other characters are written as they are, since Graphviz does
+    not decode JSON escapes like \\u00fc."""
+    escaped = text.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+    return f'"{escaped}"'
+
+
+def export_dot(services: Mapping[str, AnnotatedService], stream: TextIO) -> None:
+    """Writes the communication graph in the Graphviz DOT language."""
+    edges = merge_edges(iter_raw_edges(services))
+    stream.write("digraph services {\n")
+    for node in _iter_nodes(services, edges):
+        shape = "box" if node.kind == TOPIC_NODE else "ellipse"
+        stream.write(
+            f"  {_dot_quote(node.id)} [label={_dot_quote(node.label)},"
+            + f" shape={shape}];\n"
+        )
+    for edge in edges:
+        stream.write(
+            f"  {_dot_quote(edge.source)} -> {_dot_quote(edge.target)}"
+            + f" [label={_dot_quote(edge.label)}, class={edge.kind}];\n"
+        )
+    stream.write("}\n")
+
+
+def export_json(services: Mapping[str, AnnotatedService], stream: TextIO) -> None:
+    """Writes the communication graph as JSON node-link document, as understood
+    e.g. by networkx and d3."""
+    edges = merge_edges(iter_raw_edges(services))
+    stream.write('{"directed": true, "multigraph": false, "graph": {}, "nodes": [')
+    for index, node in enumerate(_iter_nodes(services, edges)):
+        stream.write(("," if index else "") + "\n  " + json.dumps(node._asdict()))
+    stream.write('\n], "links": [')
+    for index, edge in enumerate(edges):
+        stream.write(("," if index else "") + "\n  " + json.dumps(edge._asdict()))
+    stream.write("\n]}\n")
+
+
+def export_csv(services: Mapping[str, AnnotatedService], stream: TextIO) -> None:
+    """Writes the edges of the communication graph as CSV edge list."""
+    writer = csv.writer(stream, lineterminator="\n")
+    writer.writerow(Edge._fields)
+    writer.writerows(merge_edges(iter_raw_edges(services)))
+
+
+EXPORTERS = {
+    ExportFormat.DOT: export_dot,
+    ExportFormat.JSON: export_json,
+    ExportFormat.CSV: export_csv,
+}
+
+
+def export_graph(
+    services: Mapping[str, AnnotatedService],
+    out_path: Path,
+    export_format: ExportFormat,
+    force: bool = False,
+) -> None:
+    """Writes the communication graph to file in the given format"""
+    if out_path.exists() and not force:
+        raise OutputFileExistsError(out_path)
+    with open(out_path, "w", encoding="utf8", newline="") as stream:
+        EXPORTERS[export_format](services, stream)
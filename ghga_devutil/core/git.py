@@ -0,0 +1,326 @@
+# Copyright 2021 - 2023 Universität Tübingen, DKFZ, EMBL, and Universität zu Köln
+# for the German Human Genome-Phenome Archive (GHGA)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+"""Reading of service specifications from git objects without a checkout"""
+
+import errno
+import subprocess  # nosec
+from datetime import datetime, timezone
+from pathlib import Path, PurePosixPath
+from threading import Lock
+from typing import Dict, Iterable, Iterator, NamedTuple, Optional, Set, Tuple, Union
+
+from ghga_devutil.core.exceptions import GitObjectError
+
+BLOB = "blob"
+TREE = "tree"
+
+# Above this number of files, git is asked about the whole directory instead
+MAX_PATHSPECS = 1000
+
+
+class GitObject(NamedTuple):
+    """The id, type and content of a git object"""
+
+    oid: str
+    type: str
+    content: bytes
+
+
+class GitObjectStore:
+    """Reads objects from a git repository through a single long-lived
+    'git cat-file --batch' process, which is started on first use and shared by
+    all reads, so that reading many files costs no process per file. Object
+    names are resolved like by git, e.g. 'v1.0:specs/a.yaml' relative to the
+    root of the repository and 'v1.0:./a.yaml' relative to the repository
+    directory."""
+
+    def __init__(self, repo_dir: Path = Path(".")):
+        self.repo_dir = repo_dir
+        self._process: Optional[subprocess.Popen] = None
+        self._lock = Lock()
+        self._commit_times: Dict[str, datetime] = {}
+
+    def _start(self) -> subprocess.Popen:
+        if self._process is None:
+            try:
+                self._process = subprocess.Popen(  # nosec
+                    ["git", "cat-file", "--batch"],
+                    cwd=self.repo_dir,
+                    stdin=subprocess.PIPE,
+                    stdout=subprocess.PIPE,
+                    stderr=subprocess.DEVNULL,
+                )
+            except OSError as error:
+                raise GitObjectError(str(self.repo_dir), str(error)) from None
+        return self._process
+
+    def read(self, name: str) -> GitObject:
+        """Returns the type and content of the object with the given name."""
+        if "\n" in name:
+            raise GitObjectError(name, "Object names cannot contain line breaks.")
+        with self._lock:
+            process = self._start()
+            assert process.stdin and process.stdout  # nosec
+            try:
+                process.stdin.write(name.encode("utf-8") + b"\n")
+                process.stdin.flush()
+                header = process.stdout.readline()
+                if header.endswith((b" missing\n", b" ambiguous\n")):
+                    raise FileNotFoundError(errno.ENOENT, "No such git object", name)
+                oid, object_type, size = header.decode("utf-8").split()
+                content = process.stdout.read(int(size) + 1)[:-1]
+            except (BrokenPipeError, ValueError):
+                raise GitObjectError(name, "The git process stopped.") from None
+        return GitObject(oid, object_type, content)
+
+    def commit_time(self, ref: str) -> datetime:
+        """Returns the committer time of the commit a ref points to."""
+        if ref not in self._commit_times:
+            commit = self.read(f"{ref}^{{commit}}").content
+            for line in commit.decode("utf-8", "replace").splitlines():
+                if not line:
+                    break
+                if line.startswith("committer "):
+                    self._commit_times[ref] = datetime.fromtimestamp(
+                        int(line.rsplit(" ", 2)[1]), tz=timezone.utc
+                    )
+                    break
+            else:
+                raise GitObjectError(ref, "The commit has no committer.")
+        return self._commit_times[ref]
+
+    def close(self) -> None:
+        """Stops the git process."""
+        with self._lock:
+            if self._process is not None:
+                assert self._process.stdin  # nosec
+                self._process.stdin.close()
+                self._process.wait()
+                self._process = None
+
+    def __enter__(self) -> "GitObjectStore":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+def iter_tree(tree: GitObject) -> Iterator[Tuple[str, str]]:
+    """Yields the type and name of every entry of a tree object."""
+    content, hash_size = tree.content, len(tree.oid) // 2
+    offset = 0
+    while offset < len(content):
+        end = content.index(b"\0", offset)
+        mode, name = content[offset:end].split(b" ", 1)
+        offset = end + 1 + hash_size
+        yield (TREE if mode == b"40000" else BLOB), name.decode("utf-8")
+
+
+class GitStat(NamedTuple):
+    """The status of a file in a git tree, with the time of the commit as its
+    modification time"""
+
+    st_mtime: float
+    st_mtime_ns: int
+
+
+class GitPath:
+    """A file or directory in the tree of a git ref, read through a shared
+    object store. Supports the subset of the Path interface that is used to read
+    service specifications, so that such paths can be used in place of files on
+    disk."""
+
+    def __init__(
+        self,
+        store: GitObjectStore,
+        ref: str,
+        path: str,
+        object_type: Optional[str] = None,
+    ):
+        self.store = store
+        self.ref = ref
+        self.path = path
+        self._type = object_type
+        self._object: Optional[GitObject] = None
+
+    @property
+    def name(self) -> str:
+        """The final component of the path"""
+        return PurePosixPath(self.path).name
+
+    @property
+    def suffix(self) -> str:
+        """The file extension of the final component of the path"""
+        return PurePosixPath(self.path).suffix
+
+    def __str__(self) -> str:
+        return f"{self.ref}:{self.path}"
+
+    def __repr__(self) -> str:
+        return f"GitPath('{self}')"
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, GitPath) and str(self) == str(other)
+
+    def __hash__(self) -> int:
+        return hash(str(self))
+
+    def _read(self) -> GitObject:
+        git_object = self.store.read(str(self))
+        self._type = git_object.type
+        return git_object
+
+    def _object_type(self) -> str:
+        if self._type is None:
+            self._object = self._read()
+        return self._type or ""
+
+    def exists(self) -> bool:
+        """Returns whether the path exists in the tree of the ref."""
+        try:
+            self._object_type()
+        except FileNotFoundError:
+            return False
+        return True
+
+    def is_dir(self) -> bool:
+        """Returns whether the path is a directory."""
+        return self.exists() and self._type == TREE
+
+    def is_file(self) -> bool:
+        """Returns whether the path is a file."""
+        return self.exists() and self._type == BLOB
+
+    def _take(self, object_type: str) -> GitObject:
+        """Returns the object read to determine the type of the path, or reads
+        it, and raises an error if it is not of the given type."""
+        git_object, self._object = self._object, None
+        if git_object is None:
+            git_object = self._read()
+        if git_object.type == object_type:
+            return git_object
+        if object_type == TREE:
+            raise NotADirectoryError(errno.ENOTDIR, "Not a git tree", str(self))
+        raise IsADirectoryError(errno.EISDIR, "Not a git blob", str(self))
+
+    def read_bytes(self) -> bytes:
+        """Returns the content of the file."""
+        return self._take(BLOB).content
+
+    def read_text(self, encoding: str = "utf-8") -> str:
+        """Returns the decoded content of the file."""
+        return self.read_bytes().decode(encoding)
+
+    def iterdir(self) -> Iterator["GitPath"]:
+        """Yields the entries of the directory."""
+        for object_type, name in iter_tree(self._take(TREE)):
+            path = f"{self.path.rstrip('/')}/{name}"
+            yield GitPath(self.store, self.ref, path, object_type)
+
+    def stat(self) -> GitStat:
+        """Returns the time of the commit of the ref as modification time."""
+        self._object_type()
+        timestamp = self.store.commit_time(self.ref).timestamp()
+        return GitStat(timestamp, int(timestamp) * 10**9)
+
+
+SpecPath = Union[Path, GitPath]
+
+
+def _run_git(directory: Path, *args: str) -> Optional[str]:
+    """Returns the output of a git command run in a directory, or None if it
+    failed, e.g. because the directory is not in a git repository."""
+    try:
+        result = subprocess.run(  # nosec
+            ["git", "-c", "core.quotePath=false", *args],
+            cwd=directory,
+            capture_output=True,
+            text=True,
+            check=False,
+        )
+    except OSError:
+        return None
+    return result.stdout if result.returncode == 0 else None
+
+
+def _last_commit_times(directory: Path, names: Set[str]) -> Dict[str, datetime]:
+    """Returns the times of the last commits changing the named files of a
+    directory, leaving out files that are not committed or have uncommitted
+    changes. The history is only read until every file is dated."""
+    pathspecs = sorted(names) if len(names) <= MAX_PATHSPECS else ["."]
+    changed = _run_git(
+        directory, "diff", "--name-only", "--relative", "HEAD", "--", *pathspecs
+    )
+    if changed is None:
+        return {}
+    pending = names - set(changed.splitlines())
+    times: Dict[str, datetime] = {}
+    if not pending:
+        return times
+    try:
+        process = subprocess.Popen(  # nosec
+            ["git", "-c", "core.quotePath=false", "log", "--format=%x00%ct"]
+            + ["--name-only", "--relative", "--", *pathspecs],
+            cwd=directory,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            text=True,
+        )
+    except OSError:
+        return times
+    with process:
+        time = None
+        for line in process.stdout or ():
+            line = line.rstrip("\n")
+            if line.startswith("\0"):
+                time = datetime.fromtimestamp(int(line[1:]), tz=timezone.utc)
+            elif time is not None and line in pending and line not in times:
+                times[line] = time
+                if len(times) == len(pending):
+                    break
+        process.kill()
+    return times
+
+
+def commit_times(paths: Iterable[SpecPath]) -> Dict[SpecPath, datetime]:
+    """Returns the times of the last commits changing the given specifications,
+    which unlike modification times only depend on the contents of the
+    repository. Specifications read from git have the time of the commit of
+    their ref. Files on disk have the time of the last commit changing them and
+    are left out if they are not committed or have uncommitted changes. Git is
+    run once per directory."""
+    times: Dict[SpecPath, datetime] = {}
+    names_by_directory: Dict[Path, Set[str]] = {}
+    for path in paths:
+        if isinstance(path, GitPath):
+            times[path] = path.store.commit_time(path.ref)
+        else:
+            names_by_directory.setdefault(path.parent, set()).add(path.name)
+    for directory, names in names_by_directory.items():
+        for name, time in _last_commit_times(directory, names).items():
+            times[directory / name] = time
+    return times
+
+
+def parse_git_path(store: GitObjectStore, spec: str) -> Optional[GitPath]:
+    """Returns the git path given as 'ref:path' or None if the spec does not
+    have this form. A path of '.', as left over from './' by path normalization,
+    refers to the current directory."""
+    ref, separator, path = spec.partition(":")
+    if not (separator and ref and path):
+        return None
+    return GitPath(store, ref, "./" if path == "." else path)
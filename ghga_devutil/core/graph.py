@@ -0,0 +1,111 @@
+# Copyright 2021 - 2023 Universität Tübingen, DKFZ, EMBL, and Universität zu Köln
+# for the German Human Genome-Phenome Archive (GHGA)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+"""Communication graph of annotated services"""
+
+from typing import Dict, Iterable, Iterator, List, Mapping, NamedTuple, Tuple
+
+from ghga_devutil.core.models import AnnotatedService
+
+SERVICE_NODE = "service"
+TOPIC_NODE = "topic"
+EVENT_EDGE = "event"
+REST_EDGE = "rest"
+TOPIC_PREFIX = "topic_"
+
+
+class Node(NamedTuple):
+    """A node of the communication graph, either a service or an event topic."""
+
+    id: str
+    label: str
+    kind: str
+
+
+class Edge(NamedTuple):
+    """A directed edge of the communication graph.
+
+    Event edges lead from a producing service to a topic and from a topic to a
+    consuming service. REST edges lead from the consuming to the providing
+    service."""
+
+    source: str
+    target: str
+    label: str
+    kind: str
+
+
+def service_title(service: AnnotatedService) -> str:
+    """Returns the human readable title of a service."""
+    return service.name.replace("-", " ").title()
+
+
+def topic_node_id(topic: str) -> str:
+    """Returns the node ID of an event topic."""
+    return f"{TOPIC_PREFIX}{topic}"
+
+
+def iter_raw_edges(services: Mapping[str, AnnotatedService]) -> Iterator[Edge]:
+    """Yields all edges of the communication graph as they are annotated in the
+    services, including duplicates."""
+    for service in services.values():
+        for event in service.api.events.produces:
+            topic_id = topic_node_id(event.topic)
+            yield Edge(service.shortname, topic_id, event.type, EVENT_EDGE)
+            for consumer in event.consumers:
+                yield Edge(topic_id, consumer, event.type, EVENT_EDGE)
+        for endpoint in service.api.rest.produces:
+            for consumer in endpoint.consumers:
+                yield Edge(
+                    consumer,
+                    service.shortname,
+                    f"{endpoint.method} {endpoint.path}",
+                    REST_EDGE,
+                )
+
+
+def merge_edges(edges: Iterable[Edge]) -> List[Edge]:
+    """Merges edges that connect the same nodes in the same way. The labels of
+    merged edges are joined, duplicate labels are dropped."""
+    labels: Dict[Tuple[str, str, str], List[str]] = {}
+    for edge in edges:
+        edge_labels = labels.setdefault((edge.source, edge.target, edge.kind), [])
+        if edge.label not in edge_labels:
+            edge_labels.append(edge.label)
+    return [
+        Edge(source, target, ", ".join(edge_labels), kind)
+        for (source, target, kind), edge_labels in labels.items()
+    ]
+
+
+def edge_nodes(
+    edges: Iterable[Edge], services: Mapping[str, AnnotatedService]
+) -> List[Node]:
+    """Returns the nodes connected by the given edges in order of appearance."""
+    nodes: Dict[str, Node] = {}
+    for edge in edges:
+        for node_id in (edge.source, edge.target):
+            if node_id in nodes:
+                continue
+            if node_id in services:
+                nodes[node_id] = Node(
+                    node_id, service_title(services[node_id]), SERVICE_NODE
+                )
+            elif node_id.startswith(TOPIC_PREFIX):
+                nodes[node_id] = Node(node_id, node_id[len(TOPIC_PREFIX) :], TOPIC_NODE)
+            else:
+                nodes[node_id] = Node(node_id, node_id, SERVICE_NODE)
+    return list(nodes.values())
@@ -0,0 +1,43 @@
+# Copyright 2021 - 2023 Universität Tübingen, DKFZ, EMBL, and Universität zu Köln
+# for the German Human Genome-Phenome Archive (GHGA)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+"""Content hashing of models and generation inputs"""
+
+import hashlib
+from typing import Mapping
+
+from pydantic import BaseModel
+
+
+def hash_text(*parts: str) -> str:
+    """Returns a hex digest over the given text parts. The parts are separated so
+    that ("ab", "c") and ("a", "bc") do not collide."""
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def hash_model(model: BaseModel) -> str:
+    """Returns a hex digest over the canonical JSON representation of a model."""
+    return hash_text(model.json(sort_keys=True))
+
+
+def hash_models(models: Mapping[str, BaseModel]) -> str:
+    """Returns a hex digest over a mapping of models, e.g. a version identifier of
+    a landscape of annotated services."""
+    return hash_text(*(f"{key}:{hash_model(model)}" for key, model in models.items()))
@@ -0,0 +1,279 @@
+# Copyright 2021 - 2023 Universität Tübingen, DKFZ, EMBL, and Universität zu Köln
+# for the German Human Genome-Phenome Archive (GHGA)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+"""Instrumentation hooks of the pipeline
+
+Observers are notified when the pipeline starts and finishes a span of work,
+i.e. loading a specification, annotating a service, rendering a page or writing
+a file, and when the landscape was annotated. Observers are registered through
+register_observer or the "ghga_devutil.observers" entry point group. While no
+observer is registered, opening a span returns a shared null context.
+
+Spans opened within another span, also in worker threads started through
+nesting and in worker processes, are nested in it: the time of a span covered by
+nested spans is recorded, so that observers can tell the time spent in the span
+itself. Spans of worker processes are recorded in the worker, returned with its
+results and merged into the observers of the main process."""
+
+import os
+import threading
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from importlib.metadata import EntryPoint, entry_points
+from time import perf_counter, thread_time
+from typing import (
+    Callable,
+    ContextManager,
+    Iterator,
+    List,
+    Mapping,
+    Optional,
+    Sequence,
+    Tuple,
+    TypeVar,
+)
+
+from ghga_devutil.core.models import AnnotatedService
+
+ENTRY_POINT_GROUP = "ghga_devutil.observers"
+
+LOAD = "load"
+ANNOTATE = "annotate"
+RENDER = "render"
+WRITE = "write"
+PARSE = "parse"
+
+_NO_SPAN: ContextManager[None] = nullcontext()
+
+T = TypeVar("T")
+
+
+@dataclass
+class Span:
+    """A span of work of one phase of the pipeline. The timings are set when the
+    span finished, and the number of written bytes may be set by the code
+    within the span. The CPU time is that of the thread running the span.
+
+    The nested times are the wall time during which any nested span ran and the
+    CPU time of the nested spans run by the same thread, i.e. the parts of the
+    timings of this span that nested spans account for."""
+
+    phase: str
+    name: str
+    start: float
+    items: int = 1
+    wall_time: float = 0.0
+    cpu_time: float = 0.0
+    bytes_written: int = 0
+    pid: int = 0
+    tid: int = 0
+    nested_wall_time: float = 0.0
+    nested_cpu_time: float = 0.0
+    _nested: List[Tuple[float, float]] = field(
+        default_factory=list, init=False, repr=False, compare=False
+    )
+
+    def add_nested(self, nested: "Span") -> None:
+        """Records a finished span that was nested in this one."""
+        self._nested.append((nested.start, nested.start + nested.wall_time))
+        if (nested.pid, nested.tid) == (self.pid, self.tid):
+            self.nested_cpu_time += nested.cpu_time
+
+    def finish(self, cpu_time: float) -> None:
+        """Sets the timings of the span once it finished."""
+        end = perf_counter()
+        self.wall_time = end - self.start
+        self.cpu_time = cpu_time
+        covered_until = self.start
+        for nested_start, nested_end in sorted(self._nested):
+            nested_start = max(nested_start, covered_until)
+            nested_end = min(nested_end, end)
+            if nested_end > nested_start:
+                self.nested_wall_time += nested_end - nested_start
+                covered_until = nested_end
+
+
+@dataclass(frozen=True)
+class LandscapeAnnotated:
+    """The event of a landscape of services being annotated"""
+
+    services: Mapping[str, AnnotatedService]
+
+
+class Observer:
+    """Base class of observers, which may override any of the callbacks."""
+
+    def span_started(self, span: Span) -> None:
+        """Called when a span of work starts."""
+
+    def span_finished(self, span: Span) -> None:
+        """Called when a span of work finished, also if it raised an error."""
+
+    def landscape_annotated(self, event: LandscapeAnnotated) -> None:
+        """Called when a landscape of services was annotated."""
+
+    def spans_merged(self, spans: Sequence[Span]) -> None:
+        """Called with finished spans recorded in another process. By default,
+        each span is handled like a span finished in this process."""
+        for span_ in spans:
+            self.span_finished(span_)
+
+
+class SpanRecorder(Observer):
+    """Records finished spans, e.g. in a worker process."""
+
+    def __init__(self):
+        self.spans: List[Span] = []
+
+    def span_finished(self, span: Span) -> None:
+        """Records a finished span."""
+        self.spans.append(span)
+
+
+_observers: List[Observer] = []
+_current_span: ContextVar[Optional[Span]] = ContextVar("span", default=None)
+
+
+def register_observer(observer: Observer) -> None:
+    """Registers an observer of all following pipeline runs."""
+    _observers.append(observer)
+
+
+def unregister_observer(observer: Observer) -> None:
+    """Removes a registered observer."""
+    _observers.remove(observer)
+
+
+@contextmanager
+def observing(*observers: Observer) -> Iterator[None]:
+    """Registers the given observers for the enclosed code."""
+    for observer in observers:
+        register_observer(observer)
+    try:
+        yield
+    finally:
+        for observer in observers:
+            unregister_observer(observer)
+
+
+def observed() -> bool:
+    """Returns whether any observer is registered."""
+    return bool(_observers)
+
+
+@contextmanager
+def recording() -> Iterator[List[Span]]:
+    """Records the spans of the enclosed code instead of notifying the registered
+    observers, which a forked worker process inherits from its parent. The
+    recorded spans can be returned to the parent and merged there."""
+    recorder = SpanRecorder()
+    registered = _observers[:]
+    _observers[:] = [recorder]
+    try:
+        yield recorder.spans
+    finally:
+        _observers[:] = registered
+
+
+def nesting(func: Callable[..., T]) -> Callable[..., T]:
+    """Returns a function running the given one such that the spans it opens are
+    nested in the span that is open now, e.g. when run by worker threads."""
+    parent = _current_span.get()
+
+    def nested(*args, **kwargs) -> T:
+        token = _current_span.set(parent)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            _current_span.reset(token)
+
+    return nested
+
+
+def merge_spans(spans: Sequence[Span]) -> None:
+    """Notifies all registered observers of spans recorded in another process,
+    which are nested in the span that is open now."""
+    if spans:
+        parent = _current_span.get()
+        if parent is not None:
+            for span in spans:
+                parent.add_nested(span)
+        for observer in list(_observers):
+            observer.spans_merged(spans)
+
+
+def group_entry_points(group: str) -> List[EntryPoint]:
+    """Returns the entry points of a group. Selecting by keyword is only
+    supported from Python 3.10 on, before entry points are grouped in a dict."""
+    eps = entry_points()
+    if hasattr(eps, "select"):
+        return list(eps.select(group=group))
+    return list(eps.get(group, []))
+
+
+def entry_point_observers() -> List[Observer]:
+    """Returns the observers of the "ghga_devutil.observers" entry point group.
+    An entry point may refer to an observer or to a class or factory creating
+    one."""
+    observers = []
+    for entry_point in group_entry_points(ENTRY_POINT_GROUP):
+        target = entry_point.load()
+        observers.append(target if isinstance(target, Observer) else target())
+    return observers
+
+
+@contextmanager
+def _observed_span(phase: str, name: str, items: int) -> Iterator[Span]:
+    observers = list(_observers)
+    span = Span(
+        phase=phase,
+        name=name,
+        start=perf_counter(),
+        items=items,
+        pid=os.getpid(),
+        tid=threading.get_ident(),
+    )
+    parent = _current_span.get()
+    token = _current_span.set(span)
+    for observer in observers:
+        observer.span_started(span)
+    cpu_start = thread_time()
+    try:
+        yield span
+    finally:
+        span.finish(thread_time() - cpu_start)
+        _current_span.reset(token)
+        if parent is not None:
+            parent.add_nested(span)
+        for observer in observers:
+            observer.span_finished(span)
+
+
+def span(phase: str, name: str, items: int = 1) -> ContextManager[Optional[Span]]:
+    """Opens a span of work that is reported to all registered observers. The
+    context value is None if no observer is registered."""
+    if not _observers:
+        return _NO_SPAN
+    return _observed_span(phase, name, items)
+
+
+def landscape_annotated(services: Mapping[str, AnnotatedService]) -> None:
+    """Notifies all registered observers of an annotated landscape."""
+    if _observers:
+        event = LandscapeAnnotated(services)
+        for observer in list(_observers):
+            observer.landscape_annotated(event)
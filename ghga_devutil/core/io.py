@@ -16,22 +16,95 @@
 
 """File IO for service descriptions"""
 
-
+import http.client
+import json
+import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Union
+from threading import BoundedSemaphore, Lock
+from typing import Dict, Iterable, List, Mapping, NamedTuple, Optional, Tuple, Union
+from urllib.parse import urljoin, urlsplit
 
 import yaml
 import yaml.parser
 from pydantic import ValidationError
 
 from ghga_devutil.core.exceptions import (
+    DomainFileValidationError,
     OutputFileExistsError,
     ServiceFileValidationError,
+    SpecFetchError,
+    SpecManifestError,
 )
+from ghga_devutil.core.git import GitObjectStore, GitPath, SpecPath, parse_git_path
 from ghga_devutil.core.models import AnnotatedService, Service
+from ghga_devutil.options import DEFAULT_FETCH_CONNECTIONS
+
+SERVICE_FILE_SUFFIXES = (".yaml", ".yml", ".json")
+FETCH_STATE_FILENAME = ".ghga-devutil-fetch.json"
+FETCH_STATE_VERSION = 1
+REDIRECT_STATUSES = (301, 302, 303, 307, 308)
+MAX_REDIRECTS = 5
+
+
+def is_service_file_name(name: str) -> bool:
+    """Returns whether a file name may be that of a service specification, i.e.
+    has a specification suffix and is not hidden like the state files of this
+    tool."""
+    return Path(name).suffix in SERVICE_FILE_SUFFIXES and not name.startswith(".")
+
+
+def find_service_files(paths: Iterable[Path]) -> List[Path]:
+    """Expands directories in a list of paths to the service specification files
+    they contain. Files are passed through unchanged."""
+    service_files: List[Path] = []
+    for path in paths:
+        if path.is_dir():
+            service_files.extend(
+                sorted(
+                    child
+                    for child in path.iterdir()
+                    if is_service_file_name(child.name) and child.is_file()
+                )
+            )
+        else:
+            service_files.append(path)
+    return service_files
 
 
-def load_service(path: Path) -> Service:
+def resolve_spec_paths(
+    store: GitObjectStore, paths: Iterable[Path], git_ref: Optional[str] = None
+) -> List[SpecPath]:
+    """Replaces paths that refer to git objects by git paths read through the
+    given store: all paths if a git ref is given, relative to the current
+    directory, and otherwise the paths of the form 'ref:path' that do not exist
+    on disk. Git directories are expanded to
+    the service specification files they contain, other paths are passed
+    through unchanged."""
+    spec_paths: List[SpecPath] = []
+    for path in paths:
+        git_path: Optional[GitPath] = None
+        if git_ref is not None:
+            git_path = GitPath(
+                store, git_ref, f"./{Path(os.path.relpath(path)).as_posix()}"
+            )
+        elif not path.exists():
+            git_path = parse_git_path(store, str(path))
+        if git_path is None:
+            spec_paths.append(path)
+        elif git_path.is_dir():
+            spec_paths.extend(
+                child
+                for child in git_path.iterdir()
+                if is_service_file_name(child.name) and child.is_file()
+            )
+        else:
+            spec_paths.append(git_path)
+    return spec_paths
+
+
+def load_service(path: SpecPath) -> Service:
     """Loads a service from a file"""
     try:
         obj = yaml.safe_load(path.read_bytes())
@@ -40,10 +113,287 @@ def load_service(path: Path) -> Service:
         raise ServiceFileValidationError(path, error) from None
 
 
+def check_unique_shortname(
+    paths_by_shortname: Mapping[str, SpecPath], path: SpecPath, service: Service
+) -> None:
+    """Raises a ServiceFileValidationError if the shortname of a service loaded
+    from a path was already declared by another file."""
+    other_path = paths_by_shortname.get(service.shortname)
+    if other_path is not None and other_path != path:
+        raise ServiceFileValidationError(
+            path,
+            f"the shortname '{service.shortname}' is already declared by"
+            + f" '{other_path}'",
+        )
+
+
 def write_service(
     service: Union[Service, AnnotatedService], out_path: Path, force: bool = False
-) -> None:
-    """Write a service to file"""
+) -> int:
+    """Write a service to file and return the number of bytes written"""
     if out_path.exists() and not force:
         raise OutputFileExistsError(out_path)
-    out_path.write_text(yaml.dump(service.dict()))
+    return out_path.write_bytes(yaml.dump(service.dict()).encode("utf-8"))
+
+
+def load_domains(path: Path) -> Dict[str, str]:
+    """Loads a mapping of service shortnames to domain labels from a file"""
+    try:
+        obj = yaml.safe_load(path.read_bytes())
+    except yaml.parser.ParserError as error:
+        raise DomainFileValidationError(path, str(error)) from None
+    if not isinstance(obj, dict) or not all(
+        isinstance(key, str) and isinstance(value, str) for key, value in obj.items()
+    ):
+        raise DomainFileValidationError(
+            path, "Expected a mapping of service shortnames to domain labels."
+        )
+    return obj
+
+
+def load_spec_manifest(path: Path) -> Dict[str, str]:
+    """Loads a file mapping service specification file names to the URLs to
+    fetch them from"""
+    try:
+        obj = yaml.safe_load(path.read_bytes())
+    except yaml.YAMLError as error:
+        raise SpecManifestError(path, str(error)) from None
+    if not isinstance(obj, dict) or not all(
+        isinstance(key, str) and isinstance(value, str) for key, value in obj.items()
+    ):
+        raise SpecManifestError(
+            path, "Expected a mapping of specification file names to URLs."
+        )
+    for name, url in obj.items():
+        if Path(name).name != name or not is_service_file_name(name):
+            raise SpecManifestError(path, f"'{name}' is not a specification file name.")
+        if urlsplit(url).scheme not in ("http", "https"):
+            raise SpecManifestError(path, f"'{url}' is not an HTTP or HTTPS URL.")
+    return obj
+
+
+class HTTPResponse(NamedTuple):
+    """The status, headers and body of a completely read HTTP response"""
+
+    status: int
+    headers: Dict[str, str]
+    body: bytes
+
+
+class ConnectionPool:
+    """A bounded pool of keep-alive HTTP connections. At most max_connections
+    connections are open at any time, idle ones are reused for later requests to
+    the same host and closed to make room for connections to other hosts."""
+
+    def __init__(
+        self, max_connections: int = DEFAULT_FETCH_CONNECTIONS, timeout: float = 30.0
+    ):
+        self.max_connections = max_connections
+        self.timeout = timeout
+        self.created = 0
+        self._slots = BoundedSemaphore(max_connections)
+        self._idle: Dict[Tuple[str, str, Optional[int]], List] = {}
+        self._open = 0
+        self._lock = Lock()
+
+    def _acquire(self, key: Tuple[str, str, Optional[int]]):
+        """Returns an idle connection to the host, or a new one, and whether it
+        was reused."""
+        with self._lock:
+            if self._idle.get(key):
+                return self._idle[key].pop(), True
+            if self._open >= self.max_connections:
+                other = next(key for key, idle in self._idle.items() if idle)
+                self._idle[other].pop().close()
+                self._open -= 1
+            self._open += 1
+            self.created += 1
+        scheme, host, port = key
+        connection_class = (
+            http.client.HTTPSConnection
+            if scheme == "https"
+            else http.client.HTTPConnection
+        )
+        return connection_class(host, port, timeout=self.timeout), False
+
+    def _discard(self, connection) -> None:
+        connection.close()
+        with self._lock:
+            self._open -= 1
+
+    def get(self, url: str, headers: Optional[Dict[str, str]] = None) -> HTTPResponse:
+        """Sends a GET request and reads the complete response. A request over a
+        reused connection that the server closed in the meantime is retried once
+        over a new connection."""
+        parts = urlsplit(url)
+        key = (parts.scheme, parts.hostname or "", parts.port)
+        target = (parts.path or "/") + (f"?{parts.query}" if parts.query else "")
+        with self._slots:
+            while True:
+                connection, reused = self._acquire(key)
+                try:
+                    connection.request("GET", target, headers=headers or {})
+                    response = connection.getresponse()
+                    body = response.read()
+                except (http.client.RemoteDisconnected, ConnectionError):
+                    self._discard(connection)
+                    if reused:
+                        continue
+                    raise
+                except BaseException:
+                    self._discard(connection)
+                    raise
+                break
+            if response.will_close:
+                self._discard(connection)
+            else:
+                with self._lock:
+                    self._idle.setdefault(key, []).append(connection)
+        return HTTPResponse(
+            response.status,
+            {name.lower(): value for name, value in response.getheaders()},
+            body,
+        )
+
+    def close(self) -> None:
+        """Closes all idle connections."""
+        with self._lock:
+            for idle in self._idle.values():
+                for connection in idle:
+                    connection.close()
+                    self._open -= 1
+            self._idle.clear()
+
+
+class FetchResult(NamedTuple):
+    """The outcome of fetching a service specification. The path is None if it
+    could not be fetched."""
+
+    name: str
+    url: str
+    path: Optional[Path]
+    changed: bool
+    error: str = ""
+
+
+class SpecFetcher:
+    """Fetches the service specifications listed in a manifest concurrently over
+    a pool of keep-alive connections into a directory. The ETag and
+    Last-Modified headers of every response are recorded in the directory, so
+    that later fetches revalidate the stored files with If-None-Match and
+    If-Modified-Since, and unchanged files cost a 304 response and are neither
+    parsed nor written. Changed files are validated before they are written."""
+
+    def __init__(
+        self,
+        outdir: Path,
+        max_connections: int = DEFAULT_FETCH_CONNECTIONS,
+        timeout: float = 30.0,
+    ):
+        self.outdir = outdir
+        self.state_path = outdir / FETCH_STATE_FILENAME
+        self.pool = ConnectionPool(max_connections, timeout)
+
+    def _load_state(self) -> Dict[str, Dict[str, str]]:
+        try:
+            obj = json.loads(self.state_path.read_text())
+        except (OSError, ValueError):
+            return {}
+        if not isinstance(obj, dict) or obj.get("version") != FETCH_STATE_VERSION:
+            return {}
+        return dict(obj.get("files", {}))
+
+    def _save_state(self, files: Dict[str, Dict[str, str]]) -> None:
+        self.state_path.write_text(
+            json.dumps(
+                {"version": FETCH_STATE_VERSION, "files": files},
+                indent=2,
+                sort_keys=True,
+            )
+        )
+
+    def _get(self, url: str, headers: Dict[str, str]) -> HTTPResponse:
+        """Gets a URL, following redirects."""
+        for _ in range(MAX_REDIRECTS + 1):
+            response = self.pool.get(url, headers)
+            location = response.headers.get("location")
+            if response.status not in REDIRECT_STATUSES or not location:
+                return response
+            url = urljoin(url, location)
+        raise SpecFetchError(url, "Too many redirects.")
+
+    def _conditional_headers(
+        self, name: str, url: str, entry: Optional[Dict[str, str]]
+    ) -> Dict[str, str]:
+        """Returns the headers revalidating a previously fetched file."""
+        if entry is None or entry.get("url") != url:
+            return {}
+        if not (self.outdir / name).exists():
+            return {}
+        headers: Dict[str, str] = {}
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def _write(self, name: str, content: bytes) -> None:
+        """Replaces a file atomically, so that readers never see partial files."""
+        with tempfile.NamedTemporaryFile(
+            "wb", dir=self.outdir, suffix=".tmp", delete=False
+        ) as tmp_file:
+            tmp_file.write(content)
+        os.replace(tmp_file.name, self.outdir / name)
+
+    def _fetch(
+        self, name: str, url: str, entry: Optional[Dict[str, str]]
+    ) -> Tuple[bool, Dict[str, str]]:
+        """Fetches one specification and returns whether it changed and its new
+        state entry."""
+        headers = self._conditional_headers(name, url, entry)
+        try:
+            response = self._get(url, headers)
+        except (OSError, http.client.HTTPException) as error:
+            raise SpecFetchError(url, str(error) or type(error).__name__) from None
+        if response.status == 304 and entry is not None and headers:
+            return False, entry
+        if response.status != 200:
+            raise SpecFetchError(url, f"The server responded with {response.status}.")
+        try:
+            Service.parse_obj(yaml.safe_load(response.body))
+        except (yaml.YAMLError, ValidationError) as error:
+            raise SpecFetchError(
+                url, f"Not a valid service specification: {error}"
+            ) from None
+
+        self._write(name, response.body)
+        new_entry = {"url": url}
+        if "etag" in response.headers:
+            new_entry["etag"] = response.headers["etag"]
+        if "last-modified" in response.headers:
+            new_entry["last_modified"] = response.headers["last-modified"]
+        return True, new_entry
+
+    def fetch(self, manifest: Dict[str, str]) -> List[FetchResult]:
+        """Fetches all specifications of a manifest and returns the outcomes in
+        the order of the manifest. Specifications that could not be fetched keep
+        their previously fetched file, if any."""
+        state = self._load_state()
+
+        def fetch_one(name: str) -> Tuple[FetchResult, Optional[Dict[str, str]]]:
+            try:
+                changed, entry = self._fetch(name, manifest[name], state.get(name))
+            except SpecFetchError as error:
+                result = FetchResult(name, manifest[name], None, False, str(error))
+                return result, state.get(name)
+            return FetchResult(name, manifest[name], self.outdir / name, changed), entry
+
+        try:
+            with ThreadPoolExecutor(max_workers=self.pool.max_connections) as executor:
+                outcomes = list(executor.map(fetch_one, manifest))
+        finally:
+            self.pool.close()
+        self._save_state(
+            {result.name: entry for result, entry in outcomes if entry is not None}
+        )
+        return [result for result, _ in outcomes]
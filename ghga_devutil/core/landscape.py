@@ -0,0 +1,186 @@
+# Copyright 2021 - 2023 Universität Tübingen, DKFZ, EMBL, and Universität zu Köln
+# for the German Human Genome-Phenome Archive (GHGA)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+"""In-memory landscape of jointly annotated services"""
+
+from datetime import datetime, timezone
+from pathlib import Path
+from threading import Lock
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from ghga_devutil.core.annotate import (
+    annotate_service,
+    enumerate_consumers,
+    enumerate_producers,
+    service_neighbours,
+)
+from ghga_devutil.core.git import commit_times
+from ghga_devutil.core.hashing import hash_model, hash_text
+from ghga_devutil.core.io import check_unique_shortname, load_service
+from ghga_devutil.core.markdown import service_page_time
+from ghga_devutil.core.models import (
+    AnnotatedService,
+    ConsumedRESTEndpoint,
+    Event,
+    Service,
+)
+
+
+def _spec_neighbours(
+    service: Service, rest_consumers, event_consumers, event_producers
+) -> Set[str]:
+    """Returns the shortnames of all services a not yet annotated service
+    communicates with according to the given consumer and producer maps."""
+    neighbours = {endpoint.service for endpoint in service.api.rest.consumes}
+    for endpoint in service.api.rest.produces:
+        neighbours.update(
+            rest_consumers.get(
+                ConsumedRESTEndpoint(**endpoint.dict(), service=service.shortname), []
+            )
+        )
+    for event in service.api.events.produces:
+        neighbours.update(
+            event_consumers.get(Event(topic=event.topic, type=event.type), [])
+        )
+    for event in service.api.events.consumes:
+        neighbours.update(
+            event_producers.get(Event(topic=event.topic, type=event.type), [])
+        )
+    return neighbours
+
+
+class Landscape:
+    """Keeps the services read from a set of specification files loaded and
+    annotated in memory. On reload, only changed files are read again and only
+    the services affected by the changes are annotated again. The commit times
+    dating the pages are only looked up again for files that changed."""
+
+    def __init__(self, service_file_paths: Iterable[Path]):
+        self.paths: List[Path] = list(service_file_paths)
+        self.services: Dict[str, AnnotatedService] = {}
+        self.paths_by_shortname: Dict[str, Path] = {}
+        self.version = ""
+        self._specs: Dict[Path, Service] = {}
+        self._stats: Dict[Path, Tuple[int, int]] = {}
+        self._times: Dict[str, datetime] = {}
+        self._commit_times: Dict[Path, Optional[datetime]] = {}
+        self._hashes: Dict[str, str] = {}
+        self._lock = Lock()
+        self.reload()
+
+    def reload(self, service_file_paths: Optional[Iterable[Path]] = None) -> Set[str]:
+        """Reloads all specification files that changed since they were last read,
+        optionally replacing the set of files. Returns the shortnames of all
+        services whose annotated state or page inputs changed, including removed
+        services."""
+        with self._lock:
+            if service_file_paths is not None:
+                self.paths = list(service_file_paths)
+            return self._reload()
+
+    def _update_times(self, loaded: Iterable[Path]) -> None:
+        """Looks up the commit times of the loaded files and of files without a
+        known commit time, and keeps those of the other files."""
+        stale = set(loaded).union(
+            path for path in self.paths if path not in self._commit_times
+        )
+        queried = commit_times(stale)
+        self._commit_times = {
+            path: queried.get(path) if path in stale else self._commit_times[path]
+            for path in self.paths
+        }
+        self._times = {}
+        for shortname, path in self.paths_by_shortname.items():
+            time = self._commit_times[path]
+            if time is not None:
+                self._times[shortname] = time
+
+    def _reload(self) -> Set[str]:
+        old_specs = self._specs
+        specs: Dict[Path, Service] = {}
+        stats: Dict[Path, Tuple[int, int]] = {}
+        loaded: List[Path] = []
+        paths_by_shortname: Dict[str, Path] = {}
+        changed: List[Service] = []
+        previous: List[Service] = []
+        for path in self.paths:
+            stat = path.stat()
+            stats[path] = (stat.st_mtime_ns, stat.st_size)
+            if path in old_specs and self._stats.get(path) == stats[path]:
+                specs[path] = old_specs[path]
+            else:
+                specs[path] = load_service(path)
+                loaded.append(path)
+                if path not in old_specs:
+                    changed.append(specs[path])
+                elif specs[path] != old_specs[path]:
+                    changed.append(specs[path])
+                    previous.append(old_specs[path])
+            check_unique_shortname(paths_by_shortname, path, specs[path])
+            paths_by_shortname[specs[path].shortname] = path
+        previous.extend(spec for path, spec in old_specs.items() if path not in specs)
+        self._specs, self._stats = specs, stats
+        if not changed and not previous:
+            return set()
+
+        services = list(specs.values())
+        rest_consumers, event_consumers = enumerate_consumers(services)
+        event_producers = enumerate_producers(services)
+
+        affected: Set[str] = set()
+        for service in (*changed, *previous):
+            affected.add(service.shortname)
+            if service.shortname in self.services:
+                affected.update(service_neighbours(self.services[service.shortname]))
+            affected.update(
+                _spec_neighbours(
+                    service, rest_consumers, event_consumers, event_producers
+                )
+            )
+
+        ann_services: Dict[str, AnnotatedService] = {}
+        hashes: Dict[str, str] = {}
+        for path, service in specs.items():
+            shortname = service.shortname
+            if shortname in affected or shortname not in self.services:
+                ann_services[shortname] = annotate_service(
+                    service, rest_consumers, event_consumers, event_producers
+                )
+                hashes[shortname] = hash_model(ann_services[shortname])
+            else:
+                ann_services[shortname] = self.services[shortname]
+                hashes[shortname] = self._hashes[shortname]
+        self.services, self._hashes = ann_services, hashes
+        self.paths_by_shortname = paths_by_shortname
+        self._update_times(loaded)
+        self.version = hash_text(
+            *(f"{shortname}:{digest}" for shortname, digest in hashes.items())
+        )
+        return affected
+
+    def snapshot(self) -> Tuple[str, Dict[str, AnnotatedService]]:
+        """Returns the current version and annotated services consistently, even
+        while a reload is in progress."""
+        with self._lock:
+            return self.version, self.services
+
+    def input_time(self, shortname: str) -> datetime:
+        """Returns the date of the pages of a service, i.e. the latest commit
+        time of the specifications of the service and its neighbours, or the
+        current time if any of them is not committed."""
+        return service_page_time(
+            self.services[shortname], self._times, self.services
+        ) or datetime.now(tz=timezone.utc)
@@ -16,58 +16,620 @@
 
 """Main program entrypoints used by the user interface"""
 
+import json
+from datetime import datetime
+from functools import partial
 from pathlib import Path
-from typing import List
+from time import perf_counter
+from typing import Callable, Dict, List, Optional, Sequence, Set
 
-from ghga_devutil.core.annotate import annotate_services
-from ghga_devutil.core.io import load_service, write_service
-from ghga_devutil.core.markdown import generate_complete_diagram, generate_markdown
+import yaml
 
+from ghga_devutil.core import cli_message as msg
+from ghga_devutil.core import hooks
+from ghga_devutil.core.annotate import (
+    annotate_service,
+    enumerate_consumers,
+    enumerate_producers,
+)
+from ghga_devutil.core.config_schema import ServiceConfigReader, ServiceConfigSpec
+from ghga_devutil.core.diff import diff_trees, landscape_tree
+from ghga_devutil.core.discover import SourceScanner, discover_api
+from ghga_devutil.core.event_schemas import EventSchemaReader, check_event_schemas
+from ghga_devutil.core.exceptions import ServiceFileValidationError
+from ghga_devutil.core.export import ExportFormat, export_graph
+from ghga_devutil.core.git import SpecPath, commit_times
+from ghga_devutil.core.hashing import hash_text
+from ghga_devutil.core.io import (
+    SpecFetcher,
+    check_unique_shortname,
+    find_service_files,
+    load_service,
+    load_spec_manifest,
+    write_service,
+)
+from ghga_devutil.core.landscape import Landscape
+from ghga_devutil.core.manifest import Manifest
+from ghga_devutil.core.markdown import (
+    PARTITION_PAGE_PREFIX,
+    FragmentCache,
+    complete_diagram_digest,
+    generate_complete_diagram,
+    generate_markdown,
+    generate_partition_diagram,
+    generate_partition_index,
+    partition_digest,
+    partition_page_name,
+    service_page_digest,
+    service_page_time,
+)
+from ghga_devutil.core.models import AnnotatedService
+from ghga_devutil.core.openapi import OpenAPIReader, reconcile_endpoints
+from ghga_devutil.core.partition import (
+    PartitionOptions,
+    PartitionStrategy,
+    partition_services,
+)
+from ghga_devutil.core.server import LandscapeServer
+from ghga_devutil.core.site import DEFAULT_MERMAID_URL, generate_site
+from ghga_devutil.core.stream import stream_markdown
+from ghga_devutil.core.synth import SynthOptions, write_landscape
+from ghga_devutil.core.validate import validate_files
+from ghga_devutil.core.watch import MarkdownRebuilder, create_watcher, wait_debounced
+from ghga_devutil.options import DiscoverOutput, OpenAPIMode, SpecFormat
 
-def markdown(service_file_paths: List[Path], outdir: Path, force: bool):
+
+def _write_page(
+    out_path: Path,
+    render: Callable[[], str],
+    force: bool,
+    manifest: Optional[Manifest] = None,
+    digest: Callable[[], str] = str,
+) -> None:
+    """Renders and writes a page unless it exists or, in incremental mode, its
+    inputs did not change. The inputs are recorded once the page was written."""
+    input_digest = digest() if manifest is not None else ""
+    if manifest is not None:
+        if not (force or manifest.is_stale(out_path, input_digest)):
+            return
+    elif out_path.exists() and not force:
+        return
+    with hooks.span(hooks.RENDER, out_path.name):
+        page = render().encode("utf-8")
+    with hooks.span(hooks.WRITE, out_path.name) as span:
+        out_path.write_bytes(page)
+        if span is not None:
+            span.bytes_written = len(page)
+    if manifest is not None:
+        manifest.record(out_path, input_digest)
+
+
+def _config_reader(
+    repos_dir: Optional[Path], cache_dir: Optional[Path]
+) -> Optional[ServiceConfigReader]:
+    """Returns a reader of the documented configuration of services if a
+    directory of service repositories is given."""
+    if repos_dir is None:
+        return None
+    return ServiceConfigReader(repos_dir, cache_dir=cache_dir)
+
+
+def _openapi_reader(
+    repos_dir: Optional[Path],
+    cache_dir: Optional[Path],
+    openapi: Optional[OpenAPIMode],
+) -> Optional[OpenAPIReader]:
+    """Returns a reader of the OpenAPI documents of services if their REST
+    endpoints should be checked or replaced."""
+    if openapi is None:
+        return None
+    if repos_dir is None:
+        raise ValueError(
+            "Checking or replacing REST endpoints requires a directory of service"
+            + " repositories."
+        )
+    return OpenAPIReader(repos_dir, cache_dir=cache_dir)
+
+
+def _prune_partition_pages(
+    outdir: Path, partition_paths: Set[Path], manifest: Manifest
+) -> None:
+    """Removes the pages of partial communication diagrams that an earlier run
+    recorded in the manifest but that are not part of the current partitioning.
+    Other files in the output directory are left alone."""
+    for name in sorted(manifest.pages):
+        out_path = outdir / name
+        if name.startswith(PARTITION_PAGE_PREFIX) and out_path not in partition_paths:
+            out_path.unlink(missing_ok=True)
+            manifest.forget(out_path)
+
+
+def _load_and_annotate(
+    service_file_paths: Sequence[SpecPath],
+    repos_dir: Optional[Path] = None,
+    cache_dir: Optional[Path] = None,
+    openapi: Optional[OpenAPIMode] = None,
+) -> List[AnnotatedService]:
+    """Reads services from disk and annotates them jointly, reporting every
+    load and annotation to the registered observers.
+
+    If a directory of service repositories is given, the documented
+    configuration of every service is merged into its annotated configuration,
+    and if an OpenAPI mode is given, the REST endpoints of every service are
+    checked against or replaced by those in its OpenAPI document. All services
+    are ingested concurrently."""
+    config_reader = _config_reader(repos_dir, cache_dir)
+    openapi_reader = _openapi_reader(repos_dir, cache_dir, openapi)
+    services = []
+    paths_by_shortname: Dict[str, SpecPath] = {}
+    for in_path in service_file_paths:
+        with hooks.span(hooks.LOAD, in_path.name):
+            services.append(load_service(in_path))
+        check_unique_shortname(paths_by_shortname, in_path, services[-1])
+        paths_by_shortname[services[-1].shortname] = in_path
+
+    config_specs: Dict[str, ServiceConfigSpec] = {}
+    if config_reader is not None:
+        with hooks.span(hooks.LOAD, "config schemas", items=len(services)):
+            config_specs = config_reader.read_all(service.name for service in services)
+    if openapi_reader is not None and openapi is not None:
+        with hooks.span(hooks.LOAD, "openapi documents", items=len(services)):
+            documented = openapi_reader.read_all(service.name for service in services)
+        for index, service in enumerate(services):
+            services[index], mismatch = reconcile_endpoints(
+                service, documented[service.name], openapi
+            )
+            if mismatch is not None:
+                msg.warn(str(mismatch))
+
+    with hooks.span(hooks.ANNOTATE, "enumerate", items=0):
+        rest_consumers, event_consumers = enumerate_consumers(services)
+        event_producers = enumerate_producers(services)
+    ann_services = []
+    for service in services:
+        with hooks.span(hooks.ANNOTATE, service.shortname):
+            ann_services.append(
+                annotate_service(
+                    service,
+                    rest_consumers,
+                    event_consumers,
+                    event_producers,
+                    config_spec=config_specs.get(service.name),
+                )
+            )
+    hooks.landscape_annotated(
+        {ann_service.shortname: ann_service for ann_service in ann_services}
+    )
+    return ann_services
+
+
+def markdown(
+    service_file_paths: Sequence[SpecPath],
+    outdir: Path,
+    force: bool,
+    incremental: bool = False,
+    partitioning: Optional[PartitionOptions] = None,
+    low_memory: bool = False,
+    repos_dir: Optional[Path] = None,
+    cache_dir: Optional[Path] = None,
+    openapi: Optional[OpenAPIMode] = None,
+):
     """Reads services from disk, annotates them jointly and generates individual
-    markdown files representing their annotated state."""
-    # Read services
-    services = [load_service(in_path) for in_path in service_file_paths]
+    markdown files representing their annotated state.
 
-    # Annotate services
-    ann_services = annotate_services(services)
+    In incremental mode, the digest of all inputs of every page is recorded in a
+    manifest in the output directory and only pages with changed inputs are
+    regenerated, and the communication diagrams are assembled from cached
+    per-service fragments.
+
+    Pages are dated with the latest commit changing the contributing service
+    specifications, see commit_times, or with the time they were generated if any
+    of them is not committed.
+
+    If a partitioning strategy is given, the communication diagram is split into
+    multiple pages that are linked from an index page. In incremental mode, the
+    pages of partitions recorded in the manifest that no longer exist are
+    removed.
+
+    In low memory mode, services are streamed through annotation, rendering and
+    writing one at a time, so that memory usage is bounded by a compact index of
+    the landscape. This mode supports neither incremental generation nor
+    partitioning.
+
+    If a directory containing the repositories of the services is given, the
+    configuration schema and example configuration of every service are merged
+    into its configuration, see ServiceConfigReader. The REST endpoints of
+    every service can be checked against or replaced by those in its OpenAPI
+    document, see OpenAPIReader.
+
+    Every load, annotation, rendering and write is reported to the registered
+    observers."""
+    if low_memory:
+        if incremental or (
+            partitioning is not None and partitioning.strategy != PartitionStrategy.NONE
+        ):
+            raise ValueError(
+                "The low memory mode supports neither incremental generation"
+                + " nor partitioning."
+            )
+        stream_markdown(
+            service_file_paths,
+            outdir,
+            force,
+            config_reader=_config_reader(repos_dir, cache_dir),
+            openapi_reader=_openapi_reader(repos_dir, cache_dir, openapi),
+            openapi=openapi,
+        )
+        return
+
+    # Read and annotate services
+    ann_services = _load_and_annotate(service_file_paths, repos_dir, cache_dir, openapi)
     ann_services_map = {
         ann_service.shortname: ann_service for ann_service in ann_services
     }
+    times_by_path = commit_times(service_file_paths)
+    input_times: Dict[str, datetime] = {
+        ann_service.shortname: times_by_path[in_path]
+        for in_path, ann_service in zip(service_file_paths, ann_services)
+        if in_path in times_by_path
+    }
+    manifest = Manifest.load(outdir) if incremental else None
 
     # Generate and write markdown representation
     for in_path, ann_service in zip(service_file_paths, ann_services):
-        out_path = (outdir / in_path.name).with_suffix(".md")
-        if not out_path.exists() or force:
-            out_path.write_text(
-                generate_markdown(
-                    services=ann_services_map, service_key=ann_service.shortname
-                )
-            )
+        _write_page(
+            out_path=(outdir / in_path.name).with_suffix(".md"),
+            render=partial(
+                generate_markdown,
+                services=ann_services_map,
+                service_key=ann_service.shortname,
+                timestamp=service_page_time(ann_service, input_times, ann_services_map),
+            ),
+            force=force,
+            manifest=manifest,
+            digest=partial(
+                service_page_digest, ann_services_map, ann_service.shortname
+            ),
+        )
 
     diagram_out_path = (outdir / "service_communications").with_suffix(".md")
-    if not diagram_out_path.exists() or force:
-        diagram_out_path.write_text(
-            generate_complete_diagram(services=ann_services_map)
+    partition_paths: Set[Path] = set()
+    if partitioning is None or partitioning.strategy == PartitionStrategy.NONE:
+        _write_page(
+            out_path=diagram_out_path,
+            render=partial(
+                generate_complete_diagram,
+                services=ann_services_map,
+                fragment_cache=FragmentCache(manifest.fragments) if manifest else None,
+            ),
+            force=force,
+            manifest=manifest,
+            digest=partial(complete_diagram_digest, ann_services_map),
+        )
+    else:
+        partitions = partition_services(ann_services_map, partitioning)
+        for weight, partition in enumerate(partitions, start=2):
+            out_path = (outdir / partition_page_name(partition)).with_suffix(".md")
+            partition_paths.add(out_path)
+            _write_page(
+                out_path=out_path,
+                render=partial(generate_partition_diagram, partition, weight),
+                force=force,
+                manifest=manifest,
+                digest=partial(partition_digest, partition),
+            )
+        index_page = generate_partition_index(partitions)
+        _write_page(
+            out_path=diagram_out_path,
+            render=lambda: index_page,
+            force=force,
+            manifest=manifest,
+            digest=partial(hash_text, index_page),
         )
 
+    if manifest is not None:
+        _prune_partition_pages(outdir, partition_paths, manifest)
+        manifest.save()
 
-def annotate(service_file_paths: List[Path], outdir: Path, force: bool):
+
+def annotate(
+    service_file_paths: Sequence[SpecPath],
+    outdir: Path,
+    force: bool,
+    repos_dir: Optional[Path] = None,
+    cache_dir: Optional[Path] = None,
+    openapi: Optional[OpenAPIMode] = None,
+):
     """Reads services from disk and writes their annotated counterpart to a
     specified output directory. The output filenames are suffixed with
     '.annotated.yaml' and outputfile are overwritten if the force option is
-    set."""
-    # Read services
-    services = [load_service(in_path) for in_path in service_file_paths]
-
-    # Annotate services
-    ann_services = annotate_services(services)
+    set. If a directory containing the repositories of the services is given,
+    their documented configuration is merged in and their REST endpoints can be
+    checked against or replaced by their OpenAPI documents. Every load,
+    annotation and write is reported to the registered observers."""
+    # Read and annotate services
+    ann_services = _load_and_annotate(service_file_paths, repos_dir, cache_dir, openapi)
 
     # Write annotated services
     for in_path, ann_service in zip(service_file_paths, ann_services):
-        write_service(
-            service=ann_service,
-            out_path=(outdir / in_path.name).with_suffix(".annotated.yaml"),
-            force=force,
+        out_path = (outdir / in_path.name).with_suffix(".annotated.yaml")
+        with hooks.span(hooks.WRITE, out_path.name) as span:
+            written = write_service(service=ann_service, out_path=out_path, force=force)
+            if span is not None:
+                span.bytes_written = written
+
+
+def export(
+    service_file_paths: Sequence[SpecPath],
+    out_path: Path,
+    export_format: ExportFormat,
+    force: bool,
+):
+    """Reads services from disk, annotates them jointly and exports their
+    communication graph to a file without rendering any templates."""
+    ann_services = _load_and_annotate(service_file_paths)
+    export_graph(
+        services={ann_service.shortname: ann_service for ann_service in ann_services},
+        out_path=out_path,
+        export_format=export_format,
+        force=force,
+    )
+
+
+def site(
+    service_file_paths: Sequence[SpecPath],
+    outdir: Path,
+    force: bool,
+    partitioning: Optional[PartitionOptions] = None,
+    mermaid_url: Optional[str] = DEFAULT_MERMAID_URL,
+    repos_dir: Optional[Path] = None,
+    cache_dir: Optional[Path] = None,
+    openapi: Optional[OpenAPIMode] = None,
+):
+    """Reads services from disk, annotates them jointly and writes a static HTML
+    site with one page per service, the communication diagrams and a search
+    index. If a directory containing the repositories of the services is given,
+    their documented configuration is merged in and their REST endpoints can be
+    checked against or replaced by their OpenAPI documents."""
+    ann_services = _load_and_annotate(service_file_paths, repos_dir, cache_dir, openapi)
+    generate_site(
+        services={ann_service.shortname: ann_service for ann_service in ann_services},
+        outdir=outdir,
+        partitioning=partitioning
+        or PartitionOptions(strategy=PartitionStrategy.COMPONENT),
+        force=force,
+        mermaid_url=mermaid_url,
+    )
+
+
+def serve(service_file_paths: List[Path], host: str, port: int, cache_size: int):
+    """Loads and annotates services once and answers HTTP requests for rendered
+    pages, annotated services and graph queries until interrupted."""
+    landscape = Landscape(service_file_paths)
+    http_server = LandscapeServer(landscape, cache_size=cache_size).create_http_server(
+        host, port
+    )
+    bound_host, bound_port = http_server.server_address[:2]
+    msg.info(
+        f"Serving {len(landscape.services)} services on http://{bound_host!s}:{bound_port}"
+        + " (POST /reload to reload changed specifications)"
+    )
+    try:
+        http_server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        http_server.server_close()
+
+
+def watch(spec_paths: List[Path], outdir: Path, debounce: float, polling: bool):
+    """Generates markdown files for all services and regenerates the pages
+    affected by changes of the service specifications until interrupted. The
+    spec paths may be files or directories containing specification files."""
+    landscape = Landscape(find_service_files(spec_paths))
+    rebuilder = MarkdownRebuilder(landscape, outdir)
+    written = rebuilder.build()
+    msg.info(f"Wrote {written} pages for {len(landscape.services)} services.")
+
+    watcher = create_watcher(spec_paths, polling=polling, exclude=[outdir])
+    try:
+        while True:
+            wait_debounced(watcher, debounce)
+            start = perf_counter()
+            try:
+                affected = landscape.reload(find_service_files(spec_paths))
+            except (IOError, ServiceFileValidationError) as error:
+                msg.err(error)
+                continue
+            written = rebuilder.build(affected)
+            msg.info(
+                f"Rebuilt {written} pages affected by changes of"
+                + f" {len(affected)} services in {perf_counter() - start:.3f}s."
+            )
+    except KeyboardInterrupt:
+        pass
+    finally:
+        watcher.close()
+
+
+def synth(outdir: Path, options: SynthOptions, spec_format: SpecFormat, force: bool):
+    """Generates a synthetic landscape of services and writes one specification
+    file per service to the output directory."""
+    start = perf_counter()
+    paths = write_landscape(options, outdir, spec_format, force=force)
+    msg.info(
+        f"Wrote {len(paths)} synthetic service specifications in"
+        + f" {perf_counter() - start:.3f}s."
+    )
+
+
+def validate(
+    spec_paths: List[Path], json_output: bool = False, jobs: Optional[int] = None
+) -> bool:
+    """Validates all service specification files concurrently and reports every
+    problem found, as text or as JSON on stdout. The spec paths may be files or
+    directories containing specification files. Returns whether all files are
+    valid."""
+    paths = find_service_files(spec_paths)
+    issues = validate_files(paths, jobs=jobs)
+    if json_output:
+        print(json.dumps([issue._asdict() for issue in issues], indent=2))
+    else:
+        for issue in issues:
+            print(issue)
+        invalid = len({issue.path for issue in issues})
+        if issues:
+            msg.err(f"Found {len(issues)} problems in {invalid} of {len(paths)} files.")
+        else:
+            msg.info(f"All {len(paths)} files are valid.")
+    return not issues
+
+
+def check_events(
+    spec_paths: List[Path],
+    repos_dir: Path,
+    cache_dir: Optional[Path] = None,
+    json_output: bool = False,
+    jobs: Optional[int] = None,
+) -> bool:
+    """Reads the event payload schemas of all services from their repositories
+    and reports every pair of producer and consumer whose schemas are
+    incompatible, as text or as JSON on stdout. The spec paths may be files or
+    directories containing specification files. Returns whether all schemas are
+    compatible."""
+    services = [load_service(path) for path in find_service_files(spec_paths)]
+    reader = EventSchemaReader(repos_dir, cache_dir=cache_dir, jobs=jobs)
+    result = check_event_schemas(services, reader)
+    if json_output:
+        print(
+            json.dumps(
+                [
+                    incompatibility._asdict()
+                    for incompatibility in result.incompatibilities
+                ],
+                indent=2,
+            )
+        )
+    else:
+        for incompatibility in result.incompatibilities:
+            print(incompatibility)
+        summary = (
+            f"{result.edges} producer and consumer pairs with"
+            + f" {result.unique_schemas} distinct schemas,"
+            + f" {result.unique_pairs} distinct pairs of schemas checked."
         )
+        if result.incompatibilities:
+            msg.err(
+                f"Found {len(result.incompatibilities)} incompatibilities in {summary}"
+            )
+        else:
+            msg.info(f"No incompatibilities in {summary}")
+    return not result.incompatibilities
+
+
+def discover(
+    spec_paths: List[Path],
+    repos_dir: Path,
+    output: DiscoverOutput = DiscoverOutput.DIFF,
+    cache_dir: Optional[Path] = None,
+    jobs: Optional[int] = None,
+):
+    """Scans the Python sources in the repositories of all services for the REST
+    endpoints and events they actually use and prints, for every service, either
+    the differences to its specification or a draft of its API section. The spec
+    paths may be files or directories containing specification files."""
+    if not repos_dir.is_dir():
+        raise NotADirectoryError(f"'{repos_dir}' is not a directory.")
+    services = [load_service(path) for path in find_service_files(spec_paths)]
+    scanner = SourceScanner(cache_dir=cache_dir, jobs=jobs)
+    results = scanner.scan(repos_dir / service.name for service in services)
+    discovered = discover_api(
+        services, {repo_dir.name: findings for repo_dir, findings in results.items()}
+    )
+
+    differing = 0
+    for api in discovered:
+        if output == DiscoverOutput.DRAFT:
+            draft = {"shortname": api.service.shortname, "api": api.draft().dict()}
+            print("---")
+            print(yaml.dump(draft, sort_keys=False), end="")
+            continue
+        lines = api.diff()
+        if lines:
+            differing += 1
+            print(f"{api.service.shortname} ({api.service.name}):")
+            print("\n".join(f"  {line}" for line in lines))
+
+    for error in scanner.errors:
+        msg.warn(f"Skipped unparsable source {error}")
+    summary = f"Scanned {scanner.scanned} new or changed files of {len(results)}"
+    summary += f" of {len(services)} service repositories"
+    if output == DiscoverOutput.DIFF:
+        summary += f", {differing} services differ from their specification"
+    msg.info(f"{summary}.")
+
+
+def fetch(
+    manifest_path: Path,
+    outdir: Path,
+    connections: int,
+    timeout: float,
+) -> bool:
+    """Fetches the service specifications listed in a manifest, which maps file
+    names to URLs, into a directory, revalidating previously fetched files. See
+    SpecFetcher. Returns whether all specifications could be fetched."""
+    if not outdir.is_dir():
+        raise NotADirectoryError(f"'{outdir}' is not a directory.")
+    manifest = load_spec_manifest(manifest_path)
+    results = SpecFetcher(outdir, max_connections=connections, timeout=timeout).fetch(
+        manifest
+    )
+    failed = [result for result in results if result.error]
+    for result in failed:
+        msg.err(result.error)
+    changed = sum(result.changed for result in results)
+    msg.info(
+        f"Fetched {len(results)} specifications: {changed} changed,"
+        + f" {len(results) - changed - len(failed)} unchanged, {len(failed)} failed."
+    )
+    return not failed
+
+
+def _expand_spec_paths(spec_paths: Sequence[SpecPath]) -> List[SpecPath]:
+    """Expands directories on disk to the specification files they contain."""
+    expanded: List[SpecPath] = []
+    for path in spec_paths:
+        if isinstance(path, Path):
+            expanded.extend(find_service_files([path]))
+        else:
+            expanded.append(path)
+    return expanded
+
+
+def diff(
+    old_spec_paths: Sequence[SpecPath],
+    new_spec_paths: Sequence[SpecPath],
+    json_output: bool = False,
+) -> bool:
+    """Annotates two versions of a landscape and prints the added, removed and
+    changed services, endpoints, events, configuration and edges, as text or as
+    JSON on stdout. The spec paths may be files or directories on disk or in
+    git. Returns whether the landscapes are equal."""
+    trees = []
+    for spec_paths in (old_spec_paths, new_spec_paths):
+        ann_services = _load_and_annotate(_expand_spec_paths(spec_paths))
+        trees.append(
+            landscape_tree(
+                {ann_service.shortname: ann_service for ann_service in ann_services}
+            )
+        )
+    changes = diff_trees(*trees)
+
+    if json_output:
+        print(json.dumps([change._asdict() for change in changes], indent=2))
+    else:
+        for change in changes:
+            print(change)
+        services = len({change.service for change in changes})
+        msg.info(f"Found {len(changes)} changes in {services} services.")
+    return not changes
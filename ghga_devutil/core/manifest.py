@@ -0,0 +1,83 @@
+# Copyright 2021 - 2023 Universität Tübingen, DKFZ, EMBL, and Universität zu Köln
+# for the German Human Genome-Phenome Archive (GHGA)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+"""Input-hash manifest for incremental output generation"""
+
+import json
+from pathlib import Path
+from typing import Dict, Optional
+
+MANIFEST_FILENAME = ".ghga-devutil-manifest.json"
+MANIFEST_VERSION = 1
+
+
+class Manifest:
+    """Records the digest of all inputs an output page was generated from, as well
+    as the cached diagram fragments of individual services. The manifest is stored
+    next to the outputs in the output directory."""
+
+    def __init__(
+        self,
+        path: Path,
+        pages: Optional[Dict[str, str]] = None,
+        fragments: Optional[Dict[str, str]] = None,
+    ):
+        self.path = path
+        self.pages: Dict[str, str] = pages or {}
+        self.fragments: Dict[str, str] = fragments or {}
+
+    @classmethod
+    def load(cls, outdir: Path) -> "Manifest":
+        """Loads the manifest of an output directory. A missing, unreadable or
+        outdated manifest yields an empty one, so all outputs are regenerated."""
+        path = outdir / MANIFEST_FILENAME
+        try:
+            obj = json.loads(path.read_text())
+        except (OSError, ValueError):
+            return cls(path)
+        if not isinstance(obj, dict) or obj.get("version") != MANIFEST_VERSION:
+            return cls(path)
+        return cls(
+            path,
+            pages=dict(obj.get("pages", {})),
+            fragments=dict(obj.get("fragments", {})),
+        )
+
+    def is_stale(self, out_path: Path, digest: str) -> bool:
+        """Checks whether an output needs to be regenerated."""
+        return self.pages.get(out_path.name) != digest or not out_path.exists()
+
+    def record(self, out_path: Path, digest: str) -> None:
+        """Records the input digest of a generated output."""
+        self.pages[out_path.name] = digest
+
+    def forget(self, out_path: Path) -> None:
+        """Removes an output that is no longer generated."""
+        self.pages.pop(out_path.name, None)
+
+    def save(self) -> None:
+        """Writes the manifest to disk."""
+        self.path.write_text(
+            json.dumps(
+                {
+                    "version": MANIFEST_VERSION,
+                    "pages": self.pages,
+                    "fragments": self.fragments,
+                },
+                indent=2,
+                sort_keys=True,
+            )
+        )
@@ -18,11 +18,18 @@
 
 import re
 from datetime import datetime, timezone
-from typing import Mapping
+from functools import lru_cache, partial
+from typing import Callable, Container, Dict, Iterable, List, Mapping, Optional
 
 from jinja2 import Environment, PackageLoader, select_autoescape
 
+from ghga_devutil.core.annotate import service_neighbours
+from ghga_devutil.core.graph import service_title
+from ghga_devutil.core.hashing import hash_model, hash_models, hash_text
 from ghga_devutil.core.models import AnnotatedService
+from ghga_devutil.core.partition import Partition
+
+PARTITION_PAGE_PREFIX = "service_communications_"
 
 
 def _transform_tag(tag: str) -> str:
@@ -34,45 +41,183 @@ def _transform_tag(tag: str) -> str:
     return tag
 
 
-def generate_complete_diagram(services: Mapping[str, AnnotatedService]) -> str:
-    """Generates diagram page markdown from services"""
-    # Load jinja2 template
+@lru_cache(maxsize=None)
+def templates_digest() -> str:
+    """Returns a digest over the sources of all packaged templates, so that outputs
+    are considered stale when a template changes."""
+    env = Environment(loader=PackageLoader("ghga_devutil"))
+    names = env.list_templates(filter_func=lambda name: name.endswith(".jinja"))
+    parts: List[str] = []
+    for name in names:
+        source, _, _ = env.loader.get_source(env, name)  # type: ignore[union-attr]
+        parts.extend((name, source))
+    return hash_text(*parts)
+
+
+def service_page_digest(
+    services: Mapping[str, AnnotatedService], service_key: str
+) -> str:
+    """Returns a digest over all inputs of a service page: the annotated service,
+    the names of its neighbours and the template versions."""
+    service = services[service_key]
+    neighbours = [
+        f"{shortname}:{services[shortname].name}"
+        if shortname in services
+        else shortname
+        for shortname in sorted(service_neighbours(service))
+    ]
+    return hash_text(templates_digest(), hash_model(service), *neighbours)
+
+
+def service_page_time(
+    service: AnnotatedService,
+    input_times: Mapping[str, datetime],
+    shortnames: Container[str],
+) -> Optional[datetime]:
+    """Returns the date of a service page, i.e. the latest of the input times of
+    the service and its neighbours in the landscape given by its shortnames, or
+    None if any of them has no input time."""
+    contributors = [
+        shortname
+        for shortname in service_neighbours(service) | {service.shortname}
+        if shortname in shortnames
+    ]
+    if not all(shortname in input_times for shortname in contributors):
+        return None
+    return max(input_times[shortname] for shortname in contributors)
+
+
+def complete_diagram_digest(services: Mapping[str, AnnotatedService]) -> str:
+    """Returns a digest over all inputs of the service communications page."""
+    return hash_text(templates_digest(), hash_models(services))
+
+
+FRAGMENT_KINDS = ("events", "rest")
+
+
+class FragmentCache:
+    """Caches the diagram fragments rendered for individual services, keyed by the
+    digest of the fragment inputs."""
+
+    def __init__(self, fragments: Optional[Dict[str, str]] = None):
+        self.fragments: Dict[str, str] = fragments if fragments is not None else {}
+        self.rendered = 0
+
+    def get_or_render(self, key: str, render: Callable[[], str]) -> str:
+        """Returns the cached fragment or renders and caches it."""
+        if key not in self.fragments:
+            self.fragments[key] = render()
+            self.rendered += 1
+        return self.fragments[key]
+
+    def retain(self, keys: Iterable[str]) -> None:
+        """Drops all fragments except for the given ones."""
+        keep = set(keys)
+        for key in list(self.fragments):
+            if key not in keep:
+                del self.fragments[key]
+
+
+def create_environment(enable_async: bool = False) -> Environment:
+    """Creates a jinja2 environment providing the helpers used by the templates.
+    HTML templates are autoescaped, markdown templates are not."""
     env = Environment(
-        loader=PackageLoader("ghga_devutil"), autoescape=select_autoescape()
+        loader=PackageLoader("ghga_devutil"),
+        autoescape=select_autoescape(
+            enabled_extensions=("html", "htm", "xml", "html.jinja")
+        ),
+        enable_async=enable_async,
     )
-    template = env.get_template("service_communications.md.jinja")
-    template.globals["cur_time"] = lambda: datetime.now(tz=timezone.utc)
-    template.globals["service_title"] = lambda service: service.name.replace(
-        "-", " "
-    ).title()
-    # Get event topic set for diagrams
-    template.globals["topics"] = lambda events: set(event.topic for event in events)
-    template.globals["has_any_consumer"] = lambda produces: bool(
+    env.globals["transform_tag"] = _transform_tag
+    env.globals["service_title"] = service_title
+    # Get the sorted distinct event topics for diagrams
+    env.globals["topics"] = lambda events: sorted({event.topic for event in events})
+    # Check if service API has any consumers (any relation)
+    env.globals["has_any_consumer"] = lambda produces: bool(
         sum(len(item.consumers) for item in produces)
     )
-    return template.render(services=services)
+    return env
+
+
+def generate_complete_diagram(
+    services: Mapping[str, AnnotatedService],
+    fragment_cache: Optional[FragmentCache] = None,
+) -> str:
+    """Generates diagram page markdown from services. The diagrams are composed of
+    fragments rendered per service, which are reused from the fragment cache if
+    the inputs of a service did not change."""
+    cache = fragment_cache if fragment_cache is not None else FragmentCache()
+    env = create_environment()
+    fragment_templates = {
+        kind: env.get_template(f"mermaid/communications_{kind}.md.jinja")
+        for kind in FRAGMENT_KINDS
+    }
+
+    fragments: Dict[str, List[str]] = {kind: [] for kind in fragment_templates}
+    used_keys = []
+    for service_key, service in services.items():
+        digest = service_page_digest(services, service_key)
+        for kind, template in fragment_templates.items():
+            key = f"{kind}:{digest}"
+            used_keys.append(key)
+            fragments[kind].append(
+                cache.get_or_render(
+                    key,
+                    partial(template.render, services=services, service=service),
+                )
+            )
+    cache.retain(used_keys)
+
+    template = env.get_template("service_communications.md.jinja")
+    return template.render(
+        event_fragments=fragments["events"], rest_fragments=fragments["rest"]
+    )
 
 
 def generate_markdown(
-    services: Mapping[str, AnnotatedService], service_key: str
+    services: Mapping[str, AnnotatedService],
+    service_key: str,
+    timestamp: Optional[datetime] = None,
 ) -> str:
-    """Generates markdown from service"""
+    """Generates markdown from service. The page date is set to the given timestamp
+    or, if none is given, to the current time."""
     # Load jinja2 template
-    env = Environment(
-        loader=PackageLoader("ghga_devutil"), autoescape=select_autoescape()
-    )
+    env = create_environment()
     template = env.get_template("service_page.md.jinja")
-    template.globals["cur_time"] = lambda: datetime.now(tz=timezone.utc)
-    template.globals["transform_tag"] = _transform_tag
-    template.globals["service_title"] = lambda service: service.name.replace(
-        "-", " "
-    ).title()
-    # Get event topic set for diagrams
-    template.globals["topics"] = lambda events: set(event.topic for event in events)
-    # Check if service API has any consumers (any relation)
-    template.globals["has_any_consumer"] = lambda produces: bool(
-        sum(len(item.consumers) for item in produces)
-    )
 
     # Render markdown
-    return template.render(services=services, service_key=service_key)
+    return template.render(
+        services=services,
+        service_key=service_key,
+        cur_time=lambda: timestamp or datetime.now(tz=timezone.utc),
+    )
+
+
+def partition_page_name(partition: Partition) -> str:
+    """Returns the page name of a partial communications diagram."""
+    return f"{PARTITION_PAGE_PREFIX}{partition.name}"
+
+
+def partition_digest(partition: Partition) -> str:
+    """Returns a digest over all inputs of a partial communications diagram."""
+    return hash_text(
+        templates_digest(),
+        partition.name,
+        partition.title,
+        *("\t".join(node) for node in partition.nodes),
+        *("\t".join(edge) for edge in partition.edges),
+    )
+
+
+def generate_partition_diagram(partition: Partition, weight: int) -> str:
+    """Generates the diagram page markdown of one part of the communication graph"""
+    env = create_environment()
+    template = env.get_template("service_communications_part.md.jinja")
+    return template.render(partition=partition, weight=weight)
+
+
+def generate_partition_index(partitions: List[Partition]) -> str:
+    """Generates the index page markdown linking all partial diagram pages"""
+    env = create_environment()
+    template = env.get_template("service_communications_index.md.jinja")
+    return template.render(partitions=partitions, page_name=partition_page_name)
@@ -0,0 +1,112 @@
+# Copyright 2021 - 2023 Universität Tübingen, DKFZ, EMBL, and Universität zu Köln
+# for the German Human Genome-Phenome Archive (GHGA)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+"""Peak memory reporting of pipeline runs based on tracemalloc"""
+
+import sys
+import threading
+import tracemalloc
+from dataclasses import dataclass, field
+from typing import Dict, Sequence
+
+from ghga_devutil.core.hooks import Observer, Span
+
+MIB = 1024 * 1024
+
+
+def _peak_rss() -> int:
+    """Returns the peak resident set size of the process in bytes, or 0 where
+    the resource module is not available, i.e. on Windows."""
+    try:
+        import resource  # pylint: disable=import-outside-toplevel
+    except ImportError:
+        return 0
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is given in bytes on macOS and in kibibytes elsewhere
+    return peak_rss if sys.platform == "darwin" else peak_rss * 1024
+
+
+@dataclass
+class MemoryReport(Observer):
+    """Observes a pipeline run and records the peak of the memory allocated by
+    Python in each phase and overall, as traced by tracemalloc, as well as the
+    peak resident set size of the process where it is available. Tracing starts
+    when the report is created and stops with stop().
+
+    Tracemalloc has a single peak per process, which is only reset when a
+    top-level span of the main thread starts or finishes. The peaks of spans
+    nested in those or run by other threads are the peak since the last reset,
+    i.e. an upper bound."""
+
+    phase_peaks: Dict[str, int] = field(default_factory=dict)
+    peak: int = 0
+    peak_rss: int = 0
+
+    def __post_init__(self):
+        self._started_tracing = not tracemalloc.is_tracing()
+        if self._started_tracing:
+            tracemalloc.start()
+        tracemalloc.reset_peak()
+        self._depth = 0
+        self._lock = threading.Lock()
+
+    def _update_peak(self, reset: bool) -> int:
+        """Returns the peak since the last reset and optionally resets it."""
+        _, peak = tracemalloc.get_traced_memory()
+        if reset:
+            tracemalloc.reset_peak()
+        self.peak = max(self.peak, peak)
+        return peak
+
+    def span_started(self, span: Span) -> None:
+        """Starts measuring the peak of a top-level span of the main thread."""
+        if threading.current_thread() is threading.main_thread():
+            with self._lock:
+                self._depth += 1
+                self._update_peak(reset=self._depth == 1)
+
+    def span_finished(self, span: Span) -> None:
+        """Records the peak of a span for its phase."""
+        on_main_thread = threading.current_thread() is threading.main_thread()
+        with self._lock:
+            if on_main_thread:
+                self._depth -= 1
+            peak = self._update_peak(reset=on_main_thread and self._depth == 0)
+            self.phase_peaks[span.phase] = max(
+                self.phase_peaks.get(span.phase, 0), peak
+            )
+
+    def spans_merged(self, spans: Sequence[Span]) -> None:
+        """Ignores spans of worker processes, whose memory is not traced."""
+
+    def stop(self) -> None:
+        """Records the final peaks and stops tracing if it was started by the
+        report."""
+        if tracemalloc.is_tracing():
+            self._update_peak(reset=True)
+        if self._started_tracing:
+            tracemalloc.stop()
+        self.peak_rss = _peak_rss()
+
+    def format_table(self) -> str:
+        """Returns the peaks as a plain text table."""
+        lines = [f"{'phase':<10} {'peak (MiB)':>12}"]
+        for phase, peak in self.phase_peaks.items():
+            lines.append(f"{phase:<10} {peak / MIB:>12.1f}")
+        lines.append(f"{'overall':<10} {self.peak / MIB:>12.1f}")
+        if self.peak_rss:
+            lines.append(f"Peak resident set size: {self.peak_rss / MIB:.1f} MiB")
+        return "\n".join(lines)
@@ -165,6 +165,7 @@ class EventInterface(BaseEventInterface):
 class AnnotatedEventInterface(BaseEventInterface):
     """A consumer-annotated event interface"""
 
+    consumes: List[ConsumedConfiguredEvent] = []  # type: ignore[assignment]
     produces: List[AnnotatedConfiguredEvent] = []
 
 
@@ -203,6 +204,8 @@ class ConfigVariable(FrozenBaseModel):
 
     name: str
     description: str
+    type: Optional[str] = None
+    default: Optional[str] = None
     value: Optional[str] = None
 
 
@@ -0,0 +1,265 @@
+# Copyright 2021 - 2023 Universität Tübingen, DKFZ, EMBL, and Universität zu Köln
+# for the German Human Genome-Phenome Archive (GHGA)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+"""Ingestion of the REST endpoints that services document in OpenAPI documents"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from itertools import repeat
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+import yaml
+from yaml.events import (
+    Event,
+    MappingEndEvent,
+    MappingStartEvent,
+    ScalarEvent,
+    SequenceEndEvent,
+    SequenceStartEvent,
+)
+
+from ghga_devutil.core import hooks
+from ghga_devutil.core.cache import ContentCache
+from ghga_devutil.core.exceptions import OpenAPIDocumentError
+from ghga_devutil.core.models import HTTPMethod, RESTEndpoint, Service
+from ghga_devutil.options import OpenAPIMode
+
+try:
+    from yaml import CSafeLoader as SafeLoader
+except ImportError:  # pragma: no cover
+    from yaml import SafeLoader
+
+OPENAPI_FILE = "openapi.yaml"
+
+# change the namespace whenever the parsing changes to invalidate the cache
+OPENAPI_CACHE_NAMESPACE = "openapi-paths-v1"
+
+HTTP_METHODS = {method.value.lower(): method.value for method in HTTPMethod}
+
+
+def _skip(events: Iterator[Event], event: Event) -> None:
+    """Consumes the remaining events of the node started by the given event."""
+    depth = int(isinstance(event, (MappingStartEvent, SequenceStartEvent)))
+    while depth:
+        event = next(events)
+        if isinstance(event, (MappingStartEvent, SequenceStartEvent)):
+            depth += 1
+        elif isinstance(event, (MappingEndEvent, SequenceEndEvent)):
+            depth -= 1
+
+
+def _iter_mapping(events: Iterator[Event]) -> Iterator[Tuple[Optional[str], Event]]:
+    """Yields the scalar value of every key and the first event of its value
+    until the end of the current mapping. The caller must consume the value."""
+    while True:
+        key = next(events)
+        if isinstance(key, MappingEndEvent):
+            return
+        _skip(events, key)
+        yield getattr(key, "value", None), next(events)
+
+
+def parse_openapi_paths(content: bytes) -> List[List[str]]:
+    """Returns the path and method of every operation of an OpenAPI document in
+    document order. The document is parsed as a stream of events and only the
+    paths object is looked at, so that the document is never constructed and
+    parsing stops right after the paths object."""
+    events = iter(yaml.parse(content, Loader=SafeLoader))
+    root = next(events, None)
+    while root is not None and not isinstance(
+        root, (MappingStartEvent, SequenceStartEvent, ScalarEvent)
+    ):
+        root = next(events, None)
+    if not isinstance(root, MappingStartEvent):
+        raise ValueError("not an OpenAPI document")
+
+    operations: List[List[str]] = []
+    for key, value in _iter_mapping(events):
+        if key != "paths" or not isinstance(value, MappingStartEvent):
+            _skip(events, value)
+            continue
+        for path, item in _iter_mapping(events):
+            if not isinstance(item, MappingStartEvent):
+                _skip(events, item)
+                continue
+            for method, operation in _iter_mapping(events):
+                _skip(events, operation)
+                if path is not None and method and method.lower() in HTTP_METHODS:
+                    operations.append([path, HTTP_METHODS[method.lower()]])
+        break
+    return operations
+
+
+def _parse_document(name: str, content: bytes) -> Tuple[Optional[List[List[str]]], str]:
+    """Parses an OpenAPI document, returning the error instead of raising it, so
+    that it can be reported with the path."""
+    with hooks.span(hooks.PARSE, f"{name} openapi document"):
+        try:
+            return parse_openapi_paths(content), ""
+        except (ValueError, StopIteration, yaml.YAMLError) as error:
+            return None, str(error) or "unexpected end of document"
+
+
+def _parse_document_in_worker(
+    document: Tuple[str, bytes], record: bool
+) -> Tuple[Optional[List[List[str]]], str, List[hooks.Span]]:
+    """Parses an OpenAPI document in a worker process, returning the spans
+    recorded in the worker if requested."""
+    if not record:
+        return (*_parse_document(*document), [])
+    with hooks.recording() as spans:
+        operations, error = _parse_document(*document)
+    return operations, error, spans
+
+
+class OpenAPIReader:
+    """Reads the REST endpoints of services from the OpenAPI documents in a
+    directory containing a checkout of every service repository, named like the
+    service. Parsed documents are cached by their content digest, in memory and
+    optionally in a cache directory, and documents that are not cached are
+    parsed in parallel worker processes."""
+
+    def __init__(
+        self,
+        repos_dir: Path,
+        cache_dir: Optional[Path] = None,
+        jobs: Optional[int] = None,
+    ):
+        if not repos_dir.is_dir():
+            raise NotADirectoryError(f"'{repos_dir}' is not a directory.")
+        self.repos_dir = repos_dir
+        self.jobs = jobs or os.cpu_count() or 1
+        self.cache = ContentCache(OPENAPI_CACHE_NAMESPACE, cache_dir)
+
+    def document_path(self, service_name: str) -> Path:
+        """Returns the path of the OpenAPI document of a service."""
+        return self.repos_dir / service_name / OPENAPI_FILE
+
+    def _read_bytes(self, service_name: str) -> Optional[bytes]:
+        try:
+            return self.document_path(service_name).read_bytes()
+        except FileNotFoundError:
+            return None
+
+    @staticmethod
+    def _endpoints(operations: List[List[str]]) -> List[RESTEndpoint]:
+        return [RESTEndpoint(path=path, method=method) for path, method in operations]
+
+    def read(self, service_name: str) -> Optional[List[RESTEndpoint]]:
+        """Returns the endpoints documented by a service or None if the service
+        has no OpenAPI document."""
+        return self.read_all([service_name])[service_name]
+
+    def read_all(
+        self, service_names: Iterable[str]
+    ) -> Dict[str, Optional[List[RESTEndpoint]]]:
+        """Returns the endpoints documented by several services. The documents
+        are read concurrently and distinct uncached documents are parsed in
+        parallel."""
+        names = list(dict.fromkeys(service_names))
+        with ThreadPoolExecutor(max_workers=min(32, self.jobs + 4)) as executor:
+            contents = dict(zip(names, executor.map(self._read_bytes, names)))
+
+        digests: Dict[str, str] = {}
+        parsed: Dict[str, List[List[str]]] = {}
+        uncached: Dict[str, Tuple[str, bytes]] = {}
+        for name, content in contents.items():
+            if content is None:
+                continue
+            digests[name] = digest = self.cache.digest(content)
+            if digest in parsed or digest in uncached:
+                continue
+            operations = self.cache.get(digest)
+            if operations is None:
+                uncached[digest] = (name, content)
+            else:
+                parsed[digest] = operations
+
+        jobs = min(self.jobs, len(uncached))
+        documents = list(uncached.values())
+        results: List[Tuple[Optional[List[List[str]]], str]] = []
+        if jobs <= 1:
+            results = [_parse_document(name, content) for name, content in documents]
+        else:
+            record = hooks.observed()
+            with ProcessPoolExecutor(max_workers=jobs) as process_executor:
+                for operations, error, spans in process_executor.map(
+                    _parse_document_in_worker, documents, repeat(record)
+                ):
+                    hooks.merge_spans(spans)
+                    results.append((operations, error))
+        for (digest, (name, _)), (operations, error) in zip(uncached.items(), results):
+            if operations is None:
+                raise OpenAPIDocumentError(self.document_path(name), error)
+            self.cache.put(digest, operations)
+            parsed[digest] = operations
+
+        return {
+            name: self._endpoints(parsed[digests[name]]) if name in digests else None
+            for name in names
+        }
+
+
+class EndpointMismatch(NamedTuple):
+    """The differences between the REST endpoints listed in the specification of
+    a service and those documented in its OpenAPI document"""
+
+    service: str
+    undocumented: List[RESTEndpoint]
+    unlisted: List[RESTEndpoint]
+
+    def __str__(self) -> str:
+        lines = [
+            f"The REST endpoints of '{self.service}' differ from its OpenAPI document"
+        ]
+        lines.extend(
+            f"  {endpoint.method} {endpoint.path} is not documented"
+            for endpoint in self.undocumented
+        )
+        lines.extend(
+            f"  {endpoint.method} {endpoint.path} is not listed"
+            for endpoint in self.unlisted
+        )
+        return "\n".join(lines)
+
+
+def reconcile_endpoints(
+    service: Service, documented: Optional[List[RESTEndpoint]], mode: OpenAPIMode
+) -> Tuple[Service, Optional[EndpointMismatch]]:
+    """Checks the REST endpoints listed in a service specification against the
+    documented ones or replaces them. Services without an OpenAPI document are
+    returned unchanged. Returns the service and the differences found by a
+    check, if any."""
+    if documented is None:
+        return service, None
+    if mode == OpenAPIMode.REPLACE:
+        rest = service.api.rest.copy(update={"produces": documented})
+        api = service.api.copy(update={"rest": rest})
+        return service.copy(update={"api": api}), None
+
+    listed = service.api.rest.produces
+    listed_set, documented_set = set(listed), set(documented)
+    mismatch = EndpointMismatch(
+        service=service.shortname,
+        undocumented=[
+            endpoint for endpoint in listed if endpoint not in documented_set
+        ],
+        unlisted=[endpoint for endpoint in documented if endpoint not in listed_set],
+    )
+    if mismatch.undocumented or mismatch.unlisted:
+        return service, mismatch
+    return service, None
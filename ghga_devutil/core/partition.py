@@ -0,0 +1,202 @@
+# Copyright 2021 - 2023 Universität Tübingen, DKFZ, EMBL, and Universität zu Köln
+# for the German Human Genome-Phenome Archive (GHGA)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+"""Partitioning of the communication graph into multiple diagrams"""
+
+import re
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Mapping, Set
+
+from ghga_devutil.core.graph import (
+    EVENT_EDGE,
+    TOPIC_PREFIX,
+    Edge,
+    Node,
+    edge_nodes,
+    iter_raw_edges,
+    merge_edges,
+)
+from ghga_devutil.core.hashing import hash_text
+from ghga_devutil.core.models import AnnotatedService
+from ghga_devutil.options import (  # noqa: F401
+    DEFAULT_MAX_EDGES,
+    DEFAULT_MAX_NODES,
+    PartitionStrategy,
+)
+
+UNLABELED_DOMAIN = "other"
+REST_GROUP = "rest"
+
+
+@dataclass
+class Partition:
+    """A part of the communication graph that is rendered as one diagram."""
+
+    name: str
+    title: str
+    edges: List[Edge] = field(default_factory=list)
+    nodes: List[Node] = field(default_factory=list)
+
+
+@dataclass
+class PartitionOptions:
+    """Options for splitting the communication graph into multiple diagrams."""
+
+    strategy: PartitionStrategy = PartitionStrategy.NONE
+    domains: Mapping[str, str] = field(default_factory=dict)
+    max_nodes: int = DEFAULT_MAX_NODES
+    max_edges: int = DEFAULT_MAX_EDGES
+
+
+def _slugify(text: str) -> str:
+    return re.sub(r"[^a-z0-9]+", "-", text.lower()).strip("-") or "part"
+
+
+def _make_names_unique(partitions: List[Partition]) -> None:
+    """Distinguishes partitions whose names collide, e.g. because their titles
+    only differ in case or punctuation, by a hash of their title, so that their
+    pages do not overwrite each other."""
+    counts = Counter(partition.name for partition in partitions)
+    for partition in partitions:
+        if counts[partition.name] > 1:
+            partition.name = f"{partition.name}-{hash_text(partition.title)[:8]}"
+
+
+def topic_prefix(topic: str) -> str:
+    """Returns the prefix of a topic, i.e. everything before the first separator."""
+    return re.split(r"[._-]", topic, maxsplit=1)[0]
+
+
+def _component_keys(edges: List[Edge]) -> Callable[[Edge], str]:
+    """Returns a function that maps an edge to its connected component."""
+    parents: Dict[str, str] = {}
+
+    def find(node: str) -> str:
+        parents.setdefault(node, node)
+        while parents[node] != node:
+            parents[node] = parents[parents[node]]
+            node = parents[node]
+        return node
+
+    for edge in edges:
+        source_root, target_root = find(edge.source), find(edge.target)
+        if source_root != target_root:
+            parents[max(source_root, target_root)] = min(source_root, target_root)
+
+    return lambda edge: find(edge.source)
+
+
+def _topic_prefix_key(edge: Edge) -> str:
+    if edge.kind != EVENT_EDGE:
+        return REST_GROUP
+    topic_id = edge.source if edge.source.startswith(TOPIC_PREFIX) else edge.target
+    return topic_prefix(topic_id[len(TOPIC_PREFIX) :])
+
+
+def _domain_keys(
+    edges: List[Edge], domains: Mapping[str, str]
+) -> Callable[[Edge], str]:
+    """Returns a function that maps an edge to the domain of the service owning the
+    edge, which is the producer of an event or the provider of a REST endpoint."""
+    topic_owners: Dict[str, str] = {}
+    for edge in edges:
+        if edge.kind == EVENT_EDGE and edge.target.startswith(TOPIC_PREFIX):
+            topic_owners.setdefault(edge.target, edge.source)
+
+    def key(edge: Edge) -> str:
+        if edge.kind != EVENT_EDGE:
+            owner = edge.target
+        elif edge.source.startswith(TOPIC_PREFIX):
+            owner = topic_owners.get(edge.source, edge.target)
+        else:
+            owner = edge.source
+        return domains.get(owner, UNLABELED_DOMAIN)
+
+    return key
+
+
+def _split(
+    name: str, title: str, edges: List[Edge], max_nodes: int, max_edges: int
+) -> List[Partition]:
+    """Greedily splits the edges of a group into partitions respecting the node
+    and edge budget."""
+    chunks: List[List[Edge]] = [[]]
+    chunk_nodes: Set[str] = set()
+    for edge in edges:
+        new_nodes = {edge.source, edge.target} - chunk_nodes
+        if chunks[-1] and (
+            len(chunks[-1]) + 1 > max_edges
+            or len(chunk_nodes) + len(new_nodes) > max_nodes
+        ):
+            chunks.append([])
+            chunk_nodes = set()
+            new_nodes = {edge.source, edge.target}
+        chunks[-1].append(edge)
+        chunk_nodes.update(new_nodes)
+
+    if len(chunks) == 1:
+        return [Partition(name=name, title=title, edges=chunks[0])]
+    return [
+        Partition(
+            name=f"{name}-{index}",
+            title=f"{title} ({index}/{len(chunks)})",
+            edges=chunk,
+        )
+        for index, chunk in enumerate(chunks, start=1)
+    ]
+
+
+def partition_services(
+    services: Mapping[str, AnnotatedService], options: PartitionOptions
+) -> List[Partition]:
+    """Splits the merged communication graph of the given services into partitions
+    according to the given strategy. Groups exceeding the node or edge budget are
+    split further, so that no partition exceeds the budget."""
+    edges = merge_edges(iter_raw_edges(services))
+    strategy = options.strategy
+
+    if strategy == PartitionStrategy.COMPONENT:
+        group_key = _component_keys(edges)
+    elif strategy == PartitionStrategy.TOPIC_PREFIX:
+        group_key = _topic_prefix_key
+    elif strategy == PartitionStrategy.DOMAIN:
+        group_key = _domain_keys(edges, options.domains)
+    else:
+        group_key = lambda edge: "all"  # noqa: E731
+
+    groups: Dict[str, List[Edge]] = {}
+    for edge in edges:
+        groups.setdefault(group_key(edge), []).append(edge)
+
+    partitions: List[Partition] = []
+    if strategy == PartitionStrategy.COMPONENT:
+        ordered = sorted(groups.values(), key=len, reverse=True)
+        named = [
+            (f"component-{index}", f"Component {index}", group)
+            for index, group in enumerate(ordered, start=1)
+        ]
+    else:
+        named = [(_slugify(key), key, groups[key]) for key in sorted(groups)]
+    for name, title, group in named:
+        partitions.extend(
+            _split(name, title, group, options.max_nodes, options.max_edges)
+        )
+
+    _make_names_unique(partitions)
+    for partition in partitions:
+        partition.nodes = edge_nodes(partition.edges, services)
+    return partitions
@@ -0,0 +1,179 @@
+# Copyright 2021 - 2023 Universität Tübingen, DKFZ, EMBL, and Universität zu Köln
+# for the German Human Genome-Phenome Archive (GHGA)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+"""Local HTTP server answering requests from an in-memory landscape"""
+
+import json
+import re
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Lock
+from typing import Dict, List, Mapping, NamedTuple, Tuple
+
+import yaml
+
+from ghga_devutil.core.cache import LRUCache
+from ghga_devutil.core.exceptions import ServiceFileValidationError
+from ghga_devutil.core.graph import iter_raw_edges, merge_edges
+from ghga_devutil.core.landscape import Landscape
+from ghga_devutil.core.markdown import (
+    FragmentCache,
+    generate_complete_diagram,
+    generate_markdown,
+)
+from ghga_devutil.core.models import AnnotatedService
+
+MARKDOWN = "text/markdown; charset=utf-8"
+YAML = "application/yaml; charset=utf-8"
+JSON = "application/json"
+
+SERVICE_PAGE = re.compile(r"^/services/(?P<shortname>[^/]+)\.(?P<ext>md|yaml)$")
+GRAPH_QUERY = re.compile(r"^/graph/(?P<shortname>[^/]+)$")
+
+
+class Response(NamedTuple):
+    """A response to a request"""
+
+    status: int
+    content_type: str
+    body: bytes
+
+
+def _json(obj, status: int = HTTPStatus.OK) -> Response:
+    return Response(status, JSON, json.dumps(obj).encode("utf-8"))
+
+
+def _not_found(path: str) -> Response:
+    return _json({"error": f"'{path}' not found"}, HTTPStatus.NOT_FOUND)
+
+
+class LandscapeServer:
+    """Answers requests for rendered pages, annotated services and graph queries
+    from an in-memory landscape. Responses are cached per landscape version, so
+    that they are only computed once until the landscape is reloaded."""
+
+    def __init__(self, landscape: Landscape, cache_size: int = 1024):
+        self.landscape = landscape
+        self.cache: LRUCache[Response] = LRUCache(maxsize=cache_size)
+        self._fragment_cache = FragmentCache()
+        self._diagram_lock = Lock()
+        self._graph: Tuple[str, Dict[str, List[Dict[str, str]]]] = ("", {})
+        self._graph_lock = Lock()
+
+    def _incident_edges(
+        self, version: str, services: Mapping[str, AnnotatedService]
+    ) -> Dict[str, List[Dict[str, str]]]:
+        """Returns the edges incident to every node of the communication graph,
+        computed once per landscape version."""
+        with self._graph_lock:
+            if self._graph[0] != version:
+                incident: Dict[str, List[Dict[str, str]]] = {}
+                for edge in merge_edges(iter_raw_edges(services)):
+                    for node in {edge.source, edge.target}:
+                        incident.setdefault(node, []).append(edge._asdict())
+                self._graph = (version, incident)
+            return self._graph[1]
+
+    def _get(self, path: str) -> Response:
+        version, services = self.landscape.snapshot()
+        cached = self.cache.get((version, path))
+        if cached is not None:
+            return cached
+
+        if path == "/":
+            response = _json({"version": version, "services": list(services)})
+        elif path == "/service_communications.md":
+            with self._diagram_lock:
+                page = generate_complete_diagram(
+                    services, fragment_cache=self._fragment_cache
+                )
+            response = Response(HTTPStatus.OK, MARKDOWN, page.encode("utf-8"))
+        elif (match := SERVICE_PAGE.match(path)) and match["shortname"] in services:
+            shortname = match["shortname"]
+            if match["ext"] == "md":
+                page = generate_markdown(
+                    services=services,
+                    service_key=shortname,
+                    timestamp=self.landscape.input_time(shortname),
+                )
+                response = Response(HTTPStatus.OK, MARKDOWN, page.encode("utf-8"))
+            else:
+                page = yaml.dump(services[shortname].dict())
+                response = Response(HTTPStatus.OK, YAML, page.encode("utf-8"))
+        elif (match := GRAPH_QUERY.match(path)) and match["shortname"] in services:
+            shortname = match["shortname"]
+            edges = self._incident_edges(version, services).get(shortname, [])
+            neighbours = {edge["source"] for edge in edges}
+            neighbours.update(edge["target"] for edge in edges)
+            neighbours.discard(shortname)
+            response = _json(
+                {
+                    "service": shortname,
+                    "neighbours": sorted(neighbours),
+                    "edges": edges,
+                }
+            )
+        else:
+            return _not_found(path)
+
+        self.cache.put((version, path), response)
+        return response
+
+    def _post(self, path: str) -> Response:
+        if path != "/reload":
+            return _not_found(path)
+        try:
+            affected = self.landscape.reload()
+        except (IOError, ServiceFileValidationError) as error:
+            return _json({"error": str(error)}, HTTPStatus.UNPROCESSABLE_ENTITY)
+        return _json({"version": self.landscape.version, "affected": sorted(affected)})
+
+    def handle(self, method: str, path: str) -> Response:
+        """Answers a request."""
+        if method == "GET":
+            return self._get(path)
+        if method == "POST":
+            return self._post(path)
+        return _json({"error": "method not allowed"}, HTTPStatus.METHOD_NOT_ALLOWED)
+
+    def create_http_server(self, host: str, port: int) -> ThreadingHTTPServer:
+        """Creates an HTTP server bound to the given address, which answers
+        requests until it is shut down. Port 0 binds to a free port."""
+        server = self
+
+        class RequestHandler(BaseHTTPRequestHandler):
+            """Forwards requests to the landscape server."""
+
+            def _respond(self, method: str) -> None:
+                response = server.handle(method, self.path.split("?", 1)[0])
+                self.send_response(response.status)
+                self.send_header("Content-Type", response.content_type)
+                self.send_header("Content-Length", str(len(response.body)))
+                self.end_headers()
+                self.wfile.write(response.body)
+
+            def do_GET(self):  # noqa: N802
+                """Answers a GET request."""
+                self._respond("GET")
+
+            def do_POST(self):  # noqa: N802
+                """Answers a POST request."""
+                self._respond("POST")
+
+            def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+                """Suppresses the request log."""
+
+        return ThreadingHTTPServer((host, port), RequestHandler)
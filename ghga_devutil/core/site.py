@@ -0,0 +1,125 @@
+# Copyright 2021 - 2023 Universität Tübingen, DKFZ, EMBL, and Universität zu Köln
+# for the German Human Genome-Phenome Archive (GHGA)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+"""Static HTML site representation of annotated services."""
+
+import json
+import re
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Mapping, Optional, Set
+
+from jinja2 import PackageLoader
+from markupsafe import Markup
+
+from ghga_devutil.core.exceptions import OutputFileExistsError
+from ghga_devutil.core.graph import service_title
+from ghga_devutil.core.markdown import create_environment
+from ghga_devutil.core.models import AnnotatedService
+from ghga_devutil.core.partition import PartitionOptions, partition_services
+from ghga_devutil.options import DEFAULT_MERMAID_URL
+
+SEARCH_INDEX_FILENAME = "search_index.js"
+
+
+def _terms(text: str) -> Iterator[str]:
+    """Yields the search terms of a text: the text itself and its words."""
+    text = text.lower()
+    yield text
+    for word in re.split(r"[^a-z0-9]+", text):
+        if word:
+            yield word
+
+
+def _service_terms(service: AnnotatedService) -> Set[str]:
+    """Returns the search terms of a service: its shortname and name, the topics
+    and types of all its events and the paths of all its REST endpoints."""
+    terms = set(_terms(service.shortname)) | set(_terms(service.name))
+    for event in (*service.api.events.produces, *service.api.events.consumes):
+        terms.update(_terms(event.topic))
+        terms.update(_terms(event.type))
+    for endpoint in (*service.api.rest.produces, *service.api.rest.consumes):
+        terms.update(_terms(endpoint.path))
+    return terms
+
+
+def build_search_index(services: Mapping[str, AnnotatedService]) -> Dict:
+    """Builds an inverted index mapping search terms to the positions of the
+    services in the given mapping."""
+    terms: Dict[str, List[int]] = {}
+    docs = []
+    for doc, service in enumerate(services.values()):
+        docs.append([service.shortname, service_title(service)])
+        for term in _service_terms(service):
+            terms.setdefault(term, []).append(doc)
+    return {"docs": docs, "terms": dict(sorted(terms.items()))}
+
+
+def _service_links(services: Mapping[str, AnnotatedService]):
+    """Returns a template helper rendering links to the pages of services."""
+
+    def links(shortnames: Iterable[str]) -> Markup:
+        return Markup("<br>").join(
+            Markup('<a href="{}.html">{}</a>').format(
+                shortname, service_title(services[shortname])
+            )
+            if shortname in services
+            else Markup("<code>{}</code>").format(shortname)
+            for shortname in shortnames
+        )
+
+    return links
+
+
+def generate_site(
+    services: Mapping[str, AnnotatedService],
+    outdir: Path,
+    partitioning: PartitionOptions,
+    force: bool = False,
+    mermaid_url: Optional[str] = DEFAULT_MERMAID_URL,
+) -> None:
+    """Writes a self-contained static HTML site with one page per service, the
+    communication diagrams and a prebuilt search index to the output directory."""
+    index_path = outdir / "index.html"
+    if index_path.exists() and not force:
+        raise OutputFileExistsError(index_path)
+    (outdir / "services").mkdir(parents=True, exist_ok=True)
+
+    env = create_environment()
+    env.globals["service_links"] = _service_links(services)
+
+    service_template = env.get_template("site/service.html.jinja")
+    for shortname, service in services.items():
+        (outdir / "services" / f"{shortname}.html").write_text(
+            service_template.render(service=service, root="../")
+        )
+
+    index_path.write_text(
+        env.get_template("site/index.html.jinja").render(services=services, root="")
+    )
+    (outdir / "communications.html").write_text(
+        env.get_template("site/communications.html.jinja").render(
+            partitions=partition_services(services, partitioning),
+            mermaid_url=mermaid_url,
+            root="",
+        )
+    )
+    (outdir / SEARCH_INDEX_FILENAME).write_text(
+        "var searchIndex = "
+        + json.dumps(build_search_index(services), separators=(",", ":"))
+        + ";\n"
+    )
+    style, _, _ = PackageLoader("ghga_devutil").get_source(env, "site/style.css")
+    (outdir / "style.css").write_text(style)
@@ -0,0 +1,105 @@
+# Copyright 2021 - 2023 Universität Tübingen, DKFZ, EMBL, and Universität zu Köln
+# for the German Human Genome-Phenome Archive (GHGA)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+"""Per-phase timings and counters of pipeline runs"""
+
+import json
+import threading
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Dict, Mapping
+
+from ghga_devutil.core.graph import iter_raw_edges, merge_edges
+from ghga_devutil.core.hooks import LandscapeAnnotated, Observer, Span
+from ghga_devutil.core.models import AnnotatedService
+
+COUNTS = ("services", "endpoints", "events", "edges")
+
+
+@dataclass
+class PhaseStats:
+    """Accumulated measurements of one phase of a run"""
+
+    wall_time: float = 0.0
+    cpu_time: float = 0.0
+    items: int = 0
+    bytes_written: int = 0
+
+
+@dataclass
+class RunStats(Observer):
+    """Measurements of a pipeline run, i.e. the time spent in each phase, such as
+    loading, annotating, rendering and writing, and the size of the landscape.
+    The measurements are collected by observing the pipeline."""
+
+    phases: Dict[str, PhaseStats] = field(default_factory=dict)
+    counts: Dict[str, int] = field(default_factory=dict)
+
+    def __post_init__(self):
+        self._lock = threading.Lock()
+
+    def span_finished(self, span: Span) -> None:
+        """Adds the measurements of a span to its phase. The times of nested
+        spans are only added to their own phase. Spans may finish in several
+        threads at once."""
+        with self._lock:
+            stats = self.phases.setdefault(span.phase, PhaseStats())
+            stats.wall_time += span.wall_time - span.nested_wall_time
+            stats.cpu_time += span.cpu_time - span.nested_cpu_time
+            stats.items += span.items
+            stats.bytes_written += span.bytes_written
+
+    def landscape_annotated(self, event: LandscapeAnnotated) -> None:
+        """Records the size of the annotated landscape."""
+        self.count_services(event.services)
+
+    def count_services(self, services: Mapping[str, AnnotatedService]) -> None:
+        """Records the number of services, produced endpoints and events, and
+        edges of the communication graph."""
+        self.counts["services"] = len(services)
+        self.counts["endpoints"] = sum(
+            len(service.api.rest.produces) for service in services.values()
+        )
+        self.counts["events"] = sum(
+            len(service.api.events.produces) for service in services.values()
+        )
+        self.counts["edges"] = len(merge_edges(iter_raw_edges(services)))
+
+    def as_dict(self) -> dict:
+        """Returns the measurements as a JSON serializable dictionary."""
+        return asdict(self)
+
+    def format_table(self) -> str:
+        """Returns the measurements as a plain text table."""
+        lines = [
+            f"{'phase':<10} {'wall (s)':>10} {'cpu (s)':>10} {'items':>8} {'bytes':>12}"
+        ]
+        for name, stats in self.phases.items():
+            lines.append(
+                f"{name:<10} {stats.wall_time:>10.3f} {stats.cpu_time:>10.3f}"
+                + f" {stats.items:>8} {stats.bytes_written:>12}"
+            )
+        if self.counts:
+            lines.append(
+                ", ".join(
+                    f"{self.counts[key]} {key}" for key in COUNTS if key in self.counts
+                )
+            )
+        return "\n".join(lines)
+
+    def write_json(self, path: Path) -> None:
+        """Writes the measurements to a JSON file."""
+        path.write_text(json.dumps(self.as_dict(), indent=2))
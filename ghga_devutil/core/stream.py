@@ -0,0 +1,270 @@
+# Copyright 2021 - 2023 Universität Tübingen, DKFZ, EMBL, and Universität zu Köln
+# for the German Human Genome-Phenome Archive (GHGA)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+"""Generation of markdown pages for large landscapes with bounded memory
+
+Instead of holding all specifications, annotated services and pages at the same
+time, a compact index of the landscape is built in a first pass, and services
+are then loaded, annotated, rendered and written one at a time. The fragments
+of the communication diagrams are spooled to temporary files and streamed into
+the final page."""
+
+import json
+import tempfile
+from collections import defaultdict
+from datetime import datetime, timezone
+from functools import partial
+from pathlib import Path
+from typing import (
+    IO,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Mapping,
+    NamedTuple,
+    Optional,
+    Sequence,
+    Union,
+)
+
+from ghga_devutil.core import cli_message as msg
+from ghga_devutil.core import hooks
+from ghga_devutil.core.annotate import annotate_service
+from ghga_devutil.core.config_schema import ServiceConfigReader
+from ghga_devutil.core.git import SpecPath, commit_times
+from ghga_devutil.core.io import check_unique_shortname, load_service
+from ghga_devutil.core.markdown import (
+    FRAGMENT_KINDS,
+    create_environment,
+    service_page_time,
+)
+from ghga_devutil.core.models import (
+    AnnotatedService,
+    ConsumedRESTEndpoint,
+    Event,
+    Service,
+)
+from ghga_devutil.core.openapi import OpenAPIReader, reconcile_endpoints
+from ghga_devutil.options import OpenAPIMode
+
+
+class ServiceStub(NamedTuple):
+    """The parts of a service that templates use when referring to it from the
+    page of another service"""
+
+    shortname: str
+    name: str
+
+
+class LandscapeIndex:
+    """A compact index of a landscape: the path, name and input time of every
+    service, and the consumer and producer maps needed for annotation.
+
+    Every specification is parsed twice, once for the index and once when its
+    service is annotated and rendered, which trades loading time for memory
+    bounded by the index instead of by all parsed specifications."""
+
+    def __init__(
+        self,
+        config_reader: Optional[ServiceConfigReader] = None,
+        openapi_reader: Optional[OpenAPIReader] = None,
+        openapi: OpenAPIMode = OpenAPIMode.CHECK,
+    ):
+        self.config_reader = config_reader
+        self.openapi_reader = openapi_reader
+        self.openapi = openapi
+        self.paths: Dict[str, SpecPath] = {}
+        self.stubs: Dict[str, ServiceStub] = {}
+        self.input_times: Dict[str, datetime] = {}
+        self.rest_consumers: Dict[ConsumedRESTEndpoint, List[str]] = defaultdict(list)
+        self.event_consumers: Dict[Event, List[str]] = defaultdict(list)
+        self.event_producers: Dict[Event, List[str]] = defaultdict(list)
+
+    def add(self, path: SpecPath, service: Service) -> None:
+        """Adds a service to the index, raising a ServiceFileValidationError if
+        another service with the same shortname was added."""
+        check_unique_shortname(self.paths, path, service)
+        shortname = service.shortname
+        self.paths[shortname] = path
+        self.stubs[shortname] = ServiceStub(shortname, service.name)
+        for rest_endpoint in service.api.rest.consumes:
+            self.rest_consumers[rest_endpoint].append(shortname)
+        for event in service.api.events.consumes:
+            self.event_consumers[Event(topic=event.topic, type=event.type)].append(
+                shortname
+            )
+        for event in service.api.events.produces:
+            self.event_producers[Event(topic=event.topic, type=event.type)].append(
+                shortname
+            )
+
+    @classmethod
+    def build(
+        cls,
+        service_file_paths: Iterable[SpecPath],
+        config_reader: Optional[ServiceConfigReader] = None,
+        openapi_reader: Optional[OpenAPIReader] = None,
+        openapi: OpenAPIMode = OpenAPIMode.CHECK,
+    ) -> "LandscapeIndex":
+        """Builds the index by loading one specification at a time."""
+        index = cls(config_reader, openapi_reader, openapi)
+        for path in service_file_paths:
+            with hooks.span(hooks.LOAD, path.name):
+                index.add(path, load_service(path))
+        times_by_path = commit_times(index.paths.values())
+        index.input_times = {
+            shortname: times_by_path[path]
+            for shortname, path in index.paths.items()
+            if path in times_by_path
+        }
+        return index
+
+    def annotate(self, shortname: str) -> AnnotatedService:
+        """Loads and annotates one service, merging in its documented
+        configuration and checking or replacing its REST endpoints if the index
+        has the respective readers."""
+        path = self.paths[shortname]
+        with hooks.span(hooks.LOAD, path.name):
+            service = load_service(path)
+        if self.openapi_reader is not None:
+            with hooks.span(hooks.LOAD, f"{shortname} openapi document"):
+                documented = self.openapi_reader.read(service.name)
+            service, mismatch = reconcile_endpoints(service, documented, self.openapi)
+            if mismatch is not None:
+                msg.warn(str(mismatch))
+        config_spec = None
+        if self.config_reader is not None:
+            with hooks.span(hooks.LOAD, f"{shortname} config schema"):
+                config_spec = self.config_reader.read(service.name)
+        with hooks.span(hooks.ANNOTATE, shortname):
+            return annotate_service(
+                service,
+                self.rest_consumers,
+                self.event_consumers,
+                self.event_producers,
+                config_spec=config_spec,
+            )
+
+    def page_time(self, service: AnnotatedService) -> datetime:
+        """Returns the date of the page of a service, see service_page_time, or
+        the current time."""
+        return service_page_time(service, self.input_times, self.paths) or datetime.now(
+            tz=timezone.utc
+        )
+
+
+class _ServicesView(Mapping[str, Union[AnnotatedService, ServiceStub]]):
+    """The services of a landscape as seen by the templates rendering the pages
+    of the one service in flight, which is the only fully annotated one."""
+
+    def __init__(self, stubs: Mapping[str, ServiceStub], service: AnnotatedService):
+        self._stubs = stubs
+        self._service = service
+
+    def __getitem__(self, key: str) -> Union[AnnotatedService, ServiceStub]:
+        if key == self._service.shortname:
+            return self._service
+        return self._stubs[key]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._stubs)
+
+    def __len__(self) -> int:
+        return len(self._stubs)
+
+
+def _spooled(spool: IO[str]) -> Iterator[str]:
+    """Yields the fragments written to a spool file."""
+    spool.seek(0)
+    for line in spool:
+        yield json.loads(line)
+
+
+def _write_chunks(out_path: Path, chunks: Iterable[str]) -> int:
+    """Writes text chunks to a file and returns the number of written bytes."""
+    written = 0
+    with out_path.open("wb") as out_file:
+        for chunk in chunks:
+            data = chunk.encode("utf-8")
+            out_file.write(data)
+            written += len(data)
+    return written
+
+
+def stream_markdown(
+    service_file_paths: Sequence[SpecPath],
+    outdir: Path,
+    force: bool,
+    config_reader: Optional[ServiceConfigReader] = None,
+    openapi_reader: Optional[OpenAPIReader] = None,
+    openapi: Optional[OpenAPIMode] = None,
+):
+    """Generates the markdown pages of all services and the service
+    communications page while keeping only the landscape index and one service
+    in memory. Existing pages are kept unless force is set."""
+    index = LandscapeIndex.build(
+        service_file_paths,
+        config_reader,
+        openapi_reader,
+        openapi or OpenAPIMode.CHECK,
+    )
+    env = create_environment()
+    page_template = env.get_template("service_page.md.jinja")
+    fragment_templates = {
+        kind: env.get_template(f"mermaid/communications_{kind}.md.jinja")
+        for kind in FRAGMENT_KINDS
+    }
+
+    with tempfile.TemporaryFile("w+", encoding="utf-8") as event_spool:
+        with tempfile.TemporaryFile("w+", encoding="utf-8") as rest_spool:
+            spools = {"events": event_spool, "rest": rest_spool}
+            for shortname, path in index.paths.items():
+                service = index.annotate(shortname)
+                services = _ServicesView(index.stubs, service)
+                with hooks.span(hooks.RENDER, f"{shortname} diagram fragments"):
+                    for kind, template in fragment_templates.items():
+                        fragment = template.render(services=services, service=service)
+                        spools[kind].write(json.dumps(fragment) + "\n")
+
+                out_path = (outdir / path.name).with_suffix(".md")
+                if out_path.exists() and not force:
+                    continue
+                with hooks.span(hooks.RENDER, out_path.name):
+                    page = page_template.render(
+                        services=services,
+                        service_key=shortname,
+                        cur_time=partial(index.page_time, service),
+                    ).encode("utf-8")
+                with hooks.span(hooks.WRITE, out_path.name) as span:
+                    out_path.write_bytes(page)
+                    if span is not None:
+                        span.bytes_written = len(page)
+
+            # the page is rendered while it is written
+            out_path = (outdir / "service_communications").with_suffix(".md")
+            if out_path.exists() and not force:
+                return
+            with hooks.span(hooks.WRITE, out_path.name) as span:
+                written = _write_chunks(
+                    out_path,
+                    env.get_template("service_communications.md.jinja").generate(
+                        event_fragments=_spooled(event_spool),
+                        rest_fragments=_spooled(rest_spool),
+                    ),
+                )
+                if span is not None:
+                    span.bytes_written = written
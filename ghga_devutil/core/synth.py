@@ -0,0 +1,234 @@
+# Copyright 2021 - 2023 Universität Tübingen, DKFZ, EMBL, and Universität zu Köln
+# for the German Human Genome-Phenome Archive (GHGA)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+"""Generation of synthetic service landscapes for load testing"""
+
+import json
+import random
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Tuple
+
+import yaml
+
+from ghga_devutil.core.exceptions import OutputFileExistsError
+from ghga_devutil.core.models import HTTPMethod, RRwAccessMode, RWRwAccessMode
+from ghga_devutil.options import FanOutDistribution, SpecFormat
+
+try:
+    from yaml import CSafeDumper as SafeDumper
+except ImportError:  # pragma: no cover
+    from yaml import SafeDumper
+
+STORAGE_KINDS = ("s3", "mongodb", "vault")
+DEFAULT_STORAGE_MIX = {"s3": 0.3, "mongodb": 0.6, "vault": 0.2}
+POWER_LAW_ALPHA = 1.5
+
+METHODS = [method.value for method in HTTPMethod]
+S3_MODES = [mode.value for mode in RWRwAccessMode]
+MODES = [mode.value for mode in RRwAccessMode]
+
+
+@dataclass
+class SynthOptions:
+    """Options of a synthetic landscape. The numbers of produced endpoints and
+    events per service are drawn uniformly from the given inclusive ranges, the
+    storage mix maps storage kinds to the probability of a service using them."""
+
+    services: int = 100
+    endpoints: Tuple[int, int] = (0, 5)
+    events: Tuple[int, int] = (0, 3)
+    fan_out: FanOutDistribution = FanOutDistribution.POWER_LAW
+    mean_consumers: float = 2.0
+    storage_mix: Dict[str, float] = field(
+        default_factory=lambda: dict(DEFAULT_STORAGE_MIX)
+    )
+    seed: int = 0
+
+
+def parse_storage_mix(items: Iterable[str]) -> Dict[str, float]:
+    """Parses storage mix items of the form "kind=probability"."""
+    storage_mix: Dict[str, float] = {}
+    for item in items:
+        kind, _, probability = item.partition("=")
+        if kind not in STORAGE_KINDS:
+            raise ValueError(
+                f"Unknown storage kind '{kind}', expected one of {STORAGE_KINDS}."
+            )
+        try:
+            storage_mix[kind] = float(probability)
+        except ValueError:
+            raise ValueError(f"Invalid probability in '{item}'.") from None
+    return storage_mix
+
+
+def _consumer_count(rng: random.Random, options: SynthOptions) -> int:
+    """Draws the number of consumers of an endpoint or event."""
+    mean = options.mean_consumers
+    if options.fan_out == FanOutDistribution.CONSTANT:
+        count = round(mean)
+    elif options.fan_out == FanOutDistribution.UNIFORM:
+        count = rng.randint(0, round(2 * mean))
+    else:
+        # the mean of a Pareto variate minus one is 1 / (alpha - 1)
+        count = round(
+            (rng.paretovariate(POWER_LAW_ALPHA) - 1) * mean * (POWER_LAW_ALPHA - 1)
+        )
+    return min(count, options.services - 1)
+
+
+def _draw_consumers(
+    rng: random.Random, options: SynthOptions, producer: int
+) -> List[int]:
+    """Draws the indices of the consumers of an endpoint or event, excluding the
+    producing service."""
+    count = _consumer_count(rng, options)
+    return [
+        index + (index >= producer)
+        for index in rng.sample(range(options.services - 1), count)
+    ]
+
+
+class _Naming:
+    """Names of the synthetic services and their endpoints and events"""
+
+    def __init__(self, services: int):
+        self.width = len(str(max(services - 1, 0)))
+
+    def shortname(self, index: int) -> str:
+        """Returns the shortname of a service."""
+        return f"svc{index:0{self.width}d}"
+
+    def name(self, index: int) -> str:
+        """Returns the name of a service."""
+        return f"synthetic-service-{index:0{self.width}d}"
+
+    def endpoint(self, index: int, number: int) -> Dict[str, str]:
+        """Returns an endpoint produced by a service."""
+        return {
+            "path": f"/{self.shortname(index)}/resources/{number}",
+            "method": METHODS[(index + number) % len(METHODS)],
+        }
+
+    def event(self, index: int, number: int) -> Dict[str, str]:
+        """Returns the topic and type of an event produced by a service."""
+        return {
+            "topic": f"{self.shortname(index)}_topic_{number}",
+            "type": f"{self.shortname(index)}_event_{number}",
+        }
+
+
+def _storage(rng: random.Random, options: SynthOptions, shortname: str) -> Dict:
+    """Draws the storage of a service according to the storage mix."""
+    storage: Dict[str, List[Dict[str, str]]] = {}
+    if rng.random() < options.storage_mix.get("s3", 0):
+        storage["s3"] = [
+            {"bucket": f"{shortname}_bucket", "mode": rng.choice(S3_MODES)}
+        ]
+    if rng.random() < options.storage_mix.get("mongodb", 0):
+        storage["mongodb"] = [{"db_name": f"{shortname}_db", "mode": rng.choice(MODES)}]
+    if rng.random() < options.storage_mix.get("vault", 0):
+        storage["vault"] = [{"path": f"{shortname}/secrets", "mode": rng.choice(MODES)}]
+    return storage
+
+
+def synthesize(options: SynthOptions) -> Iterator[Dict]:
+    """Yields the specifications of a synthetic landscape of services as plain
+    objects, which are valid input for Service.parse_obj. The same options
+    always yield the same landscape.
+
+    The consumer relations are drawn upfront and kept as pairs of indices, so
+    that the specifications can be generated one at a time."""
+    rng = random.Random(options.seed)
+    naming = _Naming(options.services)
+    counts = [
+        (rng.randint(*options.endpoints), rng.randint(*options.events))
+        for _ in range(options.services)
+    ]
+    rest_consumes: List[List[Tuple[int, int]]] = [[] for _ in counts]
+    event_consumes: List[List[Tuple[int, int]]] = [[] for _ in counts]
+    for producer, (endpoints, events) in enumerate(counts):
+        for number in range(endpoints):
+            for consumer in _draw_consumers(rng, options, producer):
+                rest_consumes[consumer].append((producer, number))
+        for number in range(events):
+            for consumer in _draw_consumers(rng, options, producer):
+                event_consumes[consumer].append((producer, number))
+
+    for index, (endpoints, events) in enumerate(counts):
+        shortname = naming.shortname(index)
+        yield {
+            "shortname": shortname,
+            "name": naming.name(index),
+            "summary": f"Synthetic service number {index}",
+            "version": "1.0.0",
+            "storage": _storage(rng, options, shortname),
+            "api": {
+                "rest": {
+                    "produces": [
+                        naming.endpoint(index, number) for number in range(endpoints)
+                    ],
+                    "consumes": [
+                        {
+                            **naming.endpoint(producer, number),
+                            "service": naming.shortname(producer),
+                        }
+                        for producer, number in rest_consumes[index]
+                    ],
+                },
+                "events": {
+                    "produces": [
+                        {
+                            **naming.event(index, number),
+                            "config": f"event_{number}",
+                            "description": f"Event number {number} of {shortname}",
+                        }
+                        for number in range(events)
+                    ],
+                    "consumes": [
+                        {
+                            **naming.event(producer, number),
+                            "config": f"{naming.shortname(producer)}_event_{number}",
+                            "description": "Consumed event of"
+                            + f" {naming.shortname(producer)}",
+                        }
+                        for producer, number in event_consumes[index]
+                    ],
+                },
+            },
+        }
+
+
+def dump_spec(spec: Dict, spec_format: SpecFormat) -> str:
+    """Serializes a service specification in the given format."""
+    if spec_format == SpecFormat.JSON:
+        return json.dumps(spec)
+    return yaml.dump(spec, Dumper=SafeDumper, sort_keys=False)
+
+
+def write_landscape(
+    options: SynthOptions, outdir: Path, spec_format: SpecFormat, force: bool = False
+) -> List[Path]:
+    """Writes a synthetic landscape to one specification file per service, each
+    as soon as it was generated. Returns the paths of the written files."""
+    paths = []
+    for spec in synthesize(options):
+        path = outdir / f"{spec['name']}.{spec_format.value}"
+        if path.exists() and not force:
+            raise OutputFileExistsError(path)
+        path.write_text(dump_spec(spec, spec_format))
+        paths.append(path)
+    return paths
@@ -0,0 +1,71 @@
+# Copyright 2021 - 2023 Universität Tübingen, DKFZ, EMBL, and Universität zu Köln
+# for the German Human Genome-Phenome Archive (GHGA)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+"""Recording of pipeline runs in the Chrome Trace Event Format"""
+
+import json
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, List, Sequence
+
+from ghga_devutil.core.hooks import Observer, Span
+
+
+class Tracer(Observer):
+    """Records the spans of the pipeline as complete events ("ph": "X") of the
+    Chrome Trace Event Format, which can be viewed in chrome://tracing or
+    Perfetto. Timestamps come from a clock shared by all processes of the host,
+    so that spans recorded in worker processes line up."""
+
+    def __init__(self):
+        self.events: List[Dict] = []
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _event(span: Span) -> Dict:
+        event = {
+            "name": span.name,
+            "cat": span.phase,
+            "ph": "X",
+            "ts": round(span.start * 1e6),
+            "dur": round(span.wall_time * 1e6),
+            "pid": span.pid,
+            "tid": span.tid,
+        }
+        if span.bytes_written:
+            event["args"] = {"bytes": span.bytes_written}
+        return event
+
+    def span_finished(self, span: Span) -> None:
+        """Records a finished span."""
+        with self._lock:
+            self.events.append(self._event(span))
+
+    def spans_merged(self, spans: Sequence[Span]) -> None:
+        """Records the spans of a worker process, which keep the pid and tid of
+        the worker."""
+        self.extend(self._event(span) for span in spans)
+
+    def extend(self, events: Iterable[Dict]) -> None:
+        """Adds spans recorded by another tracer, e.g. in a worker process."""
+        with self._lock:
+            self.events.extend(events)
+
+    def write(self, path: Path) -> None:
+        """Writes all recorded spans to a trace file."""
+        with self._lock:
+            events = sorted(self.events, key=lambda event: event["ts"])
+        path.write_text(json.dumps({"traceEvents": events, "displayTimeUnit": "ms"}))
@@ -0,0 +1,190 @@
+# Copyright 2021 - 2023 Universität Tübingen, DKFZ, EMBL, and Universität zu Köln
+# for the German Human Genome-Phenome Archive (GHGA)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+"""Validation of service specification files collecting all errors"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple, Union
+
+import yaml
+from pydantic import ValidationError
+
+from ghga_devutil.core.models import Service
+
+try:
+    from yaml import CSafeLoader as SafeLoader
+except ImportError:  # pragma: no cover
+    from yaml import SafeLoader
+
+
+class ValidationIssue(NamedTuple):
+    """A problem found in a service specification file. Line and column are
+    one-based and refer to the closest node of the document the problem could be
+    located at."""
+
+    path: str
+    line: Optional[int]
+    column: Optional[int]
+    location: str
+    message: str
+
+    def __str__(self) -> str:
+        position = ":".join(
+            str(part) for part in (self.path, self.line, self.column) if part
+        )
+        location = f" {self.location}:" if self.location else ""
+        return f"{position}:{location} {self.message}"
+
+
+def _child_node(node: yaml.Node, key: Union[int, str]) -> Optional[yaml.Node]:
+    """Returns the child of a mapping or sequence node."""
+    if isinstance(node, yaml.MappingNode):
+        for key_node, value_node in node.value:
+            if key_node.value == key:
+                return value_node
+    elif isinstance(node, yaml.SequenceNode) and isinstance(key, int):
+        if 0 <= key < len(node.value):
+            return node.value[key]
+    return None
+
+
+def locate(root: yaml.Node, loc: Sequence[Union[int, str]]) -> yaml.Node:
+    """Returns the deepest node of a document along a pydantic error location.
+    For missing fields, this is the mapping that lacks them."""
+    node = root
+    for key in loc:
+        child = _child_node(node, key)
+        if child is None:
+            break
+        node = child
+    return node
+
+
+def _position(mark: Optional[yaml.Mark]) -> Tuple[Optional[int], Optional[int]]:
+    if mark is None:
+        return None, None
+    return mark.line + 1, mark.column + 1
+
+
+class _Declaration(NamedTuple):
+    """The shortname a valid service specification file declares and the
+    position of its node."""
+
+    shortname: str
+    line: Optional[int]
+    column: Optional[int]
+
+
+def _validate_file(
+    path: Path,
+) -> Tuple[List[ValidationIssue], Optional[_Declaration]]:
+    """Validates a service specification file and returns all problems found in
+    it, and the shortname it declares if it is valid."""
+    try:
+        text = path.read_text(encoding="utf-8")
+    except (OSError, UnicodeDecodeError) as error:
+        return [ValidationIssue(str(path), None, None, "", str(error))], None
+
+    loader = SafeLoader(text)
+    try:
+        root = loader.get_single_node()
+        obj = loader.construct_document(root) if root is not None else None
+    except yaml.MarkedYAMLError as error:
+        line, column = _position(error.problem_mark)
+        issue = ValidationIssue(str(path), line, column, "", str(error.problem))
+        return [issue], None
+    except yaml.YAMLError as error:
+        return [ValidationIssue(str(path), None, None, "", str(error))], None
+    finally:
+        loader.dispose()
+
+    try:
+        service = Service.parse_obj(obj)
+    except ValidationError as error:
+        issues = []
+        for details in error.errors():
+            loc = [key for key in details["loc"] if key != "__root__"]
+            node = locate(root, loc) if root is not None else None
+            line, column = _position(node.start_mark if node else None)
+            issues.append(
+                ValidationIssue(
+                    str(path),
+                    line,
+                    column,
+                    ".".join(str(key) for key in loc),
+                    details["msg"],
+                )
+            )
+        return issues, None
+    node = locate(root, ["shortname"]) if root is not None else None
+    line, column = _position(node.start_mark if node else None)
+    return [], _Declaration(service.shortname, line, column)
+
+
+def validate_file(path: Path) -> List[ValidationIssue]:
+    """Validates a service specification file and returns all problems found in
+    it. Only plain data is returned, so that files can be validated in worker
+    processes."""
+    return _validate_file(path)[0]
+
+
+def _duplicate_shortnames(
+    paths: Sequence[Path], declarations: Sequence[Optional[_Declaration]]
+) -> List[ValidationIssue]:
+    """Returns an issue for every valid file declaring a shortname that a
+    previous file declared already, as the loaders reject those."""
+    issues = []
+    paths_by_shortname: Dict[str, Path] = {}
+    for path, declaration in zip(paths, declarations):
+        if declaration is None:
+            continue
+        other_path = paths_by_shortname.setdefault(declaration.shortname, path)
+        if other_path != path:
+            issues.append(
+                ValidationIssue(
+                    str(path),
+                    declaration.line,
+                    declaration.column,
+                    "shortname",
+                    f"the shortname '{declaration.shortname}' is already declared"
+                    + f" by '{other_path}'",
+                )
+            )
+    return issues
+
+
+def validate_files(
+    paths: Iterable[Path], jobs: Optional[int] = None
+) -> List[ValidationIssue]:
+    """Validates service specification files concurrently in worker processes
+    and returns the problems found in all of them, in the order of the files,
+    followed by the shortnames declared by more than one valid file."""
+    paths = list(paths)
+    jobs = min(jobs or os.cpu_count() or 1, len(paths))
+    if jobs <= 1:
+        results = [_validate_file(path) for path in paths]
+    else:
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            results = list(
+                executor.map(
+                    _validate_file, paths, chunksize=max(1, len(paths) // (jobs * 4))
+                )
+            )
+    issues = [issue for file_issues, _ in results for issue in file_issues]
+    declarations = [declaration for _, declaration in results]
+    return issues + _duplicate_shortnames(paths, declarations)
@@ -0,0 +1,274 @@
+# Copyright 2021 - 2023 Universität Tübingen, DKFZ, EMBL, and Universität zu Köln
+# for the German Human Genome-Phenome Archive (GHGA)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+"""Watching of service specification files for changes"""
+
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import time
+from functools import partial
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from ghga_devutil.core.hashing import hash_text
+from ghga_devutil.core.io import is_service_file_name
+from ghga_devutil.core.landscape import Landscape
+from ghga_devutil.core.manifest import Manifest
+from ghga_devutil.core.markdown import (
+    FragmentCache,
+    generate_complete_diagram,
+    generate_markdown,
+    service_page_digest,
+    templates_digest,
+)
+
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+WATCH_MASK = (
+    IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+)
+EVENT_HEADER = struct.Struct("iIII")
+
+
+def _is_spec_file(path: Path, excluded: Set[Path]) -> bool:
+    """Returns whether a file in a watched directory may be a service
+    specification, i.e. has a specification suffix, is not hidden like the
+    manifest and is not excluded like the output directory."""
+    return is_service_file_name(path.name) and path.absolute() not in excluded
+
+
+class PollingWatcher:
+    """Detects changes of files by periodically comparing their modification
+    times and sizes, and the specification files in directories. The excluded
+    paths, e.g. the output directory, are not watched."""
+
+    def __init__(
+        self,
+        paths: List[Path],
+        interval: float = 0.2,
+        exclude: Iterable[Path] = (),
+    ):
+        self.paths = paths
+        self.interval = interval
+        self._excluded = {path.absolute() for path in exclude}
+        self._state = self._scan()
+
+    def _scan(self) -> Dict[Path, Tuple[int, int]]:
+        state: Dict[Path, Tuple[int, int]] = {}
+        for path in self.paths:
+            candidates = (
+                [
+                    child
+                    for child in path.iterdir()
+                    if _is_spec_file(child, self._excluded)
+                ]
+                if path.is_dir()
+                else [path]
+            )
+            for candidate in candidates:
+                try:
+                    stat = candidate.stat()
+                except FileNotFoundError:
+                    continue
+                state[candidate] = (stat.st_mtime_ns, stat.st_size)
+        return state
+
+    def wait(self, timeout: Optional[float] = None) -> Set[Path]:
+        """Waits until files changed or the timeout passed and returns the paths
+        of all changed, created or deleted files."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            state = self._scan()
+            changed = {
+                path
+                for path in state.keys() | self._state.keys()
+                if state.get(path) != self._state.get(path)
+            }
+            self._state = state
+            if changed:
+                return changed
+            if deadline is not None and time.monotonic() >= deadline:
+                return set()
+            time.sleep(self.interval)
+
+    def close(self) -> None:
+        """Releases all resources."""
+
+
+class InotifyWatcher:
+    """Detects changes of files through the inotify API of the Linux kernel. The
+    directories containing the files are watched, so that files replaced by
+    editors through renaming are detected as well. The excluded paths, e.g. the
+    output directory, are not watched."""
+
+    def __init__(self, paths: List[Path], exclude: Iterable[Path] = ()):
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self._fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self._dirs: Dict[int, Path] = {}
+        self._files: Set[Path] = set()
+        for path in paths:
+            directory = path if path.is_dir() else path.parent
+            if not path.is_dir():
+                self._files.add(path.absolute())
+            if directory.absolute() in self._dirs.values():
+                continue
+            wd = libc.inotify_add_watch(
+                self._fd, os.fsencode(directory.absolute()), WATCH_MASK
+            )
+            if wd < 0:
+                self.close()
+                raise OSError(ctypes.get_errno(), f"Cannot watch '{directory}'")
+            self._dirs[wd] = directory.absolute()
+        self._watched_dirs = {path.absolute() for path in paths if path.is_dir()}
+        self._excluded = {path.absolute() for path in exclude}
+
+    def _relevant(self, path: Path) -> bool:
+        if path in self._files:
+            return True
+        return path.parent in self._watched_dirs and _is_spec_file(path, self._excluded)
+
+    def _read(self) -> Set[Path]:
+        changed: Set[Path] = set()
+        while True:
+            try:
+                buffer = os.read(self._fd, 64 * 1024)
+            except BlockingIOError:
+                return changed
+            offset = 0
+            while offset < len(buffer):
+                wd, _, _, length = EVENT_HEADER.unpack_from(buffer, offset)
+                offset += EVENT_HEADER.size
+                name = buffer[offset : offset + length].rstrip(b"\0")
+                offset += length
+                if wd in self._dirs and name:
+                    path = self._dirs[wd] / os.fsdecode(name)
+                    if self._relevant(path):
+                        changed.add(path)
+
+    def wait(self, timeout: Optional[float] = None) -> Set[Path]:
+        """Waits until files changed or the timeout passed and returns the paths
+        of all changed, created or deleted files."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            remaining = (
+                None if deadline is None else max(0, deadline - time.monotonic())
+            )
+            readable, _, _ = select.select([self._fd], [], [], remaining)
+            changed = self._read() if readable else set()
+            if changed or not readable:
+                return changed
+
+    def close(self) -> None:
+        """Releases all resources."""
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1
+
+
+def create_watcher(
+    paths: List[Path], polling: bool = False, exclude: Iterable[Path] = ()
+):
+    """Creates a watcher for the given files and directories, using inotify if
+    available and polling otherwise. Changes of the excluded paths are
+    ignored."""
+    if not polling:
+        try:
+            return InotifyWatcher(paths, exclude=exclude)
+        except (OSError, AttributeError, TypeError):
+            pass
+    return PollingWatcher(paths, exclude=exclude)
+
+
+def wait_debounced(watcher, debounce: float) -> Set[Path]:
+    """Waits for changes and collects all further changes until no change
+    happened for the debounce period."""
+    changed = watcher.wait()
+    while True:
+        more = watcher.wait(timeout=debounce)
+        if not more:
+            return changed
+        changed |= more
+
+
+class MarkdownRebuilder:
+    """Writes the markdown pages of a landscape into an output directory. The
+    manifest and the diagram fragments are kept in memory between builds, so that
+    a rebuild only renders the pages of the given services."""
+
+    def __init__(self, landscape: Landscape, outdir: Path):
+        self.landscape = landscape
+        self.outdir = outdir
+        self.manifest = Manifest.load(outdir)
+        self.fragment_cache = FragmentCache(self.manifest.fragments)
+        self._pages: Dict[str, Path] = {}
+
+    def _write(self, out_path: Path, digest: str, render: Callable[[], str]) -> bool:
+        if not self.manifest.is_stale(out_path, digest):
+            return False
+        out_path.write_text(render())
+        self.manifest.record(out_path, digest)
+        return True
+
+    def build(self, shortnames: Optional[Iterable[str]] = None) -> int:
+        """Writes the pages of the given services, or of all services if none are
+        given, as well as the communications page, unless their inputs did not
+        change. Pages of removed services are deleted. Returns the number of
+        written pages."""
+        services = self.landscape.services
+        written = 0
+        for shortname in services if shortnames is None else shortnames:
+            if shortname not in services:
+                continue
+            out_path = (
+                self.outdir / self.landscape.paths_by_shortname[shortname].name
+            ).with_suffix(".md")
+            self._pages[shortname] = out_path
+            written += self._write(
+                out_path,
+                service_page_digest(services, shortname),
+                partial(
+                    generate_markdown,
+                    services=services,
+                    service_key=shortname,
+                    timestamp=self.landscape.input_time(shortname),
+                ),
+            )
+
+        for shortname in [key for key in self._pages if key not in services]:
+            out_path = self._pages.pop(shortname)
+            self.manifest.forget(out_path)
+            out_path.unlink(missing_ok=True)
+
+        written += self._write(
+            (self.outdir / "service_communications").with_suffix(".md"),
+            hash_text(templates_digest(), self.landscape.version),
+            partial(
+                generate_complete_diagram,
+                services=services,
+                fragment_cache=self.fragment_cache,
+            ),
+        )
+        self.manifest.save()
+        return written
@@ -0,0 +1,72 @@
+# Copyright 2021 - 2023 Universität Tübingen, DKFZ, EMBL, and Universität zu Köln
+# for the German Human Genome-Phenome Archive (GHGA)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""Choices and defaults of command line options that are shared with the core.
+This module must not import any heavy dependencies, since it is loaded whenever
+the command line interface starts."""
+
+from enum import Enum
+
+DEFAULT_MAX_NODES = 100
+DEFAULT_MAX_EDGES = 200
+DEFAULT_MERMAID_URL = "https://cdn.jsdelivr.net/npm/mermaid@10/dist/mermaid.min.js"
+DEFAULT_FETCH_CONNECTIONS = 8
+
+
+class PartitionStrategy(str, Enum):
+    """Strategy used to split the communication graph"""
+
+    NONE = "none"
+    COMPONENT = "component"
+    TOPIC_PREFIX = "topic-prefix"
+    DOMAIN = "domain"
+
+
+class ExportFormat(str, Enum):
+    """Output format of a graph export"""
+
+    DOT = "dot"
+    JSON = "json"
+    CSV = "csv"
+
+
+class SpecFormat(str, Enum):
+    """File format of service specifications"""
+
+    YAML = "yaml"
+    JSON = "json"
+
+
+class FanOutDistribution(str, Enum):
+    """Distribution of the number of consumers of an endpoint or event"""
+
+    CONSTANT = "constant"
+    UNIFORM = "uniform"
+    POWER_LAW = "power-law"
+
+
+class OpenAPIMode(str, Enum):
+    """Use of the REST endpoints documented in OpenAPI documents"""
+
+    CHECK = "check"
+    REPLACE = "replace"
+
+
+class DiscoverOutput(str, Enum):
+    """Output of the discovery of the actual API usage of services"""
+
+    DIFF = "diff"
+    DRAFT = "draft"
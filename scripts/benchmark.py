@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+
+# Copyright 2021 - 2023 Universität Tübingen, DKFZ, EMBL, and Universität zu Köln
+# for the German Human Genome-Phenome Archive (GHGA)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Benchmarks of the hot paths of ghga-devutil on synthetic landscapes
+
+Run the benchmarks and store the results:
+    ./scripts/benchmark.py run --sizes 10,100,1000,10000,50000 --out results.json
+
+Compare results against a saved baseline, failing on regressions:
+    ./scripts/benchmark.py compare baseline.json results.json
+"""
+
+import json
+import platform
+import sys
+import tempfile
+from pathlib import Path
+from time import perf_counter
+from typing import Callable, Dict, List
+
+import typer
+from script_utils.cli import echo_failure, echo_success
+
+from ghga_devutil.core.annotate import (
+    annotate_services,
+    enumerate_consumers,
+    enumerate_producers,
+)
+from ghga_devutil.core.io import load_service, write_service
+from ghga_devutil.core.main import annotate, markdown
+from ghga_devutil.core.markdown import generate_complete_diagram, generate_markdown
+from ghga_devutil.core.synth import SynthOptions, write_landscape
+from ghga_devutil.options import SpecFormat
+
+DEFAULT_SIZES = "10,100,1000,10000,50000"
+# rendering markdown pages is by far the slowest step, so pages are only
+# rendered for a sample of services and the end-to-end markdown run is limited
+# to small landscapes
+PAGE_SAMPLE = 100
+MAX_MARKDOWN_SERVICES = 1000
+
+app = typer.Typer()
+
+
+def _measure(function: Callable[[], object], repeat: int) -> float:
+    """Returns the best wall time of repeated calls in seconds."""
+    timings = []
+    for _ in range(repeat):
+        start = perf_counter()
+        function()
+        timings.append(perf_counter() - start)
+    return min(timings)
+
+
+def _result(seconds: float, items: int) -> Dict[str, float]:
+    return {"seconds": seconds, "items": items, "per_item": seconds / max(items, 1)}
+
+
+def benchmark_size(size: int, repeat: int, seed: int) -> Dict[str, Dict[str, float]]:
+    """Runs all benchmarks on a synthetic landscape of the given size."""
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        spec_dir, out_dir = Path(tmp) / "specs", Path(tmp) / "out"
+        spec_dir.mkdir()
+        out_dir.mkdir()
+        paths = write_landscape(
+            SynthOptions(services=size, seed=seed), spec_dir, SpecFormat.YAML
+        )
+
+        services = [load_service(path) for path in paths]
+        results["load_service"] = _result(
+            _measure(lambda: [load_service(path) for path in paths], repeat), size
+        )
+
+        def enumerate_all():
+            enumerate_consumers(services)
+            enumerate_producers(services)
+
+        results["enumerate_consumers_producers"] = _result(
+            _measure(enumerate_all, repeat), size
+        )
+        results["annotate_services"] = _result(
+            _measure(lambda: annotate_services(services), repeat), size
+        )
+
+        ann_services = {
+            service.shortname: service for service in annotate_services(services)
+        }
+        sample = list(ann_services)[:PAGE_SAMPLE]
+        results["generate_markdown"] = _result(
+            _measure(
+                lambda: [
+                    generate_markdown(services=ann_services, service_key=key)
+                    for key in sample
+                ],
+                repeat,
+            ),
+            len(sample),
+        )
+        results["generate_complete_diagram"] = _result(
+            _measure(lambda: generate_complete_diagram(ann_services), repeat), 1
+        )
+        results["write_service"] = _result(
+            _measure(
+                lambda: [
+                    write_service(service, out_dir / f"{key}.yaml", force=True)
+                    for key, service in ann_services.items()
+                ],
+                repeat,
+            ),
+            size,
+        )
+
+        results["end_to_end_annotate"] = _result(
+            _measure(lambda: annotate(paths, out_dir, force=True), repeat), size
+        )
+        if size <= MAX_MARKDOWN_SERVICES:
+            results["end_to_end_markdown"] = _result(
+                _measure(lambda: markdown(paths, out_dir, force=True), repeat), size
+            )
+    return results
+
+
+@app.command()
+def run(
+    out: Path = typer.Option(..., help="The JSON file to store the results in."),
+    sizes: str = typer.Option(
+        DEFAULT_SIZES, help="Comma separated numbers of services to benchmark."
+    ),
+    repeat: int = typer.Option(3, help="Repetitions per benchmark, the best counts."),
+    seed: int = typer.Option(0, help="The seed of the synthetic landscapes."),
+):
+    """Run the benchmarks and store the results as JSON."""
+    results = {}
+    for size in (int(size) for size in sizes.split(",")):
+        typer.echo(f"Benchmarking {size} services ...")
+        results[str(size)] = benchmark_size(size, repeat=repeat, seed=seed)
+        for name, result in results[str(size)].items():
+            typer.echo(f"  {name:<32} {result['seconds']:>10.4f}s")
+    document = {
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "seed": seed,
+        "results": results,
+    }
+    out.write_text(json.dumps(document, indent=2))
+    echo_success(f"Results written to '{out}'.")
+
+
+def find_regressions(baseline: Dict, results: Dict, threshold: float) -> List[str]:
+    """Returns a description of every benchmark whose time per item grew by more
+    than the threshold relative to the baseline."""
+    regressions = []
+    for size, benchmarks in results["results"].items():
+        for name, result in benchmarks.items():
+            reference = baseline["results"].get(size, {}).get(name)
+            if reference is None or reference["per_item"] <= 0:
+                continue
+            ratio = result["per_item"] / reference["per_item"]
+            if ratio > 1 + threshold:
+                regressions.append(
+                    f"{name} with {size} services: {ratio:.2f}x the baseline time"
+                )
+    return regressions
+
+
+@app.command()
+def compare(
+    baseline: Path = typer.Argument(..., help="The JSON results of the baseline."),
+    results: Path = typer.Argument(..., help="The JSON results to check."),
+    threshold: float = typer.Option(
+        0.2, help="The tolerated relative slowdown, e.g. 0.2 for 20%."
+    ),
+):
+    """Compare results against a baseline and fail on regressions."""
+    regressions = find_regressions(
+        json.loads(baseline.read_text()), json.loads(results.read_text()), threshold
+    )
+    if regressions:
+        for regression in regressions:
+            echo_failure(f"Regression: {regression}")
+        raise typer.Exit(code=1)
+    echo_success("No regressions found.")
+
+
+if __name__ == "__main__":
+    app()
@@ -15,8 +15,12 @@
 #
 
 # pylint: disable=redefined-outer-name
+from pathlib import Path
+from typing import List
+
 import pytest
 
+from ghga_devutil.core.io import write_service
 from ghga_devutil.core.models import (
     API,
     ConfigVariable,
@@ -58,7 +62,7 @@ def service_a_configured_event(service_a_event: Event):
     return ServiceEvent(
         **service_a_event.dict(),
         config="event_a",
-        description="service_a_event_description"
+        description="service_a_event_description",
     )
 
 
@@ -155,3 +159,15 @@ def service_b(
             ),
         ),
     )
+
+
+@pytest.fixture
+def service_files(tmp_path_factory, services: List[Service]) -> List[Path]:
+    """The specification files of services A and B"""
+    spec_dir = tmp_path_factory.mktemp("specs")
+    paths = []
+    for service in services:
+        path = spec_dir / f"{service.name}.yaml"
+        write_service(service, path)
+        paths.append(path)
+    return paths
@@ -15,6 +15,28 @@
 
 """Utils for Fixture handling"""
 
+import os
+import subprocess
 from pathlib import Path
 
 BASE_DIR = Path(__file__).parent.resolve()
+
+COMMIT_TIME = 1672531200
+
+
+def git(repo_dir: Path, *args: str) -> None:
+    """Runs a git command in a repository, committing at a fixed time."""
+    subprocess.run(
+        ["git", "-c", "user.name=test", "-c", "user.email=test@example.org", *args],
+        cwd=repo_dir,
+        check=True,
+        capture_output=True,
+        env={**os.environ, "GIT_COMMITTER_DATE": f"{COMMIT_TIME} +0100"},
+    )
+
+
+def commit_all(repo_dir: Path) -> None:
+    """Commits all files of a directory into a new git repository."""
+    git(repo_dir, "init", "-q")
+    git(repo_dir, "add", ".")
+    git(repo_dir, "commit", "-q", "-m", "Add specifications")
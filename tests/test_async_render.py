@@ -0,0 +1,105 @@
+# Copyright 2021 - 2023 Universität Tübingen, DKFZ, EMBL, and Universität zu Köln
+# for the German Human Genome-Phenome Archive (GHGA)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import asyncio
+from datetime import datetime, timezone
+from typing import List
+
+import pytest
+
+from ghga_devutil.core.annotate import annotate_services
+from ghga_devutil.core.async_render import AsyncRenderer, landscape_version
+from ghga_devutil.core.markdown import generate_complete_diagram, generate_markdown
+from ghga_devutil.core.models import Service
+
+
+@pytest.mark.asyncio
+async def test_async_renderer(services: List[Service]):
+    """Test that async rendering matches synchronous rendering and is cached"""
+    ann_services = {
+        ann_service.shortname: ann_service
+        for ann_service in annotate_services(services)
+    }
+    version = landscape_version(ann_services)
+    timestamp = datetime(2023, 1, 1, tzinfo=timezone.utc)
+    renderer = AsyncRenderer(cache_size=16)
+
+    pages = await asyncio.gather(
+        *(
+            renderer.render_service_page(
+                ann_services, "a", version=version, timestamp=timestamp
+            )
+            for _ in range(10)
+        )
+    )
+    assert set(pages) == {
+        generate_markdown(ann_services, "a", timestamp=timestamp),
+    }
+    assert renderer.cache.misses == 1
+
+    diagram = await renderer.render_complete_diagram(ann_services, version=version)
+    assert diagram == generate_complete_diagram(ann_services)
+
+    misses = renderer.cache.misses
+    await renderer.render_complete_diagram(ann_services, version=version)
+    assert renderer.cache.misses == misses
+
+
+@pytest.mark.asyncio
+async def test_async_renderer_timestamps(services: List[Service]):
+    """Test that pages rendered for different timestamps are cached apart"""
+    ann_services = {
+        ann_service.shortname: ann_service
+        for ann_service in annotate_services(services)
+    }
+    renderer = AsyncRenderer(cache_size=16)
+
+    for timestamp in (
+        datetime(2023, 1, 1, tzinfo=timezone.utc),
+        datetime(2024, 1, 1, tzinfo=timezone.utc),
+    ):
+        page = await renderer.render_service_page(
+            ann_services, "a", timestamp=timestamp
+        )
+        assert page == generate_markdown(ann_services, "a", timestamp=timestamp)
+
+    misses = renderer.cache.misses
+    pages = [await renderer.render_service_page(ann_services, "a") for _ in range(2)]
+    assert pages[0] == pages[1]
+    assert renderer.cache.misses == misses + 1
+
+
+@pytest.mark.asyncio
+async def test_async_renderer_cancellation():
+    """Test that cancelling the first request does not cancel the others"""
+    renderer = AsyncRenderer(cache_size=16)
+    started, release = asyncio.Event(), asyncio.Event()
+
+    async def render() -> str:
+        started.set()
+        await release.wait()
+        return "page"
+
+    first = asyncio.create_task(renderer._cached("key", render))
+    await started.wait()
+    second = asyncio.create_task(renderer._cached("key", render))
+    await asyncio.sleep(0)
+    first.cancel()
+    release.set()
+
+    assert await second == "page"
+    assert first.cancelled()
+    assert renderer.cache.get("key") == "page"
@@ -0,0 +1,76 @@
+# Copyright 2021 - 2023 Universität Tübingen, DKFZ, EMBL, and Universität zu Köln
+# for the German Human Genome-Phenome Archive (GHGA)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+"""Test the start-up cost of the command line interface"""
+
+import re
+import subprocess
+import sys
+
+import pytest
+
+HEAVY_MODULES = ["ghga_devutil.core", "jinja2", "pydantic", "yaml"]
+
+# the import cost of ghga_devutil.cli on top of typer in microseconds, which was
+# about 150ms while the core was imported eagerly
+IMPORT_BUDGET_US = 50_000
+
+IMPORT_TIME = re.compile(r"^import time:\s+\d+ \|\s+(\d+) \|( *)(\S+)$")
+
+
+def _cumulative_import_times(stderr: str) -> dict:
+    """Returns the cumulative import times of top-level imports reported by
+    python -X importtime."""
+    times = {}
+    for line in stderr.splitlines():
+        match = IMPORT_TIME.match(line)
+        if match:
+            times[match[3]] = int(match[1])
+    return times
+
+
+@pytest.mark.parametrize("args", [[], ["markdown"], ["site"]])
+def test_help_does_not_load_core(args):
+    """Test that showing the help does not import the core or its dependencies."""
+    script = (
+        "import sys\n"
+        "from ghga_devutil.cli import cli\n"
+        "try:\n"
+        f"    cli({args + ['--help']!r})\n"
+        "except SystemExit:\n"
+        "    pass\n"
+        f"print('loaded:', *(m for m in {HEAVY_MODULES!r} if m in sys.modules))\n"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", script], capture_output=True, text=True, check=True
+    )
+
+    assert "Usage" in result.stdout
+    assert result.stdout.splitlines()[-1] == "loaded:"
+
+
+def test_import_budget():
+    """Test that importing the command line interface costs little more than
+    importing typer."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import ghga_devutil.cli"],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    times = _cumulative_import_times(result.stderr)
+
+    assert times["ghga_devutil.cli"] - times["typer"] < IMPORT_BUDGET_US
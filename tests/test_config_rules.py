@@ -0,0 +1,104 @@
+# Copyright 2021 - 2023 Universität Tübingen, DKFZ, EMBL, and Universität zu Köln
+# for the German Human Genome-Phenome Archive (GHGA)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+"""Test the rule table deriving configuration variables"""
+
+from pathlib import Path
+
+from ghga_devutil.core.annotate import annotate_service_config
+from ghga_devutil.core.config_rules import (
+    DEFAULT_CONFIG_RULES,
+    ENTRY_POINT_GROUP,
+    ConfigRule,
+    ConfigRuleTable,
+    default_rule_table,
+    service_shape,
+)
+from ghga_devutil.core.models import Service, Storage, VaultStorage
+
+
+def test_vault_config(service_a: Service):
+    """Test that services using Vault get the Vault configuration variables."""
+    table = ConfigRuleTable(DEFAULT_CONFIG_RULES)
+    service = service_a.copy(
+        update={"storage": Storage(vault=[VaultStorage(path="secrets", mode="read")])}
+    )
+
+    names = [variable.name for variable in table.derive(service)]
+
+    assert names[-3:] == ["vault_url", "vault_role_id", "vault_secret_id"]
+    assert "s3_endpoint_url" not in names
+
+
+def test_memoized_by_shape(service_a: Service):
+    """Test that services of the same shape share the derived configuration."""
+    table = ConfigRuleTable(DEFAULT_CONFIG_RULES)
+    renamed = service_a.copy(update={"shortname": "other", "name": "Other"})
+    assert service_shape(renamed) == service_shape(service_a)
+
+    assert table.derive(service_a) == table.derive(renamed)
+    assert (table.cache.hits, table.cache.misses) == (1, 1)
+
+
+def test_custom_rule(service_a: Service):
+    """Test that additional rules extend the derived configuration."""
+    rules = (
+        *DEFAULT_CONFIG_RULES,
+        ConfigRule(
+            requires="events",
+            per_event=(("{config}_partitions", "The number of partitions"),),
+        ),
+    )
+    config = ConfigRuleTable(rules).derive(service_a)
+
+    assert config[-1].name == "event_a_partitions"
+    assert config[-1].description == "The number of partitions"
+
+
+PARTITION_RULES = (
+    ConfigRule(
+        requires="events",
+        per_event=(("{config}_partitions", "The number of partitions"),),
+    ),
+)
+
+
+def retention_rules():
+    """Returns a rule added by a plugin through a factory."""
+    return [ConfigRule(requires="events", variables=(("retention", "Retention"),))]
+
+
+def test_entry_point_rules(monkeypatch, tmp_path: Path, service_a: Service):
+    """Test that installed plugins extend the default rule table in order of
+    their entry point names."""
+    dist_info = tmp_path / "rules_plugin-0.0.0.dist-info"
+    dist_info.mkdir()
+    (dist_info / "METADATA").write_text(
+        "Metadata-Version: 2.1\nName: rules-plugin\nVersion: 0.0.0\n"
+    )
+    (dist_info / "entry_points.txt").write_text(
+        f"[{ENTRY_POINT_GROUP}]\n"
+        + f"b_retention = {__name__}:retention_rules\n"
+        + f"a_partitions = {__name__}:PARTITION_RULES\n"
+    )
+    monkeypatch.syspath_prepend(str(tmp_path))
+    default_rule_table.cache_clear()
+    try:
+        names = [variable.name for variable in annotate_service_config(service_a)]
+    finally:
+        default_rule_table.cache_clear()
+
+    assert names[-2:] == ["event_a_partitions", "retention"]
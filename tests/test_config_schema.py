@@ -0,0 +1,170 @@
+# Copyright 2021 - 2023 Universität Tübingen, DKFZ, EMBL, and Universität zu Köln
+# for the German Human Genome-Phenome Archive (GHGA)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+"""Test the ingestion of configuration schemas and example configurations"""
+
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from threading import Event
+
+import pytest
+
+from ghga_devutil.core.annotate import annotate_service_config
+from ghga_devutil.core.cache import ContentCache
+from ghga_devutil.core.config_schema import (
+    CONFIG_SCHEMA_FILE,
+    EXAMPLE_CONFIG_FILE,
+    ServiceConfigReader,
+    parse_config_schema,
+)
+from ghga_devutil.core.exceptions import ConfigSchemaError
+from ghga_devutil.core.models import Service
+
+SCHEMA = {
+    "title": "Settings",
+    "type": "object",
+    "properties": {
+        "port": {"type": "integer", "default": 8080, "description": "The port."},
+        "kafka_servers": {"type": "array", "items": {"type": "string"}},
+        "log_level": {
+            "anyOf": [{"type": "string"}, {"type": "null"}],
+            "default": None,
+            "description": "The minimum\n  level of log messages.",
+        },
+    },
+}
+EXAMPLE = "port: 8000\nlog_level: INFO\nkafka_servers: [kafka:9092]\n"
+
+
+def _write_repo(repos_dir: Path, name: str) -> None:
+    """Writes the configuration files of a service repository."""
+    repo_dir = repos_dir / name
+    repo_dir.mkdir(parents=True)
+    (repo_dir / CONFIG_SCHEMA_FILE).write_text(json.dumps(SCHEMA))
+    (repo_dir / EXAMPLE_CONFIG_FILE).write_text(EXAMPLE)
+
+
+def test_merge_documented_config(tmp_path: Path, service_a: Service):
+    """Test that descriptions, types, defaults and example values are merged into
+    the derived configuration and documented-only variables are appended."""
+    _write_repo(tmp_path, service_a.name)
+    config_spec = ServiceConfigReader(tmp_path).read(service_a.name)
+
+    config = {
+        variable.name: variable
+        for variable in annotate_service_config(service_a, config_spec=config_spec)
+    }
+
+    assert list(config)[-1] == "log_level"
+    port, kafka_servers, log_level = (
+        config["port"],
+        config["kafka_servers"],
+        config["log_level"],
+    )
+    assert (port.description, port.type, port.default, port.value) == (
+        "The port.",
+        "integer",
+        "8080",
+        "8000",
+    )
+    assert kafka_servers.description == "A list of Apache Kafka servers to connect to"
+    assert (kafka_servers.type, kafka_servers.value) == (
+        "array[string]",
+        '["kafka:9092"]',
+    )
+    assert (log_level.description, log_level.type, log_level.default) == (
+        "The minimum level of log messages.",
+        "string or null",
+        "null",
+    )
+    assert config["host"].type is None
+
+
+def test_missing_repository(tmp_path: Path, service_a: Service):
+    """Test that services without configuration files keep their configuration."""
+    config_spec = ServiceConfigReader(tmp_path).read(service_a.name)
+
+    assert annotate_service_config(
+        service_a, config_spec=config_spec
+    ) == annotate_service_config(service_a)
+
+
+def test_boolean_subschemas():
+    """Test that boolean subschemas, which are valid JSON schema, are untyped"""
+    schema = {
+        "properties": {
+            "anything": True,
+            "optional": {"anyOf": [{"type": "string"}, False], "default": "x"},
+        }
+    }
+    assert parse_config_schema(json.dumps(schema).encode()) == [
+        ["anything", "", None, None],
+        ["optional", "", "string", "x"],
+    ]
+
+
+def test_content_cache(tmp_path: Path):
+    """Test that equal files are parsed once per run and not at all by later runs
+    sharing the cache directory."""
+    repos_dir, cache_dir = tmp_path / "repos", tmp_path / "cache"
+    for name in ("service-a", "service-b"):
+        _write_repo(repos_dir, name)
+
+    reader = ServiceConfigReader(repos_dir, cache_dir=cache_dir, jobs=2)
+    specs = reader.read_all(["service-a", "service-b"])
+    assert specs["service-a"] == specs["service-b"]
+    assert (reader.schema_cache.misses, reader.schema_cache.hits) == (1, 1)
+
+    later_reader = ServiceConfigReader(repos_dir, cache_dir=cache_dir)
+    assert later_reader.read("service-a") == specs["service-a"]
+    assert (later_reader.schema_cache.misses, later_reader.schema_cache.hits) == (0, 1)
+
+
+def test_concurrent_computation():
+    """Test that equal contents requested concurrently are computed once."""
+    cache = ContentCache("test")
+    started, calls = Event(), []
+
+    def compute(content: bytes) -> str:
+        calls.append(content)
+        started.set()
+        time.sleep(0.05)
+        return content.decode()
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        first = executor.submit(cache.get_or_compute, b"value", compute)
+        started.wait()
+        second = executor.submit(cache.get_or_compute, b"value", compute)
+        assert (first.result(), second.result()) == ("value", "value")
+    assert calls == [b"value"]
+    assert (cache.misses, cache.hits) == (1, 1)
+
+
+@pytest.mark.parametrize(
+    "schema_text, example_text",
+    [("{not json", EXAMPLE), (json.dumps(SCHEMA), "- a list")],
+)
+def test_invalid_files(tmp_path: Path, schema_text: str, example_text: str):
+    """Test that unparsable configuration files raise an error naming them."""
+    repo_dir = tmp_path / "service-a"
+    repo_dir.mkdir()
+    (repo_dir / CONFIG_SCHEMA_FILE).write_text(schema_text)
+    (repo_dir / EXAMPLE_CONFIG_FILE).write_text(example_text)
+
+    with pytest.raises(ConfigSchemaError):
+        ServiceConfigReader(tmp_path).read("service-a")
@@ -0,0 +1,135 @@
+# Copyright 2021 - 2023 Universität Tübingen, DKFZ, EMBL, and Universität zu Köln
+# for the German Human Genome-Phenome Archive (GHGA)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+
+"""Test that generated files do not depend on the hash seed of the interpreter"""
+
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+from typing import Dict, List
+
+import pytest
+
+from ghga_devutil.core.io import find_service_files, load_service
+from ghga_devutil.core.synth import SynthOptions, write_landscape
+from ghga_devutil.options import FanOutDistribution, SpecFormat
+from tests.fixtures.utils import commit_all
+
+COMMANDS = [
+    ["annotate", "{specs}", "{out}/annotated"],
+    ["markdown", "{specs}", "{out}/markdown"],
+    ["markdown", "--low-memory", "{specs}", "{out}/low_memory"],
+    ["site", "{specs}", "{out}/site"],
+    ["export", "--format", "json", "{specs}", "{out}/graph.json"],
+]
+OUTPUTS = ["annotated", "graph.json", "low_memory", "markdown", "site"]
+
+# runs all commands in one interpreter, so that each hash seed costs one startup
+RUNNER = """
+import json, sys
+from ghga_devutil.cli import cli
+for args in json.loads(sys.argv[1]):
+    cli(args, standalone_mode=False)
+"""
+
+LANDSCAPES = [
+    SynthOptions(services=25, endpoints=(0, 3), events=(1, 4), seed=1),
+    SynthOptions(
+        services=40,
+        endpoints=(1, 5),
+        events=(0, 2),
+        fan_out=FanOutDistribution.UNIFORM,
+        mean_consumers=4.0,
+        seed=7,
+    ),
+    SynthOptions(
+        services=12,
+        endpoints=(0, 1),
+        events=(0, 6),
+        fan_out=FanOutDistribution.CONSTANT,
+        mean_consumers=1.0,
+        storage_mix={"s3": 1.0, "mongodb": 0.5, "vault": 0.0},
+        seed=23,
+    ),
+]
+
+
+def _run_pipeline(specs: List[Path], out: Path, hash_seed: str) -> Dict[str, bytes]:
+    """Runs all generating commands in a fresh interpreter with the given hash
+    seed and returns the contents of all generated files."""
+    for name in ("annotated", "markdown", "low_memory"):
+        (out / name).mkdir(parents=True)
+    commands: List[List[str]] = []
+    for command in COMMANDS:
+        args: List[str] = []
+        for arg in command:
+            if arg == "{specs}":
+                args.extend(str(path) for path in specs)
+            else:
+                args.append(arg.format(out=out))
+        commands.append(args)
+    result = subprocess.run(
+        [sys.executable, "-c", RUNNER, json.dumps(commands)],
+        env={**os.environ, "PYTHONHASHSEED": hash_seed},
+        capture_output=True,
+        check=False,
+    )
+    # the commands report errors on stderr without failing
+    assert result.returncode == 0, result.stderr.decode()
+    assert result.stderr == b""
+    assert sorted(path.name for path in out.iterdir()) == OUTPUTS
+    return {
+        str(path.relative_to(out)): path.read_bytes()
+        for path in sorted(out.rglob("*"))
+        if path.is_file()
+    }
+
+
+def _check_outputs(outputs: Dict[str, bytes], shortnames: List[str]) -> None:
+    """Checks that every service has its annotated file and page in the
+    outputs."""
+    for directory, suffix in (
+        ("annotated", ".annotated.yaml"),
+        ("markdown", ".md"),
+        ("low_memory", ".md"),
+    ):
+        names = {name for name in outputs if name.startswith(f"{directory}/")}
+        assert len(names) == len(shortnames) + (directory != "annotated")
+        assert all(name.endswith(suffix) for name in names)
+    graph = json.loads(outputs["graph.json"])
+    assert {node["id"] for node in graph["nodes"]} >= set(shortnames)
+
+
+@pytest.mark.parametrize("options", LANDSCAPES, ids=lambda options: str(options.seed))
+def test_output_independent_of_hash_seed(options: SynthOptions, tmp_path: Path):
+    """Test that runs of the pipeline under different hash seeds generate
+    byte-identical files for landscapes of varying shapes."""
+    spec_dir = tmp_path / "specs"
+    spec_dir.mkdir()
+    write_landscape(options, spec_dir, SpecFormat.YAML, force=False)
+    commit_all(spec_dir)
+    specs = find_service_files([spec_dir])
+    shortnames = [load_service(path).shortname for path in specs]
+
+    first = _run_pipeline(specs, tmp_path / "first", hash_seed="1")
+    second = _run_pipeline(specs, tmp_path / "second", hash_seed="2")
+
+    _check_outputs(first, shortnames)
+    assert first.keys() == second.keys()
+    assert [name for name in first if first[name] != second[name]] == []
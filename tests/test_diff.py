@@ -0,0 +1,130 @@
+# Copyright 2021 - 2023 Universität Tübingen, DKFZ, EMBL, and Universität zu Köln
+# for the German Human Genome-Phenome Archive (GHGA)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+
+"""Test the structural comparison of landscapes"""
+
+import json
+from pathlib import Path
+from typing import Dict, List
+
+from ghga_devutil.core.annotate import (
+    annotate_service,
+    enumerate_consumers,
+    enumerate_producers,
+)
+from ghga_devutil.core.diff import (
+    ADDED,
+    CHANGED,
+    EDGES,
+    REMOVED,
+    REST_CONSUMES,
+    REST_PRODUCES,
+    SERVICE,
+    diff_trees,
+    landscape_tree,
+)
+from ghga_devutil.core.io import write_service
+from ghga_devutil.core.main import diff
+from ghga_devutil.core.models import AnnotatedService, RESTInterface, Service
+
+
+def annotate(services: List[Service]) -> Dict[str, AnnotatedService]:
+    """Annotates the given services jointly."""
+    rest_consumers, event_consumers = enumerate_consumers(services)
+    event_producers = enumerate_producers(services)
+    return {
+        service.shortname: annotate_service(
+            service, rest_consumers, event_consumers, event_producers
+        )
+        for service in services
+    }
+
+
+def test_equal_landscapes(services: List[Service]):
+    """Test that equal landscapes have equal digests regardless of order"""
+    old = landscape_tree(annotate(services))
+    new = landscape_tree(annotate(services[::-1]))
+    assert old.digest == new.digest
+    assert diff_trees(old, new) == []
+
+
+def test_changed_metadata(service_a: Service, service_b: Service):
+    """Test that changed service metadata is reported with the changed fields"""
+    old = landscape_tree(annotate([service_a, service_b]))
+    changed_b = service_b.copy(update={"summary": "changed"})
+    new = landscape_tree(annotate([service_a, changed_b]))
+    changes = diff_trees(old, new)
+    assert [(change.change, change.service, change.section) for change in changes] == [
+        (CHANGED, "b", SERVICE)
+    ]
+    assert str(changes[0]) == "~ b service: summary This is service B -> changed"
+
+
+def test_removed_endpoint(service_a: Service, service_b: Service):
+    """Test that a removed endpoint is reported with its consumers and edges"""
+    old = landscape_tree(annotate([service_a, service_b]))
+    api = service_a.api.copy(update={"rest": RESTInterface()})
+    new = landscape_tree(annotate([service_a.copy(update={"api": api}), service_b]))
+    changes = {
+        (change.change, change.service, change.section)
+        for change in diff_trees(old, new)
+    }
+    assert (REMOVED, "a", REST_PRODUCES) in changes
+    assert (REMOVED, "a", EDGES) in changes
+    assert not any(
+        change[1] == "b" and change[2] == REST_CONSUMES for change in changes
+    )
+
+
+def test_added_service(service_a: Service, service_b: Service):
+    """Test that an added service is reported with the edges it owns"""
+    old = landscape_tree(annotate([service_a]))
+    new = landscape_tree(annotate([service_a, service_b]))
+    changes = diff_trees(old, new)
+    assert (ADDED, "b", "") in {
+        (change.change, change.service, change.section) for change in changes
+    }
+    assert any(
+        change.service == "b" and change.section == EDGES and change.change == ADDED
+        for change in changes
+    )
+    # A now has a consumer of its endpoint and event
+    assert any(change.service == "a" and change.change == CHANGED for change in changes)
+
+
+def test_diff_spec_dirs(service_a: Service, service_b: Service, tmp_path: Path, capsys):
+    """Test comparing two directories of specification files"""
+    old_dir, new_dir = tmp_path / "old", tmp_path / "new"
+    for spec_dir, version in ((old_dir, "0.0.0"), (new_dir, "1.0.0")):
+        spec_dir.mkdir()
+        write_service(service_a, spec_dir / "service-a.yaml")
+        write_service(
+            service_b.copy(update={"version": version}), spec_dir / "service-b.yaml"
+        )
+
+    assert diff([old_dir], [old_dir], json_output=True)
+    assert json.loads(capsys.readouterr().out) == []
+    assert not diff([old_dir], [new_dir], json_output=True)
+    assert json.loads(capsys.readouterr().out) == [
+        {
+            "change": CHANGED,
+            "service": "b",
+            "section": SERVICE,
+            "item": "",
+            "details": ["version 0.0.0 -> 1.0.0"],
+        }
+    ]
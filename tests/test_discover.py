@@ -0,0 +1,139 @@
+# Copyright 2021 - 2023 Universität Tübingen, DKFZ, EMBL, and Universität zu Köln
+# for the German Human Genome-Phenome Archive (GHGA)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+
+"""Test the discovery of the API usage of services in their sources"""
+
+from pathlib import Path
+
+from ghga_devutil.core.discover import (
+    PUBLISH,
+    REST,
+    SUBSCRIBE,
+    Finding,
+    SourceScanner,
+    discover_api,
+    scan_source,
+    url_path,
+)
+from ghga_devutil.core.models import Service
+
+SOURCE = b"""
+class Client:
+    async def create_user(self, user_id):
+        await self._client.post(f"{self._config.service_a_url}/users", json={})
+        await self._client.get(self._base + "/products/" + user_id)
+        return self._headers.get("content-type")
+
+    async def publish(self):
+        await self._publisher.publish(
+            payload={}, type_=self._config.event_b_type, topic="topic_b", key="k"
+        )
+
+
+class Translator:
+    topics_of_interest = ["topic_a", "topic_c"]
+"""
+
+
+def test_url_path():
+    """Test that paths are taken from URL templates and base URLs dropped."""
+    assert url_path("{}/users/{}?limit=10") == "/users/{}"
+    assert url_path("https://example.org/users/") == "/users"
+    assert url_path("content-type") is None
+
+
+def test_scan_source():
+    """Test that HTTP calls, published events and subscribed topics are found,
+    but no calls of other methods with the same names."""
+    findings, error = scan_source(SOURCE, "client.py")
+    assert error == ""
+    assert findings == [
+        Finding(REST, "client.py", 4, "POST", "/users"),
+        Finding(REST, "client.py", 5, "GET", "/products/{}"),
+        Finding(PUBLISH, "client.py", 9, topic="topic_b"),
+        Finding(PUBLISH, "client.py", 9, config="event_b"),
+        Finding(SUBSCRIBE, "client.py", 15, topic="topic_a"),
+        Finding(SUBSCRIBE, "client.py", 15, topic="topic_c"),
+    ]
+    assert scan_source(b"def (", "broken.py")[1].startswith("broken.py: ")
+
+
+def test_discover_api(services: list, service_b: Service):
+    """Test that the discovered API is compared to the specification and that
+    services without findings are skipped."""
+    findings, _ = scan_source(SOURCE, "client.py")
+    (discovered,) = discover_api(services, {service_b.name: findings})
+
+    assert discovered.service == service_b
+    assert discovered.rest_consumes == service_b.api.rest.consumes
+    assert [finding.path for finding in discovered.unresolved_rest] == ["/products/{}"]
+    assert discovered.event_produces == service_b.api.events.produces
+    assert discovered.diff() == [
+        "+ consumes event topic_c (<topic_c_type>) with config topic_c",
+        "? calls GET /products/{} at client.py:5, which no known service provides",
+    ]
+    draft = discovered.draft()
+    assert draft.rest == service_b.api.rest
+    assert [event.topic for event in draft.events.consumes] == [
+        "topic_a",
+        "topic_c",
+    ]
+
+
+def test_scanner_cache(tmp_path: Path):
+    """Test that unchanged sources are not scanned again by later runs sharing
+    the cache directory, and that tests and repositories without sources are
+    skipped."""
+    repos_dir, cache_dir = tmp_path / "repos", tmp_path / "cache"
+    (repos_dir / "service-b" / "sb" / "adapters").mkdir(parents=True)
+    (repos_dir / "service-b" / "tests").mkdir()
+    (repos_dir / "service-c").mkdir()
+    source = repos_dir / "service-b" / "sb" / "adapters" / "client.py"
+    source.write_bytes(SOURCE)
+    (repos_dir / "service-b" / "tests" / "test_client.py").write_bytes(SOURCE)
+    repo_dirs = [repos_dir / name for name in ("service-b", "service-c", "x")]
+
+    scanner = SourceScanner(cache_dir=cache_dir, jobs=2)
+    results = scanner.scan(repo_dirs)
+    assert list(results) == [repos_dir / "service-b"]
+    assert results[repos_dir / "service-b"][0].file == "sb/adapters/client.py"
+    assert scanner.scanned == 1
+
+    later_scanner = SourceScanner(cache_dir=cache_dir)
+    assert later_scanner.scan(repo_dirs) == results
+    assert later_scanner.scanned == 0
+
+    source.write_bytes(SOURCE + b"\n")
+    assert SourceScanner(cache_dir=cache_dir).scan(repo_dirs) == results
+
+
+def test_scanner_caches_errors(tmp_path: Path):
+    """Test that files that cannot be parsed are reported again by later runs
+    finding them in the cache."""
+    repos_dir, cache_dir = tmp_path / "repos", tmp_path / "cache"
+    (repos_dir / "service-b").mkdir(parents=True)
+    (repos_dir / "service-b" / "broken.py").write_text("def broken(:\n")
+
+    scanner = SourceScanner(cache_dir=cache_dir)
+    assert scanner.scan([repos_dir / "service-b"]) == {repos_dir / "service-b": []}
+    assert len(scanner.errors) == 1
+    assert scanner.errors[0].startswith("service-b/broken.py")
+
+    later_scanner = SourceScanner(cache_dir=cache_dir)
+    later_scanner.scan([repos_dir / "service-b"])
+    assert later_scanner.scanned == 0
+    assert later_scanner.errors == scanner.errors
@@ -0,0 +1,133 @@
+# Copyright 2021 - 2023 Universität Tübingen, DKFZ, EMBL, and Universität zu Köln
+# for the German Human Genome-Phenome Archive (GHGA)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+"""Test the ingestion and compatibility checks of event payload schemas"""
+
+import json
+from pathlib import Path
+from typing import Any
+
+import pytest
+
+from ghga_devutil.core.event_schemas import (
+    ASYNCAPI_FILE,
+    EVENT_SCHEMA_DIR,
+    EventSchemaReader,
+    check_event_schemas,
+    normalize_schema,
+    schema_incompatibilities,
+)
+from ghga_devutil.core.models import Service
+
+PAYLOAD = {
+    "type": "object",
+    "required": ["id"],
+    "properties": {"id": {"type": "string"}, "size": {"type": "integer"}},
+}
+ASYNCAPI = """
+asyncapi: 2.6.0
+channels:
+  topic_a:
+    publish:
+      message: {$ref: "#/components/messages/UserCreated"}
+components:
+  messages:
+    UserCreated:
+      name: type_a
+      payload:
+        type: object
+        required: [id, size]
+        properties:
+          id: {type: string}
+          size: {type: number, description: The size}
+"""
+
+
+def test_normalize_schema():
+    """Test that references are inlined and annotations dropped, but not
+    properties named like annotations."""
+    schema = {
+        "title": "Payload",
+        "$defs": {"name": {"type": "string", "description": "A name"}},
+        "properties": {"title": {"$ref": "#/$defs/name"}, "next": {"$ref": "#"}},
+        "required": ["title"],
+    }
+
+    assert normalize_schema(schema) == {
+        "properties": {"title": {"type": "string"}, "next": {"$ref": "#"}},
+        "required": ["title"],
+    }
+
+
+@pytest.mark.parametrize(
+    "producer, consumer, problems",
+    [
+        (PAYLOAD, PAYLOAD, []),
+        (PAYLOAD, {}, []),
+        (PAYLOAD, {"required": ["id", "size"]}, ["payload.size: required"]),
+        (
+            {"properties": {"size": {"type": "number"}}},
+            {"properties": {"size": {"type": "integer"}}},
+            ["payload.size: type ['number'] is not accepted"],
+        ),
+        ({"type": "integer"}, {"type": "number"}, []),
+        ({"enum": ["a", "b"]}, {"enum": ["a"]}, ["payload: values ['b']"]),
+        (PAYLOAD, {"additionalProperties": False}, ["payload: additional"]),
+        (
+            {"anyOf": [{"type": "string"}, {"type": "null"}]},
+            {"type": "string"},
+            ["payload: type ['null']"],
+        ),
+        ({"type": "string"}, {"oneOf": [{"type": "string"}, {"type": "null"}]}, []),
+    ],
+)
+def test_schema_incompatibilities(producer: Any, consumer: Any, problems: list):
+    """Test the compatibility rules, comparing the beginning of the reasons."""
+    reasons = schema_incompatibilities(producer, consumer)
+    assert len(reasons) >= len(problems)
+    for reason, problem in zip(reasons, problems):
+        assert reason.startswith(problem)
+
+
+def test_check_event_schemas(tmp_path: Path, service_a: Service, service_b: Service):
+    """Test that incompatible consumers are reported and every distinct pair of
+    schemas is only checked once."""
+    consumers = [
+        service_b.copy(update={"shortname": f"b{index}", "name": f"service-b{index}"})
+        for index in range(5)
+    ]
+    schema_dir = tmp_path / service_a.name / EVENT_SCHEMA_DIR
+    schema_dir.mkdir(parents=True)
+    (schema_dir / "type_a.json").write_text(json.dumps(PAYLOAD))
+    for consumer in consumers[:4]:
+        consumer_dir = tmp_path / consumer.name / EVENT_SCHEMA_DIR
+        consumer_dir.mkdir(parents=True)
+        (consumer_dir / "type_a.json").write_text(
+            json.dumps({**PAYLOAD, "description": consumer.name})
+        )
+    (tmp_path / consumers[4].name).mkdir()
+    (tmp_path / consumers[4].name / ASYNCAPI_FILE).write_text(ASYNCAPI)
+
+    reader = EventSchemaReader(tmp_path)
+    result = check_event_schemas([service_a, *consumers], reader)
+
+    assert (result.edges, result.unique_schemas, result.unique_pairs) == (5, 2, 2)
+    assert [(item.producer, item.consumer) for item in result.incompatibilities] == [
+        ("a", "b4")
+    ]
+    assert result.incompatibilities[0].problems == [
+        "payload.size: required but not always produced"
+    ]
@@ -0,0 +1,76 @@
+# Copyright 2021 - 2023 Universität Tübingen, DKFZ, EMBL, and Universität zu Köln
+# for the German Human Genome-Phenome Archive (GHGA)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import csv
+import json
+from io import StringIO
+from typing import List
+
+import pytest
+
+from ghga_devutil.core.annotate import annotate_services
+from ghga_devutil.core.export import EXPORTERS, ExportFormat
+from ghga_devutil.core.models import Service
+
+
+@pytest.fixture
+def ann_services(services: List[Service]):
+    """The annotated services A and B by shortname"""
+    return {
+        ann_service.shortname: ann_service
+        for ann_service in annotate_services(services)
+    }
+
+
+def _export(ann_services, export_format: ExportFormat) -> str:
+    stream = StringIO()
+    EXPORTERS[export_format](ann_services, stream)
+    return stream.getvalue()
+
+
+def test_export_json(ann_services):
+    """Test that the JSON export is a valid node-link document"""
+    document = json.loads(_export(ann_services, ExportFormat.JSON))
+    assert [node["id"] for node in document["nodes"]] == [
+        "a",
+        "b",
+        "topic_topic_a",
+        "topic_topic_b",
+    ]
+    assert {
+        "source": "b",
+        "target": "a",
+        "label": "POST /users",
+        "kind": "rest",
+    } in document["links"]
+
+
+def test_export_csv_and_dot(ann_services):
+    """Test that the CSV and DOT exports contain the same edges"""
+    rows = list(csv.DictReader(StringIO(_export(ann_services, ExportFormat.CSV))))
+    dot = _export(ann_services, ExportFormat.DOT)
+    assert dot.startswith("digraph services {")
+    assert len(rows) == dot.count(" -> ") == 4
+    for row in rows:
+        assert f'"{row["source"]}" -> "{row["target"]}"' in dot
+
+
+def test_export_dot_quoting(ann_services):
+    """Test that DOT strings keep non-ASCII characters and escape quotes"""
+    ann_services["a"] = ann_services["a"].copy(update={"name": 'Dienst "Äpfel"'})
+    dot = _export(ann_services, ExportFormat.DOT)
+    assert '\\"Äpfel\\"' in dot
+    assert "\\u" not in dot
@@ -0,0 +1,196 @@
+# Copyright 2021 - 2023 Universität Tübingen, DKFZ, EMBL, and Universität zu Köln
+# for the German Human Genome-Phenome Archive (GHGA)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+
+"""Test fetching service specifications over HTTP"""
+
+# pylint: disable=redefined-outer-name
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+import pytest
+import yaml
+
+from ghga_devutil.core.exceptions import SpecManifestError
+from ghga_devutil.core.io import (
+    SpecFetcher,
+    find_service_files,
+    load_service,
+    load_spec_manifest,
+)
+from ghga_devutil.core.models import Service
+
+LAST_MODIFIED = "Sun, 01 Jan 2023 00:00:00 GMT"
+
+
+class Resource(NamedTuple):
+    """A file served by the stand-in server"""
+
+    body: bytes
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+    location: Optional[str] = None
+
+
+def _answer(resource: Optional[Resource], request_headers) -> Tuple:
+    """Returns the status, headers and body of the response to a request."""
+    if resource is None:
+        return 404, {}
+    if resource.location:
+        return 302, {"Location": resource.location}
+    if (
+        resource.etag
+        and request_headers["If-None-Match"] == resource.etag
+        or resource.last_modified
+        and request_headers["If-Modified-Since"] == resource.last_modified
+    ):
+        return 304, {}
+    headers = {}
+    if resource.etag:
+        headers["ETag"] = resource.etag
+    if resource.last_modified:
+        headers["Last-Modified"] = resource.last_modified
+    return 200, headers, resource.body
+
+
+class SpecServer:
+    """A local stand-in for the servers hosting service specifications, which
+    counts the connections and the statuses of the responses"""
+
+    def __init__(self):
+        self.resources: Dict[str, Resource] = {}
+        self.connections = 0
+        self.statuses: List[int] = []
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            """Serves the resources with conditional requests."""
+
+            protocol_version = "HTTP/1.1"
+            wbufsize = -1  # send headers and body together
+
+            def setup(self):
+                super().setup()
+                server.connections += 1
+
+            def do_GET(self):  # noqa: N802
+                """Answers a GET request."""
+                self._respond(*_answer(server.resources.get(self.path), self.headers))
+
+            def _respond(self, status: int, headers: Dict[str, str], body=b""):
+                server.statuses.append(status)
+                self.send_response(status)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):  # pylint: disable=W0622
+                """Suppresses the request log."""
+
+        self.http_server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.http_server.server_address[1]}"
+
+
+@pytest.fixture
+def spec_server() -> Iterator[SpecServer]:
+    """A running stand-in server"""
+    server = SpecServer()
+    thread = threading.Thread(
+        target=server.http_server.serve_forever,
+        kwargs={"poll_interval": 0.01},
+        daemon=True,
+    )
+    thread.start()
+    yield server
+    server.http_server.shutdown()
+    server.http_server.server_close()
+
+
+def _spec(service: Service, summary: str) -> bytes:
+    return yaml.dump(service.copy(update={"summary": summary}).dict()).encode()
+
+
+def test_fetch_and_revalidate(
+    spec_server: SpecServer, service_a: Service, tmp_path: Path
+):
+    """Test that specifications are fetched concurrently over a bounded number of
+    connections and that unchanged ones are revalidated and not written
+    again."""
+    manifest = {}
+    for index in range(12):
+        spec_server.resources[f"/specs/{index}.yaml"] = Resource(
+            _spec(service_a, f"Version {index}"),
+            etag=f'"{index}"' if index % 2 else None,
+            last_modified=None if index % 2 else LAST_MODIFIED,
+        )
+        manifest[f"service-{index}.yaml"] = f"{spec_server.url}/specs/{index}.yaml"
+
+    results = SpecFetcher(tmp_path, max_connections=3).fetch(manifest)
+    assert [result.name for result in results] == list(manifest)
+    assert all(result.changed and not result.error for result in results)
+    assert load_service(tmp_path / "service-5.yaml").summary == "Version 5"
+    assert spec_server.connections <= 3
+    assert find_service_files([tmp_path]) == sorted(tmp_path.glob("*.yaml"))
+    mtimes = {path: path.stat().st_mtime_ns for path in tmp_path.glob("*.yaml")}
+
+    spec_server.statuses.clear()
+    spec_server.resources["/specs/5.yaml"] = Resource(
+        _spec(service_a, "Changed"), etag='"changed"'
+    )
+    results = SpecFetcher(tmp_path, max_connections=3).fetch(manifest)
+    assert [result.name for result in results if result.changed] == ["service-5.yaml"]
+    assert sorted(spec_server.statuses) == [200] + [304] * 11
+    assert load_service(tmp_path / "service-5.yaml").summary == "Changed"
+    for path, mtime in mtimes.items():
+        if path.name != "service-5.yaml":
+            assert path.stat().st_mtime_ns == mtime
+
+
+def test_fetch_errors(spec_server: SpecServer, service_a: Service, tmp_path: Path):
+    """Test that redirects are followed and that missing or invalid
+    specifications are reported without writing them."""
+    spec_server.resources["/moved.yaml"] = Resource(b"", location="/a.yaml")
+    spec_server.resources["/a.yaml"] = Resource(_spec(service_a, "A"))
+    spec_server.resources["/invalid.yaml"] = Resource(b"shortname: [")
+    manifest = {
+        "a.yaml": f"{spec_server.url}/moved.yaml",
+        "b.yaml": f"{spec_server.url}/missing.yaml",
+        "c.yaml": f"{spec_server.url}/invalid.yaml",
+    }
+
+    results = SpecFetcher(tmp_path).fetch(manifest)
+    assert results[0].path == tmp_path / "a.yaml" and results[0].changed
+    assert "404" in results[1].error
+    assert "Not a valid service specification" in results[2].error
+    assert sorted(path.name for path in tmp_path.glob("*.yaml")) == ["a.yaml"]
+
+
+@pytest.mark.parametrize(
+    "text",
+    ["- http://example.org/a.yaml", "specs/a.yaml: http://example.org/a.yaml"]
+    + ["a.yaml: ftp://example.org/a.yaml", "a.txt: http://example.org/a.txt"]
+    + [".ghga-devutil-fetch.json: http://example.org/a.json"],
+)
+def test_invalid_manifest(tmp_path: Path, text: str):
+    """Test that manifests must map plain file names to HTTP URLs."""
+    path = tmp_path / "manifest.yaml"
+    path.write_text(text)
+    with pytest.raises(SpecManifestError):
+        load_spec_manifest(path)
@@ -0,0 +1,118 @@
+# Copyright 2021 - 2023 Universität Tübingen, DKFZ, EMBL, and Universität zu Köln
+# for the German Human Genome-Phenome Archive (GHGA)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+
+"""Test reading service specifications from git objects"""
+
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import List
+
+import pytest
+
+from ghga_devutil.core.git import GitObjectStore, GitPath
+from ghga_devutil.core.io import load_service, resolve_spec_paths, write_service
+from ghga_devutil.core.main import annotate
+from ghga_devutil.core.models import Service
+from tests.fixtures.utils import COMMIT_TIME, git
+
+
+@pytest.fixture
+def repo_dir(tmp_path: Path, services: List[Service]) -> Path:
+    """A git repository with the specifications of services A and B committed
+    and tagged as v1, and modified but not committed afterwards"""
+    (tmp_path / "specs").mkdir()
+    for service in services:
+        write_service(service, tmp_path / "specs" / f"{service.name}.yaml")
+    (tmp_path / "specs" / "README.md").write_text("Not a specification")
+    git(tmp_path, "init", "-q")
+    git(tmp_path, "add", ".")
+    git(tmp_path, "commit", "-q", "-m", "Add specifications")
+    git(tmp_path, "tag", "v1")
+    (tmp_path / "specs" / "service-a.yaml").write_text("changed: true")
+    return tmp_path
+
+
+def test_git_path(repo_dir: Path, service_a: Service):
+    """Test that files and directories are read from the tree of a ref."""
+    with GitObjectStore(repo_dir) as store:
+        path = GitPath(store, "v1", "specs/service-a.yaml")
+        assert (path.name, path.suffix, str(path)) == (
+            "service-a.yaml",
+            ".yaml",
+            "v1:specs/service-a.yaml",
+        )
+        assert path.is_file() and not path.is_dir()
+        assert load_service(path) == service_a
+        assert path.stat().st_mtime == COMMIT_TIME
+
+        directory = GitPath(store, "v1", "specs")
+        assert [child.name for child in directory.iterdir()] == [
+            "README.md",
+            "service-a.yaml",
+            "service-b.yaml",
+        ]
+
+        missing = GitPath(store, "v1", "specs/service-c.yaml")
+        assert not missing.exists()
+        with pytest.raises(FileNotFoundError):
+            missing.read_bytes()
+        with pytest.raises(IsADirectoryError):
+            directory.read_bytes()
+        assert store.commit_time("v1") == datetime.fromtimestamp(
+            COMMIT_TIME, tz=timezone.utc
+        )
+
+
+def test_resolve_spec_paths(
+    repo_dir: Path, services: List[Service], monkeypatch: pytest.MonkeyPatch
+):
+    """Test that 'ref:path' arguments and paths under a git ref are read from
+    git through a single process, and that other paths are read from disk."""
+    monkeypatch.chdir(repo_dir / "specs")
+    with GitObjectStore() as store:
+        from_tag = resolve_spec_paths(store, [Path("v1:specs")])
+        relative = resolve_spec_paths(store, [Path("v1:./service-b.yaml")])
+        with_ref = resolve_spec_paths(store, [Path("service-a.yaml")], git_ref="v1")
+        assert [load_service(path) for path in from_tag] == services
+        assert [load_service(path) for path in relative + with_ref] == [
+            services[1],
+            services[0],
+        ]
+        process = store._process  # pylint: disable=protected-access
+        assert store.read("v1:specs").type == "tree"
+        assert store._process is process  # pylint: disable=protected-access
+
+        on_disk = resolve_spec_paths(store, [Path("service-a.yaml")])
+        assert on_disk == [Path("service-a.yaml")]
+
+
+def test_annotate_fromgit(repo_dir: Path, tmp_path_factory):
+    """Test that annotating specifications read from git equals annotating the
+    committed files."""
+    with GitObjectStore(repo_dir) as store:
+        spec_paths = resolve_spec_paths(store, [Path("v1:specs")])
+        git_dir = tmp_path_factory.mktemp("git")
+        annotate(spec_paths, git_dir, force=False)
+
+    git(repo_dir, "checkout", "-q", "--", ".")
+    disk_dir = tmp_path_factory.mktemp("disk")
+    annotate(sorted((repo_dir / "specs").glob("*.yaml")), disk_dir, force=False)
+
+    names = sorted(path.name for path in git_dir.iterdir())
+    assert names == ["service-a.annotated.yaml", "service-b.annotated.yaml"]
+    for name in names:
+        assert (git_dir / name).read_bytes() == (disk_dir / name).read_bytes()
@@ -0,0 +1,111 @@
+# Copyright 2021 - 2023 Universität Tübingen, DKFZ, EMBL, and Universität zu Köln
+# for the German Human Genome-Phenome Archive (GHGA)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+"""Test the instrumentation hooks of the pipeline"""
+
+from pathlib import Path
+from timeit import timeit
+from typing import List
+
+from ghga_devutil.core import hooks, markdown
+
+# the cost of opening a span without observers in seconds, which is about
+# 0.1 microseconds and negligible compared to loading or rendering anything
+NO_OBSERVER_BUDGET = 2e-6
+
+
+class RecordingObserver(hooks.Observer):
+    """Records all notifications."""
+
+    def __init__(self):
+        self.started: List[hooks.Span] = []
+        self.finished: List[hooks.Span] = []
+        self.landscapes: List[hooks.LandscapeAnnotated] = []
+
+    def span_started(self, span: hooks.Span) -> None:
+        self.started.append(span)
+
+    def span_finished(self, span: hooks.Span) -> None:
+        self.finished.append(span)
+
+    def landscape_annotated(self, event: hooks.LandscapeAnnotated) -> None:
+        self.landscapes.append(event)
+
+
+def test_observer_events(service_files: List[Path], tmp_path: Path):
+    """Test that observers receive structured events for every phase."""
+    observer = RecordingObserver()
+    with hooks.observing(observer):
+        markdown(service_files, tmp_path, force=False)
+
+    assert observer.started == observer.finished
+    phases = [span.phase for span in observer.finished]
+    assert phases.count(hooks.LOAD) == 2
+    assert phases.count(hooks.RENDER) == phases.count(hooks.WRITE) == 3
+    assert {
+        span.name for span in observer.finished if span.phase == hooks.ANNOTATE
+    } == {
+        "enumerate",
+        "a",
+        "b",
+    }
+    assert all(span.wall_time >= 0 for span in observer.finished)
+    written = [span for span in observer.finished if span.phase == hooks.WRITE]
+    assert all(span.bytes_written > 0 for span in written)
+    assert [set(event.services) for event in observer.landscapes] == [{"a", "b"}]
+
+    # observers are only notified while registered
+    markdown(service_files, tmp_path, force=True)
+    assert len(observer.finished) == len(phases)
+
+
+def test_no_observer_overhead():
+    """Micro-benchmark showing that hooks cost nothing measurable while no
+    observer is registered."""
+
+    def open_span():
+        with hooks.span(hooks.RENDER, "page"):
+            pass
+
+    number = 100_000
+    cost = min(timeit(open_span, number=number) for _ in range(3)) / number
+    assert cost < NO_OBSERVER_BUDGET
+
+
+INSTANCE = RecordingObserver()
+
+
+def test_entry_point_observers(monkeypatch, tmp_path: Path):
+    """Test that observers are created from installed entry points referring to
+    observer classes or instances."""
+    dist_info = tmp_path / "observer_plugin-0.0.0.dist-info"
+    dist_info.mkdir()
+    (dist_info / "METADATA").write_text(
+        "Metadata-Version: 2.1\nName: observer-plugin\nVersion: 0.0.0\n"
+    )
+    (dist_info / "entry_points.txt").write_text(
+        f"[{hooks.ENTRY_POINT_GROUP}]\n"
+        + f"cls = {__name__}:RecordingObserver\n"
+        + f"obj = {__name__}:INSTANCE\n"
+    )
+    monkeypatch.syspath_prepend(str(tmp_path))
+
+    observers = sorted(
+        hooks.entry_point_observers(), key=lambda observer: observer is INSTANCE
+    )
+    assert len(observers) == 2
+    assert isinstance(observers[0], RecordingObserver)
+    assert observers[1] is INSTANCE
@@ -0,0 +1,121 @@
+# Copyright 2021 - 2023 Universität Tübingen, DKFZ, EMBL, and Universität zu Köln
+# for the German Human Genome-Phenome Archive (GHGA)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import List
+
+import pytest
+
+from ghga_devutil.core import markdown
+from ghga_devutil.core.annotate import annotate_services
+from ghga_devutil.core.io import load_service, write_service
+from ghga_devutil.core.main import _write_page
+from ghga_devutil.core.manifest import MANIFEST_FILENAME, Manifest
+from ghga_devutil.core.markdown import FragmentCache, generate_complete_diagram
+from ghga_devutil.core.models import Service
+from tests.fixtures.utils import COMMIT_TIME, commit_all
+
+COMMIT_DATE = datetime.fromtimestamp(COMMIT_TIME, tz=timezone.utc)
+
+
+def _read_outputs(outdir: Path):
+    return {path.name: path.read_text() for path in sorted(outdir.glob("*.md"))}
+
+
+def test_markdown_incremental(service_files: List[Path], tmp_path: Path):
+    """Test that incremental generation only rewrites pages with changed inputs"""
+    markdown(service_files, tmp_path, force=False, incremental=True)
+    assert (tmp_path / MANIFEST_FILENAME).exists()
+    first_run = _read_outputs(tmp_path)
+    assert set(first_run) == {
+        "service-a.md",
+        "service-b.md",
+        "service_communications.md",
+    }
+
+    # unchanged inputs produce no writes
+    for path in tmp_path.glob("*.md"):
+        path.write_text("untouched")
+    markdown(service_files, tmp_path, force=False, incremental=True)
+    assert set(_read_outputs(tmp_path).values()) == {"untouched"}
+
+    # a changed summary of service B only affects its own page and the diagram
+    service_b = load_service(service_files[1])
+    write_service(
+        service_b.copy(update={"summary": "changed"}), service_files[1], force=True
+    )
+    markdown(service_files, tmp_path, force=False, incremental=True)
+    outputs = _read_outputs(tmp_path)
+    assert outputs["service-a.md"] == "untouched"
+    assert "changed" in outputs["service-b.md"]
+    assert outputs["service_communications.md"] != "untouched"
+
+
+def test_markdown_reproducible(service_files: List[Path], tmp_path: Path):
+    """Test that regenerating from unchanged committed inputs gives identical
+    pages dated with the commit, and that uncommitted inputs date their pages
+    with the time of generation"""
+    commit_all(service_files[0].parent)
+    for outdir in (tmp_path / "first", tmp_path / "second"):
+        outdir.mkdir()
+        markdown(service_files, outdir, force=False)
+    first = _read_outputs(tmp_path / "first")
+    assert first == _read_outputs(tmp_path / "second")
+    assert f"date: {COMMIT_DATE}" in first["service-a.md"]
+
+    service_b = load_service(service_files[1])
+    write_service(
+        service_b.copy(update={"version": "1.0.0"}), service_files[1], force=True
+    )
+    (tmp_path / "third").mkdir()
+    markdown(service_files, tmp_path / "third", force=False)
+    third = _read_outputs(tmp_path / "third")
+    # A shows the name of B, which contributes to its page
+    assert f"date: {COMMIT_DATE}" not in third["service-a.md"]
+    assert f"date: {COMMIT_DATE}" not in third["service-b.md"]
+
+
+def test_manifest_records_written_pages(tmp_path: Path):
+    """Test that the inputs of a page are only recorded once it was written"""
+
+    def fail() -> str:
+        raise RuntimeError("rendering failed")
+
+    manifest = Manifest.load(tmp_path)
+    out_path = tmp_path / "page.md"
+    with pytest.raises(RuntimeError):
+        _write_page(out_path, fail, force=False, manifest=manifest, digest=str)
+    assert manifest.is_stale(out_path, "")
+    _write_page(out_path, lambda: "page", force=False, manifest=manifest, digest=str)
+    assert not manifest.is_stale(out_path, "")
+
+
+def test_complete_diagram_fragment_cache(services: List[Service]):
+    """Test that diagram fragments are only rendered for changed services"""
+    ann_services = {
+        ann_service.shortname: ann_service
+        for ann_service in annotate_services(services)
+    }
+    cache = FragmentCache()
+    diagram = generate_complete_diagram(ann_services, fragment_cache=cache)
+    assert cache.rendered == 4
+    assert generate_complete_diagram(ann_services, fragment_cache=cache) == diagram
+
+    ann_services["b"] = ann_services["b"].copy(update={"version": "1.0.0"})
+    generate_complete_diagram(ann_services, fragment_cache=cache)
+    assert cache.rendered == 6
+    assert len(cache.fragments) == 4
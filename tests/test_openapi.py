@@ -0,0 +1,130 @@
+# Copyright 2021 - 2023 Universität Tübingen, DKFZ, EMBL, and Universität zu Köln
+# for the German Human Genome-Phenome Archive (GHGA)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+"""Test the ingestion of REST endpoints from OpenAPI documents"""
+
+from pathlib import Path
+
+import pytest
+
+from ghga_devutil.core.exceptions import OpenAPIDocumentError
+from ghga_devutil.core.models import HTTPMethod, RESTEndpoint, Service
+from ghga_devutil.core.openapi import (
+    OPENAPI_FILE,
+    OpenAPIReader,
+    parse_openapi_paths,
+    reconcile_endpoints,
+)
+from ghga_devutil.options import OpenAPIMode
+
+DOCUMENT = """
+openapi: 3.0.2
+info: {title: Service A, version: 1.0.0}
+components:
+  schemas:
+    paths: {type: object}
+paths:
+  /users:
+    parameters: [{name: limit, in: query}]
+    post: {responses: {"201": {description: created}}}
+    head: {responses: {"200": {description: ok}}}
+  /users/{id}:
+    get:
+      responses:
+        "200": {description: ok, content: {application/json: {}}}
+    delete: {responses: {"204": {description: deleted}}}
+"""
+DOCUMENTED = [
+    RESTEndpoint(path="/users", method=HTTPMethod.POST),
+    RESTEndpoint(path="/users/{id}", method=HTTPMethod.GET),
+    RESTEndpoint(path="/users/{id}", method=HTTPMethod.DELETE),
+]
+
+
+def test_parse_openapi_paths():
+    """Test that the operations are read in document order, ignoring other
+    objects and methods that services cannot declare."""
+    assert parse_openapi_paths(DOCUMENT.encode()) == [
+        ["/users", "POST"],
+        ["/users/{id}", "GET"],
+        ["/users/{id}", "DELETE"],
+    ]
+    assert parse_openapi_paths(b'{"paths": {"/a": {"put": {}}}}') == [["/a", "PUT"]]
+
+
+def test_parse_stops_after_paths():
+    """Test that the document is not parsed beyond the paths object."""
+    content = DOCUMENT.encode() + b"x-rest: {unclosed: [\n"
+    assert len(parse_openapi_paths(content)) == 3
+
+
+def test_reconcile_endpoints(service_a: Service):
+    """Test that listed endpoints are checked against or replaced by the
+    documented ones."""
+    checked, mismatch = reconcile_endpoints(service_a, DOCUMENTED, OpenAPIMode.CHECK)
+    assert checked == service_a
+    assert mismatch is not None
+    assert mismatch.undocumented == []
+    assert mismatch.unlisted == DOCUMENTED[1:]
+
+    replaced, mismatch = reconcile_endpoints(service_a, DOCUMENTED, OpenAPIMode.REPLACE)
+    assert mismatch is None
+    assert replaced.api.rest.produces == DOCUMENTED
+    assert replaced.api.events == service_a.api.events
+
+    assert reconcile_endpoints(service_a, None, OpenAPIMode.REPLACE) == (
+        service_a,
+        None,
+    )
+
+
+def test_reader(tmp_path: Path):
+    """Test that documents are parsed in parallel, once per distinct content,
+    and not at all by later runs sharing the cache directory."""
+    repos_dir, cache_dir = tmp_path / "repos", tmp_path / "cache"
+    documents = {
+        "service-a": DOCUMENT,
+        "service-b": DOCUMENT,
+        "service-c": "paths: {/c: {get: {}}}",
+        "service-d": None,
+    }
+    for name, document in documents.items():
+        (repos_dir / name).mkdir(parents=True)
+        if document is not None:
+            (repos_dir / name / OPENAPI_FILE).write_text(document)
+
+    reader = OpenAPIReader(repos_dir, cache_dir=cache_dir, jobs=2)
+    endpoints = reader.read_all(documents)
+    assert endpoints == {
+        "service-a": DOCUMENTED,
+        "service-b": DOCUMENTED,
+        "service-c": [RESTEndpoint(path="/c", method=HTTPMethod.GET)],
+        "service-d": None,
+    }
+    assert reader.cache.misses == 2
+
+    later_reader = OpenAPIReader(repos_dir, cache_dir=cache_dir)
+    assert later_reader.read_all(documents) == endpoints
+    assert (later_reader.cache.misses, later_reader.cache.hits) == (0, 2)
+
+
+def test_invalid_document(tmp_path: Path):
+    """Test that unparsable documents raise an error naming them."""
+    (tmp_path / "service-a").mkdir()
+    (tmp_path / "service-a" / OPENAPI_FILE).write_text("- not a mapping")
+
+    with pytest.raises(OpenAPIDocumentError, match=OPENAPI_FILE):
+        OpenAPIReader(tmp_path).read("service-a")
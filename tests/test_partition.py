@@ -0,0 +1,144 @@
+# Copyright 2021 - 2023 Universität Tübingen, DKFZ, EMBL, and Universität zu Köln
+# for the German Human Genome-Phenome Archive (GHGA)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+from pathlib import Path
+from typing import List
+
+from typer.testing import CliRunner
+
+from ghga_devutil.cli import cli
+from ghga_devutil.core import markdown
+from ghga_devutil.core.annotate import annotate_services
+from ghga_devutil.core.graph import Edge, iter_raw_edges, merge_edges
+from ghga_devutil.core.manifest import Manifest
+from ghga_devutil.core.markdown import generate_partition_diagram
+from ghga_devutil.core.models import Service
+from ghga_devutil.core.partition import (
+    PartitionOptions,
+    PartitionStrategy,
+    partition_services,
+)
+
+
+def test_merge_edges():
+    """Test that duplicate edges are merged and their labels are joined"""
+    edges = [
+        Edge("a", "topic_x", "created", "event"),
+        Edge("a", "topic_x", "created", "event"),
+        Edge("a", "topic_x", "deleted", "event"),
+        Edge("b", "a", "GET /x", "rest"),
+    ]
+    assert merge_edges(edges) == [
+        Edge("a", "topic_x", "created, deleted", "event"),
+        Edge("b", "a", "GET /x", "rest"),
+    ]
+
+
+def test_partition_by_component(services: List[Service]):
+    """Test that connected services end up in the same partition"""
+    ann_services = {
+        ann_service.shortname: ann_service
+        for ann_service in annotate_services(services)
+    }
+    partitions = partition_services(
+        ann_services, PartitionOptions(strategy=PartitionStrategy.COMPONENT)
+    )
+    assert len(partitions) == 1
+    assert {node.id for node in partitions[0].nodes} == {
+        "a",
+        "b",
+        "topic_topic_a",
+        "topic_topic_b",
+    }
+    assert "click a" in generate_partition_diagram(partitions[0], weight=2)
+
+
+def test_partition_budget(services: List[Service]):
+    """Test that no partition exceeds the edge and node budget"""
+    ann_services = {
+        ann_service.shortname: ann_service
+        for ann_service in annotate_services(services)
+    }
+    edges = merge_edges(iter_raw_edges(ann_services))
+    partitions = partition_services(
+        ann_services,
+        PartitionOptions(
+            strategy=PartitionStrategy.DOMAIN,
+            domains={"a": "upload"},
+            max_nodes=2,
+            max_edges=1,
+        ),
+    )
+    assert len(partitions) == len(edges)
+    assert all(len(partition.nodes) <= 2 for partition in partitions)
+    assert {partition.name for partition in partitions} == {
+        "upload-1",
+        "upload-2",
+        "upload-3",
+        "other",
+    }
+
+
+def test_partition_names_unique(services: List[Service]):
+    """Test that domains with the same slug get distinct page names"""
+    ann_services = {
+        ann_service.shortname: ann_service
+        for ann_service in annotate_services(services)
+    }
+    partitions = partition_services(
+        ann_services,
+        PartitionOptions(
+            strategy=PartitionStrategy.DOMAIN, domains={"a": "A B", "b": "a-b"}
+        ),
+    )
+    names = [partition.name for partition in partitions]
+    assert len(names) == len(set(names)) == 2
+    assert all(name.startswith("a-b-") for name in names)
+
+
+def test_stale_partition_pages(service_files: List[Path], tmp_path: Path):
+    """Test that pages of partitions that no longer exist are removed"""
+    markdown(
+        service_files,
+        tmp_path,
+        force=False,
+        incremental=True,
+        partitioning=PartitionOptions(strategy=PartitionStrategy.COMPONENT),
+    )
+    assert (tmp_path / "service_communications_component-1.md").exists()
+    markdown(service_files, tmp_path, force=True, incremental=True)
+    assert not list(tmp_path.glob("service_communications_*.md"))
+    assert "service_communications_component-1.md" not in Manifest.load(tmp_path).pages
+
+
+def test_unrecorded_partition_pages_kept(service_files: List[Path], tmp_path: Path):
+    """Test that pages matching the partition page names are only removed if an
+    earlier run recorded them"""
+    foreign_page = tmp_path / "service_communications_foo.md"
+    foreign_page.write_text("not generated")
+    markdown(service_files, tmp_path, force=False)
+    markdown(service_files, tmp_path, force=True, incremental=True)
+    assert foreign_page.read_text() == "not generated"
+
+
+def test_budget_validation(service_files: List[Path], tmp_path: Path):
+    """Test that budgets that no edge fits into are rejected"""
+    result = CliRunner().invoke(
+        cli,
+        ["markdown", *map(str, service_files), str(tmp_path), "--max-nodes", "1"],
+    )
+    assert result.exit_code == 2
+    assert not list(tmp_path.iterdir())
@@ -0,0 +1,89 @@
+# Copyright 2021 - 2023 Universität Tübingen, DKFZ, EMBL, and Universität zu Köln
+# for the German Human Genome-Phenome Archive (GHGA)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import json
+from pathlib import Path
+from threading import Thread
+from typing import List
+from urllib.error import HTTPError
+from urllib.request import Request, urlopen
+
+import pytest
+
+from ghga_devutil.core.io import load_service, write_service
+from ghga_devutil.core.landscape import Landscape
+from ghga_devutil.core.server import LandscapeServer
+
+
+@pytest.fixture
+def base_url(service_files: List[Path]):
+    """The URL of a landscape server running on a free localhost port"""
+    server = LandscapeServer(Landscape(service_files))
+    http_server = server.create_http_server("127.0.0.1", 0)
+    thread = Thread(target=http_server.serve_forever, daemon=True)
+    thread.start()
+    host, port = http_server.server_address[:2]
+    yield f"http://{host!s}:{port}"
+    http_server.shutdown()
+    http_server.server_close()
+
+
+def _get(url: str) -> str:
+    with urlopen(url, timeout=5) as response:  # nosec
+        return response.read().decode("utf-8")
+
+
+def test_serve_pages(base_url: str):
+    """Test that pages, annotated services and graph queries are served"""
+    assert json.loads(_get(base_url + "/"))["services"] == ["a", "b"]
+    assert "# Service A" in _get(base_url + "/services/a.md")
+    assert "consumers:\n" in _get(base_url + "/services/a.yaml")
+    assert "flowchart TB" in _get(base_url + "/service_communications.md")
+    assert json.loads(_get(base_url + "/graph/a"))["neighbours"] == [
+        "b",
+        "topic_topic_a",
+    ]
+
+
+def test_serve_reload(base_url: str, service_files: List[Path]):
+    """Test that a reload only picks up changed specifications"""
+    assert "This is service B" in _get(base_url + "/services/b.md")
+
+    service_b = load_service(service_files[1])
+    write_service(
+        service_b.copy(update={"summary": "changed"}), service_files[1], force=True
+    )
+    with urlopen(  # nosec
+        Request(base_url + "/reload", method="POST"), timeout=5
+    ) as response:
+        assert json.loads(response.read())["affected"] == ["a", "b"]
+
+    assert "changed" in _get(base_url + "/services/b.md")
+
+
+def test_serve_reload_duplicate(base_url: str, service_files: List[Path]):
+    """Test that a reload declaring a shortname twice is rejected and the
+    landscape is kept"""
+    service_b = load_service(service_files[1])
+    write_service(
+        service_b.copy(update={"shortname": "a"}), service_files[1], force=True
+    )
+    with pytest.raises(HTTPError) as error_info:
+        urlopen(Request(base_url + "/reload", method="POST"), timeout=5)  # nosec
+    assert error_info.value.code == 422
+    assert "already declared" in json.loads(error_info.value.read())["error"]
+
+    assert json.loads(_get(base_url + "/"))["services"] == ["a", "b"]
@@ -0,0 +1,57 @@
+# Copyright 2021 - 2023 Universität Tübingen, DKFZ, EMBL, and Universität zu Köln
+# for the German Human Genome-Phenome Archive (GHGA)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import json
+from pathlib import Path
+from typing import List
+
+from ghga_devutil.core import site
+from ghga_devutil.core.annotate import annotate_services
+from ghga_devutil.core.models import Service
+from ghga_devutil.core.site import SEARCH_INDEX_FILENAME, build_search_index
+
+
+def test_build_search_index(services: List[Service]):
+    """Test that services are found by shortname, topic, event type and path"""
+    index = build_search_index(
+        {
+            ann_service.shortname: ann_service
+            for ann_service in annotate_services(services)
+        }
+    )
+    assert index["docs"] == [["a", "Service A"], ["b", "Service B"]]
+    assert index["terms"]["b"] == [1]
+    assert index["terms"]["topic_a"] == [0, 1]
+    assert index["terms"]["type_b"] == [1]
+    assert index["terms"]["/products"] == [1]
+
+
+def test_site(service_files: List[Path], tmp_path: Path):
+    """Test that the site contains all pages and a loadable search index"""
+    site(service_files, tmp_path, force=False)
+
+    assert {path.name for path in (tmp_path / "services").iterdir()} == {
+        "a.html",
+        "b.html",
+    }
+    assert 'href="../a.html"' not in (tmp_path / "services" / "b.html").read_text()
+    assert 'href="a.html"' in (tmp_path / "services" / "b.html").read_text()
+    assert "flowchart LR" in (tmp_path / "communications.html").read_text()
+
+    script = (tmp_path / SEARCH_INDEX_FILENAME).read_text()
+    prefix = "var searchIndex = "
+    assert script.startswith(prefix)
+    assert json.loads(script[len(prefix) :].rstrip(";\n"))["docs"]
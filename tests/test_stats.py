@@ -0,0 +1,100 @@
+# Copyright 2021 - 2023 Universität Tübingen, DKFZ, EMBL, and Universität zu Köln
+# for the German Human Genome-Phenome Archive (GHGA)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+"""Test the per-phase stats of pipeline runs"""
+
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import List
+
+from ghga_devutil.core import annotate, hooks, markdown
+from ghga_devutil.core.hooks import observing
+from ghga_devutil.core.stats import RunStats
+
+
+def test_markdown_stats(service_files: List[Path], tmp_path: Path):
+    """Test that a markdown run records every phase, the landscape size and the
+    bytes written."""
+    stats = RunStats()
+    with observing(stats):
+        markdown(service_files, tmp_path, force=False)
+
+    assert list(stats.phases) == ["load", "annotate", "render", "write"]
+    assert stats.phases["load"].items == 2
+    assert stats.phases["render"].items == 3
+    assert stats.phases["write"].bytes_written == sum(
+        path.stat().st_size for path in tmp_path.glob("*.md")
+    )
+    assert stats.counts == {"services": 2, "endpoints": 2, "events": 2, "edges": 4}
+
+
+def test_annotate_stats_json(service_files: List[Path], tmp_path: Path):
+    """Test that the stats of an annotate run are written as JSON."""
+    stats = RunStats()
+    outdir = tmp_path / "out"
+    outdir.mkdir()
+    with observing(stats):
+        annotate(service_files, outdir, force=False)
+    stats.write_json(tmp_path / "stats.json")
+
+    document = json.loads((tmp_path / "stats.json").read_text())
+    assert set(document["phases"]) == {"load", "annotate", "write"}
+    assert document["phases"]["write"]["items"] == 2
+    assert document["counts"]["services"] == 2
+    assert "write" in stats.format_table()
+
+
+def _parse(name: str) -> None:
+    with hooks.span(hooks.PARSE, name):
+        deadline = time.thread_time() + 0.1
+        while time.thread_time() < deadline:
+            pass
+
+
+def test_nested_spans_stats():
+    """Test that the time of spans nested in a span, also in worker threads, is
+    only added to their own phase."""
+    stats = RunStats()
+    with observing(stats):
+        with hooks.span(hooks.LOAD, "schemas", items=4):
+            with ThreadPoolExecutor(max_workers=2) as executor:
+                list(executor.map(hooks.nesting(_parse), "abcd"))
+
+    load, parse = stats.phases["load"], stats.phases["parse"]
+    assert parse.items == 4
+    assert parse.cpu_time >= 0.4
+    assert parse.wall_time >= 0.4
+    assert load.cpu_time < 0.1
+    assert load.wall_time < 0.1
+
+
+def test_concurrent_spans_stats():
+    """Test that spans finishing in several threads at once are all counted."""
+    stats = RunStats()
+
+    def write(index: int) -> None:
+        with hooks.span(hooks.WRITE, str(index)) as span:
+            if span is not None:
+                span.bytes_written = 1
+
+    with observing(stats):
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            list(executor.map(write, range(2000)))
+
+    assert stats.phases["write"].items == 2000
+    assert stats.phases["write"].bytes_written == 2000
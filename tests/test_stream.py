@@ -0,0 +1,114 @@
+# Copyright 2021 - 2023 Universität Tübingen, DKFZ, EMBL, and Universität zu Köln
+# for the German Human Genome-Phenome Archive (GHGA)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+"""Test the generation of markdown pages with bounded memory"""
+
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import pytest
+
+from ghga_devutil.core import hooks, markdown
+from ghga_devutil.core.exceptions import ServiceFileValidationError
+from ghga_devutil.core.memory import MemoryReport
+from ghga_devutil.core.partition import PartitionOptions, PartitionStrategy
+from ghga_devutil.core.synth import SynthOptions, write_landscape
+from ghga_devutil.options import SpecFormat
+from tests.fixtures.utils import commit_all
+
+
+def _read_outputs(outdir: Path):
+    return {path.name: path.read_text() for path in sorted(outdir.glob("*.md"))}
+
+
+def test_low_memory_matches_default_mode(tmp_path: Path):
+    """Test that streaming services one at a time produces the same pages."""
+    spec_dir, default_dir, low_memory_dir = (
+        tmp_path / "specs",
+        tmp_path / "default",
+        tmp_path / "low_memory",
+    )
+    for directory in (spec_dir, default_dir, low_memory_dir):
+        directory.mkdir()
+    paths = write_landscape(
+        SynthOptions(services=30, seed=3), spec_dir, SpecFormat.YAML
+    )
+    commit_all(spec_dir)
+
+    markdown(paths, default_dir, force=False)
+    report = MemoryReport()
+    with hooks.observing(report):
+        markdown(paths, low_memory_dir, force=False, low_memory=True)
+    report.stop()
+
+    assert _read_outputs(low_memory_dir) == _read_outputs(default_dir)
+    assert len(_read_outputs(low_memory_dir)) == 31
+    assert set(report.phase_peaks) == {"load", "annotate", "render", "write"}
+    assert 0 < report.peak <= report.peak_rss
+    assert "overall" in report.format_table()
+
+
+def test_low_memory_rejects_partitioning(service_files, tmp_path: Path):
+    """Test that the low memory mode rejects unsupported options."""
+    with pytest.raises(ValueError):
+        markdown(
+            service_files,
+            tmp_path,
+            force=False,
+            partitioning=PartitionOptions(strategy=PartitionStrategy.COMPONENT),
+            low_memory=True,
+        )
+
+
+@pytest.mark.parametrize("low_memory", [False, True])
+def test_duplicate_shortnames_rejected(service_files, tmp_path: Path, low_memory: bool):
+    """Test that two files declaring the same shortname are rejected."""
+    duplicate = tmp_path / f"duplicate{service_files[0].suffix}"
+    duplicate.write_text(service_files[0].read_text())
+    with pytest.raises(ServiceFileValidationError, match="already declared"):
+        markdown(
+            [*service_files, duplicate],
+            tmp_path / "out",
+            force=False,
+            low_memory=low_memory,
+        )
+
+
+def test_memory_peaks_of_nested_spans(monkeypatch):
+    """Test that spans of worker threads and nested spans do not reset the peak
+    of the enclosing span, and that the report works without the resource
+    module."""
+    monkeypatch.setitem(sys.modules, "resource", None)
+
+    def parse(_) -> None:
+        with hooks.span(hooks.PARSE, "document"):
+            pass
+
+    report = MemoryReport()
+    with hooks.observing(report):
+        with hooks.span(hooks.LOAD, "documents"):
+            allocation = bytearray(16 * 1024 * 1024)
+            del allocation
+            with hooks.span(hooks.PARSE, "nested"):
+                pass
+            with ThreadPoolExecutor(max_workers=2) as executor:
+                list(executor.map(parse, range(4)))
+    report.stop()
+
+    assert report.phase_peaks["load"] >= 16 * 1024 * 1024
+    assert report.peak_rss == 0
+    assert "resident" not in report.format_table()
@@ -0,0 +1,90 @@
+# Copyright 2021 - 2023 Universität Tübingen, DKFZ, EMBL, and Universität zu Köln
+# for the German Human Genome-Phenome Archive (GHGA)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+"""Test the generation of synthetic landscapes"""
+
+from pathlib import Path
+
+import pytest
+
+from ghga_devutil.core.annotate import annotate_services
+from ghga_devutil.core.exceptions import OutputFileExistsError
+from ghga_devutil.core.io import load_service
+from ghga_devutil.core.models import Service
+from ghga_devutil.core.synth import (
+    SynthOptions,
+    parse_storage_mix,
+    synthesize,
+    write_landscape,
+)
+from ghga_devutil.options import FanOutDistribution, SpecFormat
+
+
+def test_synthesize_valid_and_reproducible():
+    """Test that synthetic specs are valid services and depend only on the
+    options."""
+    options = SynthOptions(services=50, endpoints=(1, 3), events=(2, 2), seed=7)
+    specs = list(synthesize(options))
+
+    services = [Service.parse_obj(spec) for spec in specs]
+    assert len({service.shortname for service in services}) == 50
+    assert all(1 <= len(service.api.rest.produces) <= 3 for service in services)
+    assert all(len(service.api.events.produces) == 2 for service in services)
+    assert annotate_services(services)
+
+    assert list(synthesize(options)) == specs
+    options.seed = 8
+    assert list(synthesize(options)) != specs
+
+
+def test_constant_fan_out_and_storage_mix():
+    """Test that every endpoint and event gets the configured number of
+    consumers and that the storage mix is applied."""
+    options = SynthOptions(
+        services=20,
+        endpoints=(2, 2),
+        events=(1, 1),
+        fan_out=FanOutDistribution.CONSTANT,
+        mean_consumers=3,
+        storage_mix=parse_storage_mix(["s3=1", "mongodb=0"]),
+    )
+    specs = list(synthesize(options))
+
+    assert sum(len(spec["api"]["rest"]["consumes"]) for spec in specs) == 20 * 2 * 3
+    assert sum(len(spec["api"]["events"]["consumes"]) for spec in specs) == 20 * 3
+    assert all(
+        consumed["service"] != spec["shortname"]
+        for spec in specs
+        for consumed in spec["api"]["rest"]["consumes"]
+    )
+    assert all(set(spec["storage"]) == {"s3"} for spec in specs)
+
+    with pytest.raises(ValueError):
+        parse_storage_mix(["tape=1"])
+
+
+@pytest.mark.parametrize("spec_format", list(SpecFormat))
+def test_write_landscape(spec_format: SpecFormat, tmp_path: Path):
+    """Test that written landscapes can be loaded in every format."""
+    options = SynthOptions(services=5)
+    paths = write_landscape(options, tmp_path, spec_format)
+
+    assert [path.suffix for path in paths] == [f".{spec_format.value}"] * 5
+    assert [load_service(path).dict() for path in paths] == [
+        Service.parse_obj(spec).dict() for spec in synthesize(options)
+    ]
+    with pytest.raises(OutputFileExistsError):
+        write_landscape(options, tmp_path, spec_format)
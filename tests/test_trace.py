@@ -0,0 +1,116 @@
+# Copyright 2021 - 2023 Universität Tübingen, DKFZ, EMBL, and Universität zu Köln
+# for the German Human Genome-Phenome Archive (GHGA)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+"""Test the Chrome trace output of pipeline runs"""
+
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import List
+
+from typer.testing import CliRunner
+
+from ghga_devutil.cli import cli
+from ghga_devutil.core import hooks, markdown
+from ghga_devutil.core.openapi import OPENAPI_FILE
+from ghga_devutil.core.trace import Tracer
+
+DOCUMENT = "openapi: 3.0.2\npaths:\n  {path}:\n    post: {{}}\n"
+
+
+def _traced_work(name: str) -> list:
+    tracer = Tracer()
+    with hooks.observing(tracer), hooks.span("worker", name):
+        pass
+    return tracer.events
+
+
+def test_markdown_trace(service_files: List[Path], tmp_path: Path):
+    """Test that every load, annotation, rendering and write is a span."""
+    tracer = Tracer()
+    outdir = tmp_path / "out"
+    outdir.mkdir()
+    with hooks.observing(tracer):
+        markdown(service_files, outdir, force=False)
+    tracer.write(tmp_path / "trace.json")
+
+    events = json.loads((tmp_path / "trace.json").read_text())["traceEvents"]
+    spans = {(event["cat"], event["name"]) for event in events}
+    assert {("load", "service-a.yaml"), ("load", "service-b.yaml")} <= spans
+    assert {("annotate", "a"), ("annotate", "b")} <= spans
+    for page in ["service-a.md", "service-b.md", "service_communications.md"]:
+        assert ("render", page) in spans
+        assert ("write", page) in spans
+    assert all(event["ph"] == "X" and event["dur"] >= 0 for event in events)
+    assert [event["ts"] for event in events] == sorted(event["ts"] for event in events)
+
+
+def test_worker_spans():
+    """Test that spans recorded in worker processes can be merged."""
+    tracer = Tracer()
+    with hooks.observing(tracer), hooks.span("run", "main"):
+        with ProcessPoolExecutor(max_workers=2) as executor:
+            for events in executor.map(_traced_work, ["x", "y"]):
+                tracer.extend(events)
+
+    main_span = next(event for event in tracer.events if event["name"] == "main")
+    worker_spans = [event for event in tracer.events if event["cat"] == "worker"]
+    assert len(worker_spans) == 2
+    assert all(event["pid"] != os.getpid() for event in worker_spans)
+    assert all(
+        main_span["ts"] <= event["ts"] <= main_span["ts"] + main_span["dur"]
+        for event in worker_spans
+    )
+
+
+def test_parallel_ingestion_trace(
+    service_files: List[Path], tmp_path: Path, monkeypatch
+):
+    """Test that spans of the worker processes parsing OpenAPI documents and of
+    the threads reading config schemas end up in the trace."""
+    monkeypatch.setattr(os, "cpu_count", lambda: 2)
+    repos_dir = tmp_path / "repos"
+    for name, path in (("service-a", "/users"), ("service-b", "/products")):
+        (repos_dir / name).mkdir(parents=True)
+        (repos_dir / name / OPENAPI_FILE).write_text(DOCUMENT.format(path=path))
+    trace = tmp_path / "trace.json"
+    (tmp_path / "out").mkdir()
+
+    result = CliRunner().invoke(
+        cli,
+        [
+            "annotate",
+            *map(str, service_files),
+            str(tmp_path / "out"),
+            "--repos-dir",
+            str(repos_dir),
+            "--cache-dir",
+            str(tmp_path / "cache"),
+            "--openapi",
+            "check",
+            "--trace",
+            str(trace),
+        ],
+    )
+    assert result.exit_code == 0
+
+    events = json.loads(trace.read_text())["traceEvents"]
+    parsed = {event["name"]: event for event in events if event["cat"] == "parse"}
+    documents = ["service-a openapi document", "service-b openapi document"]
+    assert all(parsed[name]["pid"] != os.getpid() for name in documents)
+    schemas = ["service-a config schema", "service-b config schema"]
+    assert all(parsed[name]["pid"] == os.getpid() for name in schemas)
@@ -0,0 +1,97 @@
+# Copyright 2021 - 2023 Universität Tübingen, DKFZ, EMBL, and Universität zu Köln
+# for the German Human Genome-Phenome Archive (GHGA)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+"""Test the validation of service specification files"""
+
+from pathlib import Path
+from typing import List
+
+from ghga_devutil.core.validate import ValidationIssue, validate_file, validate_files
+
+BROKEN_SPEC = """\
+shortname: x
+name: service-x
+summary: A broken service
+storage: {}
+api:
+  rest:
+    produces:
+      - path: /a
+        method: GET
+      - path: /b
+        method: FETCH
+"""
+
+
+def test_validate_file_locations(tmp_path: Path):
+    """Test that all validation errors of a file are reported with the position
+    of the offending node."""
+    path = tmp_path / "broken.yaml"
+    path.write_text(BROKEN_SPEC)
+
+    issues = validate_file(path)
+
+    assert [(issue.location, issue.line, issue.column) for issue in issues] == [
+        ("version", 1, 1),
+        ("api.rest.produces.1.method", 11, 17),
+    ]
+    assert "enumeration" in issues[1].message
+    assert str(issues[1]).startswith(f"{path}:11:17: api.rest.produces.1.method:")
+
+
+def test_validate_file_syntax_error(tmp_path: Path):
+    """Test that YAML syntax errors are reported with their position."""
+    path = tmp_path / "syntax.yaml"
+    path.write_text("shortname: x\nname: [unclosed\n")
+
+    issues = validate_file(path)
+
+    assert len(issues) == 1
+    assert issues[0].line == 3
+    assert issues[0].location == ""
+
+
+def test_validate_files_collects_all(service_files: List[Path], tmp_path: Path):
+    """Test that all files are validated concurrently and every problem is
+    collected in the order of the files."""
+    broken = []
+    for number in range(3):
+        path = tmp_path / f"broken-{number}.yaml"
+        path.write_text(BROKEN_SPEC)
+        broken.append(path)
+
+    issues = validate_files([*service_files, *broken], jobs=2)
+
+    assert all(isinstance(issue, ValidationIssue) for issue in issues)
+    assert [issue.path for issue in issues] == [
+        str(path) for path in broken for _ in range(2)
+    ]
+    assert validate_files(service_files, jobs=2) == []
+
+
+def test_validate_files_duplicate_shortnames(service_files: List[Path], tmp_path: Path):
+    """Test that shortnames declared by several valid files are reported at
+    the shortname node of the later files."""
+    duplicate = tmp_path / "duplicate.yaml"
+    duplicate.write_text("# copy\n" + service_files[0].read_text())
+
+    issues = validate_files([*service_files, duplicate], jobs=2)
+
+    assert [(issue.path, issue.location) for issue in issues] == [
+        (str(duplicate), "shortname")
+    ]
+    assert "already declared" in issues[0].message
+    assert issues[0].line is not None and issues[0].line > 1
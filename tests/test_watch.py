@@ -0,0 +1,115 @@
+# Copyright 2021 - 2023 Universität Tübingen, DKFZ, EMBL, and Universität zu Köln
+# for the German Human Genome-Phenome Archive (GHGA)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+from pathlib import Path
+from typing import List
+
+import pytest
+
+from ghga_devutil.core import landscape as landscape_module
+from ghga_devutil.core.io import load_service, write_service
+from ghga_devutil.core.landscape import Landscape
+from ghga_devutil.core.manifest import MANIFEST_FILENAME
+from ghga_devutil.core.watch import (
+    InotifyWatcher,
+    MarkdownRebuilder,
+    PollingWatcher,
+    wait_debounced,
+)
+from tests.fixtures.utils import COMMIT_TIME, commit_all
+
+
+@pytest.mark.parametrize("watcher_class", [InotifyWatcher, PollingWatcher])
+def test_watcher_detects_changes(watcher_class, service_files: List[Path]):
+    """Test that rewritten spec files are detected and reported once"""
+    watcher = watcher_class([service_files[0].parent])
+    try:
+        assert watcher.wait(timeout=0.05) == set()
+        service_a = load_service(service_files[0])
+        write_service(
+            service_a.copy(update={"summary": "changed"}), service_files[0], True
+        )
+        assert wait_debounced(watcher, debounce=0.3) == {service_files[0].absolute()}
+    finally:
+        watcher.close()
+
+
+@pytest.mark.parametrize("watcher_class", [InotifyWatcher, PollingWatcher])
+def test_watcher_ignores_outputs(watcher_class, service_files: List[Path]):
+    """Test that outputs written next to the spec files do not count as changes,
+    so that rebuilds do not trigger further rebuilds"""
+    spec_dir = service_files[0].parent
+    outdir = spec_dir / "out"
+    outdir.mkdir()
+    watcher = watcher_class([spec_dir], exclude=[outdir])
+    try:
+        (outdir / "service-a.md").write_text("page")
+        (outdir / MANIFEST_FILENAME).write_text("{}")
+        (spec_dir / MANIFEST_FILENAME).write_text("{}")
+        (spec_dir / "service-a.md").write_text("page")
+        assert watcher.wait(timeout=0.3) == set()
+
+        service_files[1].write_text(service_files[1].read_text())
+        assert wait_debounced(watcher, debounce=0.3) == {service_files[1].absolute()}
+    finally:
+        watcher.close()
+
+
+def test_rebuild_affected_pages(service_files: List[Path], tmp_path: Path):
+    """Test that a rebuild only writes the pages of affected services"""
+    landscape = Landscape(service_files)
+    rebuilder = MarkdownRebuilder(landscape, tmp_path)
+    assert rebuilder.build() == 3
+    assert rebuilder.build() == 0
+
+    service_b = load_service(service_files[1])
+    write_service(
+        service_b.copy(update={"version": "1.0.0"}), service_files[1], force=True
+    )
+    affected = landscape.reload()
+    assert affected == {"a", "b"}
+    # the page of A is unaffected as it only shows the name of B
+    assert rebuilder.build(affected) == 2
+    assert "1.0.0" in (tmp_path / "service-b.md").read_text()
+
+    landscape.reload(service_files[:1])
+    rebuilder.build(affected)
+    assert not (tmp_path / "service-b.md").exists()
+
+
+def test_reload_queries_changed_commit_times(monkeypatch, service_files: List[Path]):
+    """Test that a reload only looks up the commit times of changed files"""
+    commit_all(service_files[0].parent)
+    queried: List[List[Path]] = []
+    commit_times = landscape_module.commit_times
+
+    def recording_commit_times(paths):
+        queried.append(sorted(paths))
+        return commit_times(paths)
+
+    monkeypatch.setattr(landscape_module, "commit_times", recording_commit_times)
+    landscape = Landscape(service_files)
+    assert landscape.input_time("a").timestamp() == COMMIT_TIME
+
+    service_b = load_service(service_files[1])
+    write_service(
+        service_b.copy(update={"version": "1.0.0"}), service_files[1], force=True
+    )
+    landscape.reload()
+
+    assert queried == [sorted(service_files), [service_files[1]]]
+    # B has uncommitted changes, and the page of A shows B
+    assert landscape.input_time("a").timestamp() != COMMIT_TIME